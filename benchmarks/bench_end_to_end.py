@@ -0,0 +1,281 @@
+"""
+Benchmark: end-to-end generation of topic trees by the FastAPI app (``main.app``) against the local stand-in
+for the OpenAI API (``benchmarks/fake_openai_server.py``).
+
+The stand-in server is started once with the configured latency distribution, error and HTTP 429 rates.
+Every run of a tree size is a fresh subprocess that serves ``main.app`` in-process (ASGI, incl. lifespan) and sends
+one ``/generate-topic-tree`` request, so that peak RSS and CPU time belong to the app alone and no state (LLM cache,
+connection pool, scheduler budgets) is carried over between runs. The LLM cache and the topic tree store are disabled.
+
+Reported per size (median over ``--repeat`` runs): wall time of the request, chat completions answered by the
+stand-in (incl. injected errors), retries of the app, CPU time (user + system) of the request and peak RSS of the
+app process. With ``--output`` the results are written as JSON; ``--compare`` checks them against such a file and
+exits with status 1 if a wall time or the number of calls regressed by more than ``--max-regression``.
+
+Usage (from the repository root)::
+
+    python -m benchmarks.bench_end_to_end
+    python -m benchmarks.bench_end_to_end --sizes 5x3x2 10x10x5 --repeat 5 --latency-distribution lognormal
+    python -m benchmarks.bench_end_to_end --request '{"subtopic_batch_size": 5}' --rate-limit-rate 0.05
+    python -m benchmarks.bench_end_to_end --output baseline.json
+    python -m benchmarks.bench_end_to_end --compare baseline.json --max-regression 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import httpx
+
+DEFAULT_SIZES = ("3x2x2", "5x3x2", "10x5x3", "10x10x5")
+METRICS = ("wall_seconds", "calls", "errors", "rate_limited", "retries", "cpu_seconds", "peak_rss_mb")
+FLOAT_METRICS = ("wall_seconds", "cpu_seconds", "peak_rss_mb")
+
+# environment of the app under test: everything that would carry state from one run to the next is disabled
+APP_ENVIRONMENT = {
+    "OPENAI_API_KEY": "sk-fake",
+    "LLM_CACHE_ENABLED": "false",
+    "TOPIC_TREE_STORE_ENABLED": "false",
+    "TOPIC_TREE_JOB_STORE_PATH": "",
+    "VOCAB_REFRESH_INTERVAL_SECONDS": "0",
+}
+
+
+def parse_size(size: str) -> dict:
+    _num_main, _num_sub, _num_lp = (int(_part) for _part in size.split("x"))
+    return {"num_main_topics": _num_main, "num_subtopics": _num_sub, "num_curriculum_topics": _num_lp}
+
+
+def free_port() -> int:
+    with socket.socket() as _socket:
+        _socket.bind(("127.0.0.1", 0))
+        return _socket.getsockname()[1]
+
+
+def add_fake_server_arguments(parser: argparse.ArgumentParser) -> None:
+    """Options of the stand-in server (shared with ``benchmarks/load_test.py``)."""
+    parser.add_argument("--latency", type=float, default=0.5, help="latency of the stand-in in seconds (default: 0.5)")
+    parser.add_argument(
+        "--latency-distribution",
+        choices=("constant", "uniform", "normal", "lognormal", "exponential"),
+        default="lognormal",
+        help="distribution of the latency (default: lognormal)",
+    )
+    parser.add_argument("--latency-spread", type=float, default=0.5, help="spread of the latency (default: 0.5)")
+    parser.add_argument(
+        "--tokens-per-second", type=float, default=0, help="generation speed of the stand-in, 0 = instant (default: 0)"
+    )
+    parser.add_argument("--error-rate", type=float, default=0, help="share of HTTP 500 answers (default: 0)")
+    parser.add_argument("--rate-limit-rate", type=float, default=0, help="share of HTTP 429 answers (default: 0)")
+    parser.add_argument("--retry-after", type=float, default=1, help="retry-after of HTTP 429 answers (default: 1)")
+    parser.add_argument("--seed", type=int, default=42, help="seed of the stand-in (default: 42)")
+    parser.add_argument("--fake-port", type=int, default=None, help="port of the stand-in (default: a free port)")
+
+
+def wait_until_ready(process: subprocess.Popen, url: str, name: str, timeout: float = 30) -> None:
+    """Waits until ``url`` answers successfully; terminates ``process`` if it does not within ``timeout`` seconds."""
+    _deadline = time.monotonic() + timeout
+    while time.monotonic() < _deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{name} exited with status {process.returncode}")
+        try:
+            httpx.get(url, timeout=1).raise_for_status()
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{name} did not start within {timeout:.0f} seconds")
+
+
+def start_fake_server(args: argparse.Namespace) -> subprocess.Popen:
+    """Starts the stand-in server in a subprocess and waits until it answers."""
+    _command = [
+        sys.executable,
+        "-m",
+        "benchmarks.fake_openai_server",
+        "--port",
+        str(args.fake_port),
+        "--latency",
+        str(args.latency),
+        "--latency-distribution",
+        args.latency_distribution,
+        "--latency-spread",
+        str(args.latency_spread),
+        "--tokens-per-second",
+        str(args.tokens_per_second),
+        "--error-rate",
+        str(args.error_rate),
+        "--rate-limit-rate",
+        str(args.rate_limit_rate),
+        "--retry-after",
+        str(args.retry_after),
+        "--seed",
+        str(args.seed),
+    ]
+    process = subprocess.Popen(_command)
+    wait_until_ready(process, f"http://127.0.0.1:{args.fake_port}/v1/models", "fake OpenAI server")
+    return process
+
+
+async def _run_worker_async(base_url: str, topic_tree_request: dict) -> dict:
+    # imported here: the environment of the app has to be set before main (and its .env handling) is loaded
+    import main
+
+    _fake_url = base_url.removesuffix("/v1")
+    async with httpx.AsyncClient(base_url=_fake_url) as fake_client:
+        await fake_client.post("/_statistics/reset")
+        async with main.lifespan(main.app):
+            async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=main.app), base_url="http://bench", timeout=None
+            ) as client:
+                _usage_before = resource.getrusage(resource.RUSAGE_SELF)
+                _start = time.perf_counter()
+                response = await client.post("/generate-topic-tree", json=topic_tree_request)
+                _wall_seconds = time.perf_counter() - _start
+                _usage_after = resource.getrusage(resource.RUSAGE_SELF)
+        _fake_statistics = (await fake_client.get("/_statistics")).json()
+    response.raise_for_status()
+    _timings = response.json()["metadata"]["timings"] or {}
+    return {
+        "wall_seconds": _wall_seconds,
+        "calls": _fake_statistics["chat_completions"],
+        "errors": _fake_statistics["errors"],
+        "rate_limited": _fake_statistics["rate_limited"],
+        "retries": _timings.get("retries", 0),
+        "cpu_seconds": (_usage_after.ru_utime - _usage_before.ru_utime)
+        + (_usage_after.ru_stime - _usage_before.ru_stime),
+        # ru_maxrss is reported in KiB on Linux (bytes on macOS)
+        "peak_rss_mb": _usage_after.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024),
+    }
+
+
+def run_worker(base_url: str, topic_tree_request: dict) -> None:
+    """Entry point of the subprocess: generates one topic tree and prints the measurements as JSON."""
+    os.environ.update(APP_ENVIRONMENT)
+    os.environ["OPENAI_BASE_URL"] = base_url
+    # loguru logs every LLM call on INFO level: only warnings are shown, so that the log output does not cost CPU time
+    from loguru import logger
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    print(json.dumps(asyncio.run(_run_worker_async(base_url, topic_tree_request))))
+
+
+def run_once(base_url: str, topic_tree_request: dict) -> dict:
+    _result = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.bench_end_to_end",
+            "--worker",
+            "--base-url",
+            base_url,
+            "--request",
+            json.dumps(topic_tree_request),
+        ],
+        capture_output=True,
+        text=True,
+    )
+    if _result.returncode != 0:
+        raise RuntimeError(f"benchmark run failed:\n{_result.stderr}")
+    return json.loads(_result.stdout.strip().splitlines()[-1])
+
+
+def run_suite(args: argparse.Namespace) -> dict:
+    _base_url = f"http://127.0.0.1:{args.fake_port}/v1"
+    results = {}
+    fake_server = start_fake_server(args)
+    try:
+        for _size in args.sizes:
+            # include_timings: the number of retries is read from the performance trace of the response
+            _request = {"theme": "Physik", **json.loads(args.request), **parse_size(_size), "include_timings": True}
+            _runs = [run_once(_base_url, _request) for _ in range(args.repeat)]
+            results[_size] = {_metric: statistics.median(_run[_metric] for _run in _runs) for _metric in METRICS}
+            print_row(_size, results[_size])
+    finally:
+        fake_server.terminate()
+        fake_server.wait()
+    return results
+
+
+def print_header() -> None:
+    print(" | ".join(f"{_column:>12}" for _column in ("size", *METRICS)))
+
+
+def print_row(size: str, result: dict) -> None:
+    _values = (size, *(f"{result[_metric]:.{3 if _metric in FLOAT_METRICS else 0}f}" for _metric in METRICS))
+    print(" | ".join(f"{_value!s:>12}" for _value in _values))
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> List[str]:
+    """Returns the regressions of wall time and calls compared to ``baseline`` (sizes missing in one are skipped)."""
+    regressions = []
+    for _size, _result in results.items():
+        _baseline = baseline.get(_size)
+        if _baseline is None:
+            continue
+        for _metric in ("wall_seconds", "calls"):
+            if _baseline[_metric] and _result[_metric] > _baseline[_metric] * (1 + max_regression):
+                regressions.append(
+                    f"{_size}: {_metric} {_result[_metric]:.3f} vs. {_baseline[_metric]:.3f} "
+                    f"(+{_result[_metric] / _baseline[_metric] - 1:.0%})"
+                )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        default=DEFAULT_SIZES,
+        metavar="MAINxSUBxLP",
+        help=f"tree sizes (default: {' '.join(DEFAULT_SIZES)})",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="number of runs per size (default: 3)")
+    parser.add_argument(
+        "--request", default="{}", help="further TopicTreeRequest parameters as JSON, e.g. batch sizes (default: {})"
+    )
+    add_fake_server_arguments(parser)
+    parser.add_argument("--output", type=Path, help="writes the results as JSON")
+    parser.add_argument("--compare", type=Path, help="results of an earlier run (--output) to compare against")
+    parser.add_argument(
+        "--max-regression", type=float, default=0.2, help="allowed regression for --compare (default: 0.2 = 20%%)"
+    )
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_worker(args.base_url, json.loads(args.request))
+        return
+
+    args.fake_port = args.fake_port or free_port()
+    print(
+        f"median of {args.repeat} runs per size; stand-in: {args.latency_distribution} latency {args.latency}s "
+        f"(spread {args.latency_spread}), error rate {args.error_rate}, 429 rate {args.rate_limit_rate}"
+    )
+    print_header()
+    results = run_suite(args)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+    if args.compare:
+        _regressions = compare(results, json.loads(args.compare.read_text()), args.max_regression)
+        for _regression in _regressions:
+            print(f"REGRESSION {_regression}")
+        if _regressions:
+            sys.exit(1)
+        print(f"no regressions > {args.max_regression:.0%} compared to {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
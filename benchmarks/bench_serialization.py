@@ -0,0 +1,143 @@
+"""
+Benchmark: serialization of an ``EnhancedTopicTreeResponse`` (cm:/ccm:/cclom: aliases) on the response path.
+
+- ``response_model``: the model is returned and serialized by the installed FastAPI version via ``response_model``
+- ``dict_json_dumps``: what FastAPI versions without the ``dump_json`` fast path do (e.g. 0.116, the minimum version
+  in ``pyproject.toml``): validate, convert to JSON-compatible dicts and encode them with ``json.dumps``
+- ``model_dump_json``: a single ``model_dump_json(by_alias=True)`` returned as ``Response`` (used by the app)
+
+All variants are served by a minimal FastAPI app and requested in-process (ASGI, no network),
+so the measured time is the full response path for a tree that has already been generated.
+
+Usage (from the repository root)::
+
+    python -m benchmarks.bench_serialization
+    python -m benchmarks.bench_serialization --sizes 5x3x2 30x20x20 --repeat 10
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List, Tuple
+
+import httpx
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from src.DTOs.enhanced_response import EnhancedTopicTreeResponse
+from src.DTOs.topic_tree_request import TopicTreeRequest
+from src.topic_node import TopicNode
+from src.topic_tree_helper import build_topic_tree_response
+
+DEFAULT_SIZES = ("5x3x2", "10x10x5", "20x10x10", "30x20x20")
+VARIANTS = ("response_model", "dict_json_dumps", "model_dump_json")
+
+
+def _synthetic_topic(title: str, subcollections: List[TopicNode]) -> TopicNode:
+    _description = " ".join(f"Wort{_number}" for _number in range(60))
+    return TopicNode(
+        title=title,
+        shorttitle=title[:20],
+        description=_description,
+        keywords=["Physik", "Energie", "Systeme"],
+        subcollections=subcollections,
+    )
+
+
+def build_synthetic_tree(num_main: int, num_sub: int, num_lp: int) -> EnhancedTopicTreeResponse:
+    """Builds a tree of the given size with properties and text statistics like a generated one."""
+    _request = TopicTreeRequest(
+        theme="Physik",
+        num_main_topics=min(num_main, 30),
+        num_subtopics=min(num_sub, 20),
+        num_curriculum_topics=min(num_lp, 20),
+        discipline_uri=["http://w3id.org/openeduhub/vocabs/discipline/460"],
+        educational_context_uri=["http://w3id.org/openeduhub/vocabs/educationalContext/sekundarstufe_2"],
+    )
+    _main_topics = [
+        _synthetic_topic(
+            f"Hauptthema {_main}",
+            [
+                _synthetic_topic(
+                    f"Unterthema {_main}.{_sub}",
+                    [_synthetic_topic(f"Lehrplanthema {_main}.{_sub}.{_lp}", []) for _lp in range(num_lp)],
+                )
+                for _sub in range(num_sub)
+            ],
+        )
+        for _main in range(num_main)
+    ]
+    return build_topic_tree_response(_main_topics, _request)
+
+
+def build_app(topic_tree: EnhancedTopicTreeResponse) -> FastAPI:
+    app = FastAPI()
+    _adapter = TypeAdapter(EnhancedTopicTreeResponse)
+
+    @app.get("/response_model", response_model=EnhancedTopicTreeResponse)
+    async def _response_model():
+        return topic_tree
+
+    @app.get("/dict_json_dumps", response_model=EnhancedTopicTreeResponse)
+    async def _dict_json_dumps():
+        _validated = _adapter.validate_python(topic_tree)
+        return JSONResponse(content=_adapter.dump_python(_validated, mode="json", by_alias=True))
+
+    @app.get("/model_dump_json", response_model=EnhancedTopicTreeResponse)
+    async def _model_dump_json():
+        return Response(content=topic_tree.model_dump_json(by_alias=True), media_type="application/json")
+
+    return app
+
+
+async def run_size(size: str, repeat: int) -> Tuple[int, dict, bool]:
+    """Times both variants for one tree size; returns the number of nodes, the timings and whether the bodies match."""
+    _num_main, _num_sub, _num_lp = (int(_part) for _part in size.split("x"))
+    _topic_tree = build_synthetic_tree(_num_main, _num_sub, _num_lp)
+    _nodes = _num_main * (1 + _num_sub * (1 + _num_lp))
+    _timings = {}
+    _bodies = {}
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=build_app(_topic_tree)), base_url="http://bench"
+    ) as client:
+        for _variant in VARIANTS:
+            # warm-up (schema / serializer creation)
+            _bodies[_variant] = (await client.get(f"/{_variant}")).content
+            _durations = []
+            for _ in range(repeat):
+                _start = time.perf_counter()
+                (await client.get(f"/{_variant}")).raise_for_status()
+                _durations.append(time.perf_counter() - _start)
+            _timings[_variant] = statistics.median(_durations) * 1000
+    return _nodes, _timings, len(set(_bodies.values())) == 1
+
+
+async def main_async(sizes: List[str], repeat: int) -> None:
+    print(f"median of {repeat} requests per variant (ms)")
+    _columns = ("size", "nodes", *VARIANTS, "vs. dict_json_dumps", "identical JSON")
+    print(" | ".join(f"{_column:>16}" for _column in _columns))
+    for _size in sizes:
+        _nodes, _timings, _identical = await run_size(_size, repeat)
+        _speed_up = _timings["dict_json_dumps"] / max(_timings["model_dump_json"], 0.001)
+        _row = (_size, _nodes, *(f"{_timings[_variant]:.1f}" for _variant in VARIANTS), f"{_speed_up:.1f}x", _identical)
+        print(" | ".join(f"{_value!s:>16}" for _value in _row))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        default=DEFAULT_SIZES,
+        metavar="MAINxSUBxLP",
+        help=f"tree sizes (default: {' '.join(DEFAULT_SIZES)})",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="number of timed requests per variant (default: 5)")
+    args = parser.parse_args()
+    asyncio.run(main_async(args.sizes, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
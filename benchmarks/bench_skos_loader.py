@@ -0,0 +1,158 @@
+"""
+Benchmark: SKOS JSON-LD loader (``src.skos_loader``) vs. the previous rdflib graph parsing.
+
+Each variant is run in a fresh subprocess, so that the reported peak RSS is not distorted by the other variant.
+
+Usage (from the repository root)::
+
+    python -m benchmarks.bench_skos_loader --input path/to/discipline/index.json
+    python -m benchmarks.bench_skos_loader --synthetic 5000
+"""
+
+import argparse
+import json
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+VARIANTS = ("skos_loader", "rdflib")
+
+
+def _load_with_skos_loader(data: str) -> dict:
+    from src.skos_loader import load_skos_labels
+
+    return {_uri: _labels["de"][0] for _uri, _labels in load_skos_labels(data).items() if "de" in _labels}
+
+
+def _load_with_rdflib(data: str) -> dict:
+    # the implementation used by src.vocab_helper before the SKOS loader was introduced
+    from rdflib import SKOS, Graph
+
+    _graph = Graph()
+    _graph.parse(data=data, format="json-ld", publicID="https://vocabs.openeduhub.de/")
+    _result = {}
+    for _subject in _graph.subjects(predicate=SKOS.prefLabel, object=None):
+        _result[str(_subject)] = str(_graph.value(subject=_subject, predicate=SKOS.prefLabel))
+    return _result
+
+
+def build_synthetic_vocab(concepts: int, fan_out: int = 10) -> str:
+    """Builds a SkoHub-like ``index.json`` with the given number of concepts (nested via ``narrower``)."""
+    _base = "http://w3id.org/openeduhub/vocabs/synthetic/"
+
+    def _concept(number: int) -> dict:
+        return {
+            "id": f"{_base}{number}",
+            "type": "Concept",
+            "prefLabel": {"de": f"Konzept {number}", "en": f"Concept {number}"},
+            "altLabel": {"de": [f"Synonym {number}"]},
+            "narrower": [],
+        }
+
+    _nodes = [_concept(_number) for _number in range(concepts)]
+    for _number, _node in enumerate(_nodes[1:], start=1):
+        _nodes[(_number - 1) // fan_out]["narrower"].append(_node)
+    return json.dumps(
+        {
+            "@context": {
+                "@version": 1.1,
+                "id": "@id",
+                "type": "@type",
+                "@vocab": "http://www.w3.org/2004/02/skos/core#",
+                "prefLabel": {"@container": "@language"},
+                "altLabel": {"@container": "@language"},
+                "narrower": {"@container": "@set"},
+                "hasTopConcept": {"@container": "@set"},
+            },
+            "id": _base,
+            "type": "ConceptScheme",
+            "hasTopConcept": _nodes[:1],
+        }
+    )
+
+
+def run_variant(variant: str, path: Path, repeat: int) -> dict:
+    """Runs a single variant in the current process and returns its measurements."""
+    _load = _load_with_skos_loader if variant == "skos_loader" else _load_with_rdflib
+    _data = path.read_text(encoding="utf-8")
+    # warm-up (imports, plugin registration of rdflib, ...)
+    _load(_data)
+    _rss_before_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    _durations = []
+    for _ in range(repeat):
+        _start = time.perf_counter()
+        _labels = _load(_data)
+        _durations.append(time.perf_counter() - _start)
+    tracemalloc.start()
+    _load(_data)
+    _, _peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "variant": variant,
+        "concepts": len(_labels),
+        "median_ms": round(statistics.median(_durations) * 1000, 2),
+        "min_ms": round(min(_durations) * 1000, 2),
+        "peak_alloc_mb": round(_peak_bytes / 1024 / 1024, 2),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "rss_growth_mb": round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - _rss_before_kb) / 1024, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    _source = parser.add_mutually_exclusive_group(required=True)
+    _source.add_argument("--input", type=Path, help="path to a vocab's index.json")
+    _source.add_argument("--synthetic", type=int, metavar="N", help="generate a synthetic vocab with N concepts")
+    parser.add_argument("--repeat", type=int, default=5, help="number of timed runs per variant (default: 5)")
+    parser.add_argument("--variant", choices=VARIANTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(run_variant(args.variant, args.input, args.repeat)))
+        return
+
+    with tempfile.TemporaryDirectory() as _tmp_dir:
+        _path = args.input
+        if _path is None:
+            _path = Path(_tmp_dir) / "index.json"
+            _path.write_text(build_synthetic_vocab(args.synthetic), encoding="utf-8")
+        _results = []
+        for _variant in VARIANTS:
+            _output = subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.bench_skos_loader",
+                    "--input",
+                    str(_path),
+                    "--repeat",
+                    str(args.repeat),
+                    "--variant",
+                    _variant,
+                ],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            _results.append(json.loads(_output.strip().splitlines()[-1]))
+
+    print(f"input: {_path.name if args.input else f'synthetic vocab ({args.synthetic} concepts)'}, {args.repeat} runs")
+    _columns = list(_results[0].keys())
+    print(" | ".join(f"{_column:>14}" for _column in _columns))
+    for _result in _results:
+        print(" | ".join(f"{_result[_column]!s:>14}" for _column in _columns))
+    _fast, _slow = _results
+    if _fast["concepts"] != _slow["concepts"]:
+        print(
+            f"WARNING: the variants found a different number of concepts ({_fast['concepts']} vs. {_slow['concepts']})"
+        )
+    print(f"speed-up: {_slow['median_ms'] / max(_fast['median_ms'], 0.001):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
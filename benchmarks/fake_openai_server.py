@@ -0,0 +1,391 @@
+"""
+Local stand-in for the parts of the OpenAI API that are used by the topic tree generator.
+
+It answers chat completions with deterministic topics (derived from the prompt templates in ``src/prompts.py``)
+and implements the Files and Batch API, so that the bulk mode (``src/bulk_generation.py``) and the benchmarks
+can run without network access and without costs.
+
+Usage (from the repository root)::
+
+    python -m benchmarks.fake_openai_server --port 8765
+    OPENAI_API_KEY=sk-fake OPENAI_BASE_URL=http://127.0.0.1:8765/v1 uvicorn main:app
+
+Environment variables:
+
+- ``FAKE_OPENAI_LATENCY_SECONDS``: latency of a chat completion until the first token (default: 0.05)
+- ``FAKE_OPENAI_LATENCY_DISTRIBUTION``: distribution of the latency (default: ``constant``):
+  ``uniform`` (latency +/- spread * latency), ``normal`` (mean latency, sigma spread * latency),
+  ``lognormal`` (median latency, sigma spread, i.e. a long tail) or ``exponential`` (mean latency)
+- ``FAKE_OPENAI_LATENCY_SPREAD``: spread of the latency distribution (default: 0.5)
+- ``FAKE_OPENAI_TOKENS_PER_SECOND``: generation speed of the answers, ``0`` = instant (default: 0)
+- ``FAKE_OPENAI_BATCH_DELAY_SECONDS``: time until a batch is completed (default: 1)
+- ``FAKE_OPENAI_FAILURE_RATE``: share of batch requests that fail with HTTP 500 (default: 0)
+- ``FAKE_OPENAI_TRUNCATE_RATE``: share of topic answers that are cut off (``finish_reason: length``) (default: 0)
+- ``FAKE_OPENAI_ERROR_RATE``: share of chat completions that fail with HTTP 500 (default: 0)
+- ``FAKE_OPENAI_RATE_LIMIT_RATE``: share of chat completions that fail with HTTP 429 (default: 0)
+- ``FAKE_OPENAI_RETRY_AFTER_SECONDS``: ``retry-after`` header of the HTTP 429 answers (default: 1)
+- ``FAKE_OPENAI_SEED``: seed of the random generator for reproducible runs (default: none)
+
+All settings can also be passed as command line arguments (see ``--help``).
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import time
+import uuid
+from typing import AsyncIterator, Optional
+from email.parser import BytesParser
+from email.policy import default as default_email_policy
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+LATENCY_SECONDS = float(os.getenv("FAKE_OPENAI_LATENCY_SECONDS", 0.05))
+TOKENS_PER_SECOND = float(os.getenv("FAKE_OPENAI_TOKENS_PER_SECOND", 0))
+BATCH_DELAY_SECONDS = float(os.getenv("FAKE_OPENAI_BATCH_DELAY_SECONDS", 1))
+FAILURE_RATE = float(os.getenv("FAKE_OPENAI_FAILURE_RATE", 0))
+TRUNCATE_RATE = float(os.getenv("FAKE_OPENAI_TRUNCATE_RATE", 0))
+LATENCY_DISTRIBUTION = os.getenv("FAKE_OPENAI_LATENCY_DISTRIBUTION", "constant")
+LATENCY_SPREAD = float(os.getenv("FAKE_OPENAI_LATENCY_SPREAD", 0.5))
+ERROR_RATE = float(os.getenv("FAKE_OPENAI_ERROR_RATE", 0))
+RATE_LIMIT_RATE = float(os.getenv("FAKE_OPENAI_RATE_LIMIT_RATE", 0))
+RETRY_AFTER_SECONDS = float(os.getenv("FAKE_OPENAI_RETRY_AFTER_SECONDS", 1))
+
+LATENCY_DISTRIBUTIONS = ("constant", "uniform", "normal", "lognormal", "exponential")
+
+_LEVELS = {"Hauptthemen": "Hauptthema", "Unterthemen": "Unterthema", "Lehrplanthemen": "Lehrplanthema"}
+_FILLER_WORDS = "Lernende erkunden zentrale Begriffe anschaulich mit Beispielen Experimenten und Aufgaben".split()
+
+app = FastAPI(title="Fake OpenAI API")
+statistics = {"chat_completions": 0, "errors": 0, "rate_limited": 0, "batches": 0, "batch_requests": 0, "files": 0}
+_files: dict[str, dict] = {}
+_batches: dict[str, dict] = {}
+
+
+def _topics(count: int, prefix: str, words: int, first: int = 1) -> list[dict]:
+    return [
+        {
+            "title": f"{prefix} {_number}",
+            "shorttitle": f"{prefix[:12]} {_number}",
+            "description": " ".join(
+                [f"{prefix} {_number}:"] + [_FILLER_WORDS[_i % len(_FILLER_WORDS)] for _i in range(words)]
+            ),
+            "keywords": [prefix.lower(), f"schlagwort {_number}", "themenbaum"],
+        }
+        for _number in range(first, first + count)
+    ]
+
+
+def fake_completion_content(messages: list[dict], wrap_topics: bool = False) -> str:
+    """
+    Erzeugt eine (deterministische) Antwort passend zum Prompt-Template der letzten User-Nachricht.
+    Mit ``wrap_topics`` haben Themenlisten die Form ``{"topics": [...]}`` (wie bei Structured Outputs).
+    """
+    prompt = messages[-1]["content"]
+    # follow-up request for the topics that were missing in the previous answer (MISSING_TOPICS_PROMPT_TEMPLATE)
+    _missing = re.search(r"Es fehlen noch (\d+) Themen", prompt)
+    if _missing and len(messages) >= 3:
+        _delivered = len(_parse_topics(messages[-2]["content"]))
+        return _fake_topics_content(messages[-3]["content"], wrap_topics, int(_missing.group(1)), _delivered + 1)
+    return _fake_topics_content(prompt, wrap_topics)
+
+
+def _parse_topics(content: str) -> list:
+    _data = json.loads(content)
+    return _data["topics"] if isinstance(_data, dict) else _data
+
+
+def _fake_topics_content(prompt: str, wrap_topics: bool, count: Optional[int] = None, first: int = 1) -> str:
+    _words = re.search(r"MAXIMAL (\d+) Wörter", prompt)
+    _words = max(int(_words.group(1)) - 2, 1) if _words else 20
+    _batched = re.search(r"jeweils eine Liste von (\d+) (Unterthemen|Lehrplanthemen)", prompt)
+    if _batched:
+        _count, _level = int(_batched.group(1)), _LEVELS[_batched.group(2)]
+        return json.dumps(
+            {
+                _key: _topics(_count, f"{_level} zu {_parent}", _words)
+                for _key, _parent in re.findall(r'^(\d+): "(.+)"$', prompt, re.MULTILINE)
+            },
+            ensure_ascii=False,
+        )
+    _single = re.search(r"Liste von (\d+) (Hauptthemen|Unterthemen|Lehrplanthemen)", prompt)
+    if _single:
+        _count, _level = count or int(_single.group(1)), _LEVELS[_single.group(2)]
+        _parent = re.search(r'übergeordnete (?:Haupt|Unter)thema "(.+?)"', prompt)
+        _prefix = f"{_level} zu {_parent.group(1)}" if _parent else _level
+        _result = _topics(_count, _prefix, _words, first)
+        return json.dumps({"topics": _result} if wrap_topics else _result, ensure_ascii=False)
+    return " ".join(_FILLER_WORDS[_i % len(_FILLER_WORDS)] for _i in range(_words))
+
+
+def _chat_completion(body: dict) -> dict:
+    _response_format = body.get("response_format") or {}
+    _wrap_topics = (_response_format.get("json_schema") or {}).get("name") == "topics"
+    content = fake_completion_content(body["messages"], _wrap_topics)
+    _finish_reason = "stop"
+    if content.startswith(("[", "{")) and random.random() < TRUNCATE_RATE:
+        content = content[: int(len(content) * random.uniform(0.3, 0.9))]
+        _finish_reason = "length"
+    _prompt_tokens = sum(len(str(_message.get("content", ""))) for _message in body["messages"]) // 4
+    _completion_tokens = len(content) // 4
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body["model"],
+        "choices": [
+            {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": _finish_reason}
+        ],
+        "usage": {
+            "prompt_tokens": _prompt_tokens,
+            "completion_tokens": _completion_tokens,
+            "total_tokens": _prompt_tokens + _completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": 0},
+        },
+    }
+
+
+@app.get("/v1/models")
+async def list_models() -> dict:
+    return {"object": "list", "data": [{"id": "gpt-4.1-mini", "object": "model", "created": 0, "owned_by": "fake"}]}
+
+
+def _generation_seconds(content: str) -> float:
+    return len(content) / 4 / TOKENS_PER_SECOND if TOKENS_PER_SECOND > 0 else 0.0
+
+
+async def _stream_chat_completion(completion: dict, include_usage: bool) -> AsyncIterator[str]:
+    content = completion["choices"][0]["message"]["content"]
+    # chunks of ~4 tokens, sent at the configured generation speed
+    _chunks = [content[_start : _start + 16] for _start in range(0, len(content), 16)]
+    _base = {"id": completion["id"], "object": "chat.completion.chunk", "created": completion["created"]}
+    _base["model"] = completion["model"]
+    for _index, _chunk in enumerate(_chunks):
+        _delta = {"role": "assistant", "content": _chunk} if _index == 0 else {"content": _chunk}
+        yield f"data: {json.dumps({**_base, 'choices': [{'index': 0, 'delta': _delta, 'finish_reason': None}]})}\n\n"
+        await asyncio.sleep(_generation_seconds(_chunk))
+    _finish_reason = completion["choices"][0]["finish_reason"]
+    yield f"data: {json.dumps({**_base, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': _finish_reason}]})}\n\n"
+    if include_usage:
+        yield f"data: {json.dumps({**_base, 'choices': [], 'usage': completion['usage']})}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+def sample_latency() -> float:
+    """Latency until the first token according to ``LATENCY_DISTRIBUTION`` (never negative)."""
+    if LATENCY_DISTRIBUTION == "uniform":
+        return max(random.uniform(LATENCY_SECONDS * (1 - LATENCY_SPREAD), LATENCY_SECONDS * (1 + LATENCY_SPREAD)), 0.0)
+    if LATENCY_DISTRIBUTION == "normal":
+        return max(random.gauss(LATENCY_SECONDS, LATENCY_SECONDS * LATENCY_SPREAD), 0.0)
+    if LATENCY_DISTRIBUTION == "lognormal":
+        return random.lognormvariate(math.log(LATENCY_SECONDS), LATENCY_SPREAD) if LATENCY_SECONDS > 0 else 0.0
+    if LATENCY_DISTRIBUTION == "exponential":
+        return random.expovariate(1 / LATENCY_SECONDS) if LATENCY_SECONDS > 0 else 0.0
+    return LATENCY_SECONDS
+
+
+def _error_response(status_code: int, message: str, error_type: str, headers: Optional[dict] = None) -> JSONResponse:
+    # same body as the OpenAI API, so that the SDK raises the matching exception (RateLimitError, InternalServerError)
+    return JSONResponse(
+        status_code=status_code,
+        content={"error": {"message": message, "type": error_type, "param": None, "code": None}},
+        headers=headers,
+    )
+
+
+@app.post("/v1/chat/completions")
+async def create_chat_completion(request: Request):
+    statistics["chat_completions"] += 1
+    body = await request.json()
+    await asyncio.sleep(sample_latency())
+    _failure = random.random()
+    if _failure < RATE_LIMIT_RATE:
+        statistics["rate_limited"] += 1
+        return _error_response(429, "Rate limit reached (fake)", "requests", {"retry-after": str(RETRY_AFTER_SECONDS)})
+    if _failure < RATE_LIMIT_RATE + ERROR_RATE:
+        statistics["errors"] += 1
+        return _error_response(500, "The server had an error (fake)", "server_error")
+    completion = _chat_completion(body)
+    if body.get("stream"):
+        _include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+        return StreamingResponse(_stream_chat_completion(completion, _include_usage), media_type="text/event-stream")
+    await asyncio.sleep(_generation_seconds(completion["choices"][0]["message"]["content"]))
+    return completion
+
+
+def _store_file(filename: str, purpose: str, content: bytes) -> dict:
+    _file = {
+        "id": f"file-{uuid.uuid4().hex}",
+        "object": "file",
+        "bytes": len(content),
+        "created_at": int(time.time()),
+        "filename": filename,
+        "purpose": purpose,
+        "status": "processed",
+    }
+    _files[_file["id"]] = {**_file, "content": content}
+    return _file
+
+
+@app.post("/v1/files")
+async def upload_file(request: Request) -> dict:
+    statistics["files"] += 1
+    # multipart/form-data is parsed with the standard library (no python-multipart needed)
+    _message = BytesParser(policy=default_email_policy).parsebytes(
+        f"Content-Type: {request.headers['content-type']}\r\n\r\n".encode() + await request.body()
+    )
+    _fields = {_part.get_param("name", header="content-disposition"): _part for _part in _message.iter_parts()}
+    if "file" not in _fields:
+        raise HTTPException(status_code=400, detail="missing file")
+    return _store_file(
+        filename=_fields["file"].get_filename() or "upload.jsonl",
+        purpose=_fields["purpose"].get_content().strip() if "purpose" in _fields else "batch",
+        content=_fields["file"].get_payload(decode=True),
+    )
+
+
+@app.get("/v1/files/{file_id}/content")
+async def download_file(file_id: str) -> Response:
+    if file_id not in _files:
+        raise HTTPException(status_code=404, detail="file not found")
+    return Response(content=_files[file_id]["content"], media_type="application/octet-stream")
+
+
+async def _process_batch(batch: dict) -> None:
+    _requests = [
+        json.loads(_line)
+        for _line in _files[batch["input_file_id"]]["content"].decode("utf-8").splitlines()
+        if _line.strip()
+    ]
+    # like the OpenAI API: the validation fails if the input file contains requests for more than one model
+    _models = sorted({_request["body"].get("model", "") for _request in _requests})
+    if len(_models) > 1:
+        batch["status"] = "failed"
+        batch["failed_at"] = int(time.time())
+        batch["errors"] = {
+            "object": "list",
+            "data": [
+                {
+                    "code": "mismatched_model",
+                    "message": f"All requests in the input file must use the same model, found: {', '.join(_models)}",
+                    "param": "body.model",
+                    "line": None,
+                }
+            ],
+        }
+        return
+    batch["status"] = "in_progress"
+    batch["in_progress_at"] = int(time.time())
+    await asyncio.sleep(BATCH_DELAY_SECONDS)
+    _output, _errors = [], []
+    for _request in _requests:
+        statistics["batch_requests"] += 1
+        if random.random() < FAILURE_RATE:
+            _errors.append(
+                {
+                    "id": f"batch_req_{uuid.uuid4().hex}",
+                    "custom_id": _request["custom_id"],
+                    "response": {"status_code": 500, "request_id": uuid.uuid4().hex, "body": {"error": "fake"}},
+                    "error": None,
+                }
+            )
+            continue
+        _output.append(
+            {
+                "id": f"batch_req_{uuid.uuid4().hex}",
+                "custom_id": _request["custom_id"],
+                "response": {
+                    "status_code": 200,
+                    "request_id": uuid.uuid4().hex,
+                    "body": _chat_completion(_request["body"]),
+                },
+                "error": None,
+            }
+        )
+    if _output:
+        batch["output_file_id"] = _store_file(
+            "batch_output.jsonl",
+            "batch_output",
+            "\n".join(json.dumps(_o, ensure_ascii=False) for _o in _output).encode(),
+        )["id"]
+    if _errors:
+        batch["error_file_id"] = _store_file(
+            "batch_errors.jsonl", "batch_output", "\n".join(json.dumps(_e) for _e in _errors).encode()
+        )["id"]
+    batch["request_counts"] = {"total": len(_output) + len(_errors), "completed": len(_output), "failed": len(_errors)}
+    batch["status"] = "completed"
+    batch["completed_at"] = int(time.time())
+
+
+@app.post("/v1/batches")
+async def create_batch(request: Request) -> dict:
+    statistics["batches"] += 1
+    body = await request.json()
+    if body.get("input_file_id") not in _files:
+        raise HTTPException(status_code=400, detail="unknown input file")
+    _batch = {
+        "id": f"batch_{uuid.uuid4().hex}",
+        "object": "batch",
+        "endpoint": body["endpoint"],
+        "input_file_id": body["input_file_id"],
+        "completion_window": body.get("completion_window", "24h"),
+        "status": "validating",
+        "output_file_id": None,
+        "error_file_id": None,
+        "created_at": int(time.time()),
+        "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        "metadata": body.get("metadata"),
+    }
+    _batches[_batch["id"]] = _batch
+    _batch["_task"] = asyncio.create_task(_process_batch(_batch))
+    return {_key: _value for _key, _value in _batch.items() if not _key.startswith("_")}
+
+
+@app.get("/v1/batches/{batch_id}")
+async def retrieve_batch(batch_id: str) -> dict:
+    if batch_id not in _batches:
+        raise HTTPException(status_code=404, detail="batch not found")
+    return {_key: _value for _key, _value in _batches[batch_id].items() if not _key.startswith("_")}
+
+
+@app.get("/_statistics")
+async def get_statistics() -> dict:
+    """Anzahl der bisher beantworteten Anfragen (nicht Teil der OpenAI-API)."""
+    return statistics
+
+
+@app.post("/_statistics/reset")
+async def reset_statistics() -> dict:
+    """Setzt die Zähler zurück, z.B. zwischen zwei Benchmark-Läufen (nicht Teil der OpenAI-API)."""
+    for _key in statistics:
+        statistics[_key] = 0
+    return statistics
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI API (chat completions, files, batches)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=LATENCY_SECONDS, help="seconds until the first token")
+    parser.add_argument("--latency-distribution", choices=LATENCY_DISTRIBUTIONS, default=LATENCY_DISTRIBUTION)
+    parser.add_argument("--latency-spread", type=float, default=LATENCY_SPREAD)
+    parser.add_argument("--tokens-per-second", type=float, default=TOKENS_PER_SECOND, help="0 = instant answers")
+    parser.add_argument("--error-rate", type=float, default=ERROR_RATE, help="share of HTTP 500 answers")
+    parser.add_argument("--rate-limit-rate", type=float, default=RATE_LIMIT_RATE, help="share of HTTP 429 answers")
+    parser.add_argument("--retry-after", type=float, default=RETRY_AFTER_SECONDS, help="retry-after of HTTP 429")
+    parser.add_argument("--truncate-rate", type=float, default=TRUNCATE_RATE)
+    parser.add_argument("--seed", type=int, default=os.getenv("FAKE_OPENAI_SEED"))
+    args = parser.parse_args()
+    LATENCY_SECONDS, LATENCY_DISTRIBUTION, LATENCY_SPREAD = args.latency, args.latency_distribution, args.latency_spread
+    TOKENS_PER_SECOND, TRUNCATE_RATE = args.tokens_per_second, args.truncate_rate
+    ERROR_RATE, RATE_LIMIT_RATE, RETRY_AFTER_SECONDS = args.error_rate, args.rate_limit_rate, args.retry_after
+    if args.seed is not None:
+        random.seed(int(args.seed))
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
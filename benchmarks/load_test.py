@@ -0,0 +1,324 @@
+"""
+Load test: how many concurrent editors can one worker serve?
+
+The app (``uvicorn main:app``, one worker) runs against the local stand-in for the OpenAI API
+(``benchmarks/fake_openai_server.py``, same options as ``bench_end_to_end``). For each concurrency level, N clients
+send requests back to back for ``--duration`` seconds: ``/generate-topic-tree`` with a random size from ``--sizes``
+and, with a share of ``--description-share``, ``/generate-collection-description``. Every request has its own
+theme and bypasses the LLM cache, so that neither the cache nor the single-flight de-duplication hides the load.
+
+Reported per level (the saturation curve): completed requests per second, p50/p95/p99 latency (overall and per
+endpoint), failed requests, the maximum of open sockets of the app and its event-loop lag. Open sockets and lag are
+read from the app's ``/metrics`` (``process_open_sockets``, ``event_loop_lag_seconds``); the lag percentiles are the
+upper bounds of the histogram buckets. The level at which the throughput stops growing (less than
+``--saturation-gain``) while the p95 latency still rises is reported as the saturation point.
+
+The app is started without RPM/TPM budgets (``LLM_REQUESTS_PER_MINUTE=0``, ``LLM_TOKENS_PER_MINUTE=0``), so that the
+worker itself is measured and not the configured rate limits; ``--app-env`` overrides this. With ``--app-url``,
+an already running app is tested instead (it has to use a stand-in or a real API key, the load costs tokens!).
+
+Usage (from the repository root)::
+
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --concurrency 1 4 16 64 --duration 60 --sizes 5x3x2 10x10x5
+    python -m benchmarks.load_test --app-env LLM_MAX_CONCURRENT_CALLS=20 --output release-1.3.json
+    python -m benchmarks.load_test --compare release-1.3.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.bench_end_to_end import (
+    APP_ENVIRONMENT,
+    add_fake_server_arguments,
+    free_port,
+    parse_size,
+    start_fake_server,
+    wait_until_ready,
+)
+
+DEFAULT_CONCURRENCY = (1, 2, 4, 8, 16, 32)
+DEFAULT_SIZES = ("3x2x2", "5x3x2", "10x5x3")
+KINDS = ("tree", "description")
+COLUMNS = ("clients", "requests", "failed", "rps", "p50", "p95", "p99", "sockets", "lag_p50", "lag_p99", "lag_max")
+
+# measure the worker, not the rate limit budgets of the default configuration
+LOAD_TEST_APP_ENVIRONMENT = {**APP_ENVIRONMENT, "LLM_REQUESTS_PER_MINUTE": "0", "LLM_TOKENS_PER_MINUTE": "0"}
+
+_SAMPLE_PATTERN = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$")
+
+
+def parse_metrics(text: str) -> Dict[Tuple[str, str], float]:
+    """Parses the Prometheus text format into ``{(name, labels): value}`` (comments are skipped)."""
+    samples = {}
+    for _line in text.splitlines():
+        _match = _SAMPLE_PATTERN.match(_line)
+        if _match:
+            samples[(_match.group(1), _match.group(2) or "")] = float(_match.group(3))
+    return samples
+
+
+def lag_summary(before: Dict[Tuple[str, str], float], after: Dict[Tuple[str, str], float]) -> Dict[str, float]:
+    """
+    p50/p99 (upper bucket bounds) and the largest bucket of ``event_loop_lag_seconds`` between two scrapes.
+    Empty if the app does not measure the lag (e.g. ``EVENT_LOOP_LAG_INTERVAL_SECONDS=0``).
+    """
+    _buckets = sorted(
+        (float(_labels.split('"')[1]), _value - before.get((_name, _labels), 0.0))
+        for (_name, _labels), _value in after.items()
+        if _name == "event_loop_lag_seconds_bucket"
+    )
+    _count = _buckets[-1][1] if _buckets else 0
+    if not _count:
+        return {}
+    summary = {}
+    for _key, _share in (("lag_p50", 0.5), ("lag_p99", 0.99)):
+        _rank = max(math.ceil(_share * _count), 1)
+        summary[_key] = next(_bound for _bound, _cumulative in _buckets if _cumulative >= _rank)
+    # the largest bucket that received an observation (cumulative counts: the first bucket that reaches the total)
+    summary["lag_max"] = next(_bound for _bound, _cumulative in _buckets if _cumulative >= _count)
+    return summary
+
+
+def percentile(values: List[float], share: float) -> float:
+    """Nearest-rank percentile (0 for no values)."""
+    if not values:
+        return 0.0
+    _sorted = sorted(values)
+    return _sorted[max(math.ceil(share * len(_sorted)), 1) - 1]
+
+
+class LoadGenerator:
+    """Sends the requests of the simulated editors and collects latencies per endpoint."""
+
+    def __init__(self, client: httpx.AsyncClient, sizes: List[str], description_share: float, seed: int):
+        self.client = client
+        self.sizes = [parse_size(_size) for _size in sizes]
+        self.description_share = description_share
+        self.random = random.Random(seed)
+        self._request_number = 0
+
+    def next_request(self) -> Tuple[str, str, dict]:
+        self._request_number += 1
+        # own theme per request: identical requests would be coalesced by the single flight
+        _theme = f"Lasttest {self._request_number}"
+        if self.random.random() < self.description_share:
+            _body = {"text_context": f"{_theme}: Physik für die Sekundarstufe I", "bypass_cache": True}
+            return "description", "/generate-collection-description", _body
+        return "tree", "/generate-topic-tree", {"theme": _theme, **self.random.choice(self.sizes), "bypass_cache": True}
+
+    async def _client_loop(self, deadline: float, latencies: Dict[str, List[float]], failures: List[str]) -> None:
+        while time.monotonic() < deadline:
+            _kind, _path, _body = self.next_request()
+            _start = time.perf_counter()
+            try:
+                response = await self.client.post(_path, json=_body)
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                failures.append(f"{_path}: {e!r}")
+                continue
+            latencies[_kind].append(time.perf_counter() - _start)
+
+    async def run_level(self, concurrency: int, duration: float, sample_interval: float) -> dict:
+        """Runs ``concurrency`` clients for ``duration`` seconds (started requests are completed) and measures them."""
+        latencies: Dict[str, List[float]] = {_kind: [] for _kind in KINDS}
+        failures: List[str] = []
+        _metrics_before = await self.scrape_metrics()
+        _start = time.perf_counter()
+        _deadline = time.monotonic() + duration
+        _clients = [asyncio.create_task(self._client_loop(_deadline, latencies, failures)) for _ in range(concurrency)]
+        _max_sockets = 0
+        while not all(_client.done() for _client in _clients):
+            await asyncio.wait(_clients, timeout=sample_interval)
+            _max_sockets = max(_max_sockets, (await self.scrape_metrics()).get(("process_open_sockets", ""), 0))
+        _elapsed = time.perf_counter() - _start
+        _all = latencies["tree"] + latencies["description"]
+        result = {
+            "clients": concurrency,
+            "requests": len(_all),
+            "failed": len(failures),
+            "rps": len(_all) / _elapsed,
+            "p50": percentile(_all, 0.5),
+            "p95": percentile(_all, 0.95),
+            "p99": percentile(_all, 0.99),
+            "sockets": int(_max_sockets),
+            **lag_summary(_metrics_before, await self.scrape_metrics()),
+            "by_endpoint": {
+                _kind: {
+                    "requests": len(latencies[_kind]),
+                    "p50": percentile(latencies[_kind], 0.5),
+                    "p95": percentile(latencies[_kind], 0.95),
+                    "p99": percentile(latencies[_kind], 0.99),
+                }
+                for _kind in KINDS
+            },
+        }
+        if failures:
+            result["first_failure"] = failures[0]
+        return result
+
+    async def scrape_metrics(self) -> Dict[Tuple[str, str], float]:
+        try:
+            response = await self.client.get("/metrics")
+            response.raise_for_status()
+        except httpx.HTTPError:
+            return {}
+        return parse_metrics(response.text)
+
+
+def find_saturation(levels: List[dict], min_gain: float) -> Optional[int]:
+    """First concurrency level whose throughput grew by less than ``min_gain`` while the p95 latency rose."""
+    for _previous, _level in zip(levels, levels[1:]):
+        if _previous["rps"] and _level["rps"] < _previous["rps"] * (1 + min_gain) and _level["p95"] > _previous["p95"]:
+            return _level["clients"]
+    return None
+
+
+def print_row(values: dict) -> None:
+    _cells = []
+    for _column in COLUMNS:
+        _value = values.get(_column, "-")
+        _cells.append(f"{_value:.3f}" if isinstance(_value, float) else str(_value))
+    print(" | ".join(f"{_cell:>9}" for _cell in _cells))
+
+
+def start_app(args: argparse.Namespace, port: int) -> subprocess.Popen:
+    """Starts ``uvicorn main:app`` (one worker) against the stand-in server."""
+    _environment = {
+        **os.environ,
+        **LOAD_TEST_APP_ENVIRONMENT,
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{args.fake_port}/v1",
+        **dict(_setting.split("=", 1) for _setting in args.app_env),
+    }
+    _log = open(args.app_log, "w") if args.app_log else subprocess.DEVNULL
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--workers", "1"],
+        env=_environment,
+        stdout=_log,
+        stderr=subprocess.STDOUT,
+    )
+    wait_until_ready(process, f"http://127.0.0.1:{port}/_ping", "app")
+    return process
+
+
+async def run_load_test(args: argparse.Namespace, app_url: str) -> List[dict]:
+    # one connection per client, requests of a level may take minutes
+    _connections = max(args.concurrency) + 1
+    _limits = httpx.Limits(max_connections=_connections, max_keepalive_connections=_connections)
+    async with httpx.AsyncClient(base_url=app_url, timeout=args.timeout, limits=_limits) as client:
+        generator = LoadGenerator(client, args.sizes, args.description_share, args.seed)
+        # warm-up (connection pool of the app, serializers): not measured
+        await client.post("/generate-topic-tree", json={"theme": "Aufwärmen", **parse_size(args.sizes[0])})
+        levels = []
+        for _concurrency in args.concurrency:
+            levels.append(await generator.run_level(_concurrency, args.duration, args.sample_interval))
+            print_row(levels[-1])
+        return levels
+
+
+def compare(levels: List[dict], baseline: List[dict]) -> None:
+    """Prints throughput and p95 latency per concurrency level next to those of an earlier run."""
+    _baseline = {_level["clients"]: _level for _level in baseline}
+    print(f"{'clients':>9} | {'rps':>17} | {'p95':>17}")
+    for _level in levels:
+        _previous = _baseline.get(_level["clients"])
+        if _previous is None:
+            continue
+        _rps = f"{_level['rps']:.2f} ({_level['rps'] / max(_previous['rps'], 1e-9) - 1:+.0%})"
+        _p95 = f"{_level['p95']:.2f} ({_level['p95'] / max(_previous['p95'], 1e-9) - 1:+.0%})"
+        print(f"{_level['clients']:>9} | {_rps:>17} | {_p95:>17}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--concurrency",
+        nargs="+",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"numbers of concurrent clients (default: {' '.join(map(str, DEFAULT_CONCURRENCY))})",
+    )
+    parser.add_argument("--duration", type=float, default=30, help="seconds per concurrency level (default: 30)")
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        default=DEFAULT_SIZES,
+        metavar="MAINxSUBxLP",
+        help=f"tree sizes, chosen at random (default: {' '.join(DEFAULT_SIZES)})",
+    )
+    parser.add_argument(
+        "--description-share",
+        type=float,
+        default=0.3,
+        help="share of /generate-collection-description requests (default: 0.3)",
+    )
+    parser.add_argument("--timeout", type=float, default=600, help="timeout of a single request (default: 600)")
+    parser.add_argument(
+        "--sample-interval", type=float, default=1, help="seconds between two /metrics samples (default: 1)"
+    )
+    parser.add_argument(
+        "--saturation-gain",
+        type=float,
+        default=0.1,
+        help="minimum throughput gain per level before the app counts as saturated (default: 0.1 = 10%%)",
+    )
+    parser.add_argument("--app-url", help="tests an already running app instead of starting one")
+    parser.add_argument(
+        "--app-env",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="environment variable of the started app (repeatable), e.g. LLM_MAX_CONCURRENT_CALLS=20",
+    )
+    parser.add_argument("--app-log", type=Path, help="writes the log of the started app to this file")
+    add_fake_server_arguments(parser)
+    parser.add_argument("--output", type=Path, help="writes the saturation curve as JSON")
+    parser.add_argument("--compare", type=Path, help="saturation curve of an earlier run (--output) to compare against")
+    args = parser.parse_args(argv)
+
+    processes: List[subprocess.Popen] = []
+    try:
+        if args.app_url:
+            app_url = args.app_url.rstrip("/")
+        else:
+            args.fake_port = args.fake_port or free_port()
+            processes.append(start_fake_server(args))
+            _app_port = free_port()
+            processes.append(start_app(args, _app_port))
+            app_url = f"http://127.0.0.1:{_app_port}"
+        print(
+            f"{args.duration:.0f}s per level against {app_url}; sizes {' '.join(args.sizes)}, "
+            f"{args.description_share:.0%} descriptions; latencies and lag in seconds"
+        )
+        print(" | ".join(f"{_column:>9}" for _column in COLUMNS))
+        levels = asyncio.run(run_load_test(args, app_url))
+    finally:
+        for _process in reversed(processes):
+            _process.terminate()
+            _process.wait()
+
+    _saturation = find_saturation(levels, args.saturation_gain)
+    if _saturation is None:
+        print("no saturation within the tested concurrency levels")
+    else:
+        print(f"saturated at {_saturation} concurrent clients (max. {max(_l['rps'] for _l in levels):.2f} requests/s)")
+    if args.output:
+        args.output.write_text(json.dumps({"saturated_at": _saturation, "levels": levels}, indent=2))
+    if args.compare:
+        compare(levels, json.loads(args.compare.read_text())["levels"])
+
+
+if __name__ == "__main__":
+    main()
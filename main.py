@@ -1,23 +1,67 @@
 import asyncio
-import os
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
+from typing import Annotated, List, Optional
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from loguru import logger
 from openai import AsyncOpenAI
 from openai.types.chat import ChatCompletionSystemMessageParam, ChatCompletionUserMessageParam
 
+from src.DTOs.cache_statistics import CacheStatistics
 from src.DTOs.collection import Collection
 from src.DTOs.description_request import DescriptionRequest
-from src.DTOs.enhanced_response import EnhancedTopicTreeResponse, GenerationMetadata
+from src.DTOs.enhanced_response import EnhancedTopicTreeResponse
+from src.DTOs.parse_statistics import ParseStatistics
 from src.DTOs.ping import Ping
-from src.DTOs.properties import Properties
+from src.DTOs.topic_tree_bulk import TopicTreeBulkRequest
+from src.DTOs.topic_tree_expansion import TopicTreeExpansionRequest
+from src.DTOs.topic_tree_job import TopicTreeJob, TopicTreeJobStatus
 from src.DTOs.topic_tree_request import TopicTreeRequest
-from src.prompts import MAIN_PROMPT_TEMPLATE, SUB_PROMPT_TEMPLATE, LP_PROMPT_TEMPLATE, DESCRIPTION_PROMPT_TEMPLATE
-from src.structured_text_helper import generate_structured_text
-from src.text_statistics_helper import add_text_statistics_to_collections, calculate_overall_statistics
-from src.vocab_helper import get_educational_context_pref_labels, get_discipline_pref_labels
+from src.llm_cache import close_llm_cache, configure_llm_cache, get_llm_cache
+from src.llm_client_helper import (
+    complete_chat,
+    create_openai_client,
+    get_openai_key,
+    warm_up_openai_client,
+)
+from src.llm_scheduler import configure_llm_scheduler
+from src.metrics import (
+    PROMETHEUS_CONTENT_TYPE,
+    RequestMetricsMiddleware,
+    llm_call_level,
+    metrics_registry,
+    run_event_loop_lag_monitor,
+)
+from src.vocab_helper import run_vocab_refresh_loop
+from src.prompts import DESCRIPTION_PROMPT_TEMPLATE
+from src.structured_text_helper import get_parse_statistics
+from src.topic_tree_helper import (
+    build_topic_tree_request_key,
+    expand_topic_tree,
+    generate_topic_tree_response,
+    serialize_topic_tree_response,
+    stream_topic_tree_bulk_events,
+    stream_topic_tree_events,
+    topic_tree_single_flight,
+)
+from src.topic_tree_jobs import (
+    TopicTreeJobQueue,
+    TopicTreeJobQueueFullError,
+    get_topic_tree_job_queue,
+    start_topic_tree_job_queue,
+    stop_topic_tree_job_queue,
+)
+from src.topic_tree_store import (
+    TopicTreeStore,
+    close_topic_tree_store,
+    configure_topic_tree_store,
+    find_subtree,
+    get_topic_tree_store,
+    store_topic_tree,
+)
 
 # ToDo: replace / remove unnecessary dependencies
 #  - replace "backoff" dependency since its unmaintained / abandonware
@@ -38,17 +82,90 @@ from src.vocab_helper import get_educational_context_pref_labels, get_discipline
 load_dotenv()
 
 
-def get_openai_key():
-    """Liest den OpenAI-API-Key aus den Umgebungsvariablen."""
-    return os.getenv("OPENAI_API_KEY", "")
-
-
 # Erlaubt, dass das Collection-Modell sich selbst referenziert (subcollections)
 Collection.model_rebuild()
 # ToDo: figure out why model_rebuild() is called here
 
 API_VERSION = "1.2.5"
 
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """
+    Erstellt beim Start einen prozessweit geteilten OpenAI-Client (inkl. Connection-Pool und Warm-up)
+    sowie den LLM-Scheduler, den LLM-Cache und den Themenbaum-Speicher und schließt sie beim Herunterfahren wieder.
+    Die Vokabulare (Fach, Bildungsstufe) werden im Hintergrund aktualisiert, ohne den Start zu blockieren;
+    ebenfalls im Hintergrund wird die Verzögerung der Event-Loop gemessen (``/metrics``).
+    Die Worker für Themenbaum-Jobs (``/jobs/topic-tree``) werden gestartet, sobald ein OpenAI-Client verfügbar ist.
+    """
+    configure_llm_scheduler()
+    configure_llm_cache()
+    configure_topic_tree_store()
+    vocab_refresh_task = asyncio.create_task(run_vocab_refresh_loop())
+    event_loop_lag_task = asyncio.create_task(run_event_loop_lag_monitor())
+    openai_key = get_openai_key()
+    if openai_key:
+        _app.state.openai_client = create_openai_client(openai_key)
+        await warm_up_openai_client(_app.state.openai_client)
+        await start_topic_tree_job_queue(_app.state.openai_client)
+    else:
+        # the endpoints will answer with HTTP 500 until a key is configured (same behaviour as before)
+        logger.warning("OPENAI_API_KEY is not set. Generation endpoints will not be available.")
+        _app.state.openai_client = None
+    yield
+    await stop_topic_tree_job_queue()
+    vocab_refresh_task.cancel()
+    event_loop_lag_task.cancel()
+    if _app.state.openai_client is not None:
+        await _app.state.openai_client.close()
+    close_llm_cache()
+    close_topic_tree_store()
+
+
+def get_openai_client(request: Request) -> AsyncOpenAI:
+    """Liefert den beim Start erstellten, geteilten OpenAI-Client (FastAPI-Dependency)."""
+    client = getattr(request.app.state, "openai_client", None)
+    if client is None:
+        raise HTTPException(status_code=500, detail="OpenAI API Key nicht gefunden")
+    return client
+
+
+def get_job_queue() -> TopicTreeJobQueue:
+    """Liefert die beim Start erstellte Warteschlange für Themenbaum-Jobs (FastAPI-Dependency)."""
+    job_queue = get_topic_tree_job_queue()
+    if job_queue is None:
+        # the queue is only started if an OpenAI API key is configured
+        raise HTTPException(status_code=500, detail="OpenAI API Key nicht gefunden")
+    return job_queue
+
+
+async def topic_tree_json_response(topic_tree: EnhancedTopicTreeResponse) -> Response:
+    """
+    Serialisiert einen generierten Themenbaum einmal direkt nach JSON (mit den ``cm:``/``ccm:``/``cclom:``-Aliasen),
+    speichert ihn im Themenbaum-Speicher und verweist per Header darauf (``X-Topic-Tree-Id``, ``Location``, ``ETag``).
+
+    Der Themenbaum besteht bereits aus validierten Modellen: Die Rückgabe als ``Response`` umgeht die erneute
+    Validierung und ``jsonable_encoder``-Konvertierung des ``response_model`` durch FastAPI.
+    """
+    content = serialize_topic_tree_response(topic_tree)
+    _stored = await store_topic_tree(topic_tree.metadata.theme, content)
+    headers = topic_tree_headers(*_stored) if _stored else {}
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+def topic_tree_headers(tree_id: str, content_hash: str) -> dict:
+    """Header, die auf einen gespeicherten Themenbaum verweisen (``X-Topic-Tree-Id``, ``Location``, ``ETag``)."""
+    return {"X-Topic-Tree-Id": tree_id, "Location": f"/topic-trees/{tree_id}", "ETag": f'"{content_hash}"'}
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Prüft, ob der ``If-None-Match``-Header eines Conditional Requests den (starken) ``etag`` enthält."""
+    if not if_none_match:
+        return False
+    _candidates = [_candidate.strip().removeprefix("W/") for _candidate in if_none_match.split(",")]
+    return "*" in _candidates or etag in _candidates
+
+
 # ------------------------------------------------------------------------------
 # 7) FastAPI App
 # ------------------------------------------------------------------------------
@@ -79,8 +196,10 @@ app = FastAPI(
     version=API_VERSION,
     contact={"name": "Themenbaum Generator Support", "email": "support@example.com"},
     license_info={"name": "Proprietär", "url": "https://example.com/license"},
+    lifespan=lifespan,
 )
 # ToDo: set (valid) contact / license information
+app.add_middleware(RequestMetricsMiddleware)
 
 
 @app.post(
@@ -150,7 +269,10 @@ app = FastAPI(
     },
     tags=["Themenbaum-Generator"],
 )
-async def generate_topic_tree(topic_tree_request: TopicTreeRequest):
+async def generate_topic_tree(
+    topic_tree_request: TopicTreeRequest,
+    client: Annotated[AsyncOpenAI, Depends(get_openai_client)],
+):
     """
     Generiert einen strukturierten Themenbaum basierend auf den Eingabeparametern.
 
@@ -163,208 +285,157 @@ async def generate_topic_tree(topic_tree_request: TopicTreeRequest):
     - ``max_description_length``: Maximale Anzahl von Wörtern für Beschreibungstexte (Default: 70, Bereich: 40-200)
     - ``discipline_uri``: Falls übergeben, werden diese URIs in den ``ccm:taxonid``-Properties eingebettet und fließen als Kontext in die AI-Prompts ein
     - ``educational_context_uri``: Falls übergeben, werden diese URIs in den ``ccm:educationalcontext``-Properties eingebettet und fließen als Kontext in die AI-Prompts ein
+    - ``subtopic_batch_size`` / ``curriculum_batch_size``: Anzahl der übergeordneten Themen, deren Unter- bzw. Lehrplanthemen in einer gemeinsamen LLM-Anfrage generiert werden (Default: 1, Bereich: 1-10)
+    - ``stream_llm_responses``: Falls True, werden die LLM-Antworten gestreamt und die Kindthemen eines Themas generiert, sobald es im Stream angekommen ist
+    - ``include_timings``: Falls True, enthält ``metadata.timings`` einen Performance-Trace (Laufzeit je Phase, LLM-Aufrufe je Ebene, Retries, Tokens und geschätzte Kosten)
+
+    Der Themenbaum wird gespeichert und ist danach unter ``/topic-trees/{tree_id}`` abrufbar
+    (ID im Header ``X-Topic-Tree-Id``).
     """
     logger.info(
         f"Request received. Starting OpenAI chat completion request with the following settings: {topic_tree_request}"
     )
-    # 1) OpenAI-Key holen
-    openai_key = get_openai_key()
-    if not openai_key:
-        raise HTTPException(status_code=500, detail="OpenAI API Key nicht gefunden")
-
+    # 1) der geteilte OpenAI-Client wird per Dependency (get_openai_client) übergeben
     try:
-        client = AsyncOpenAI(api_key=openai_key)
+        # 2) - 10) Themenbaum generieren; identische Requests, die gleichzeitig laufen, werden nur einmal generiert
+        topic_tree = await topic_tree_single_flight.do(
+            build_topic_tree_request_key(topic_tree_request),
+            lambda: generate_topic_tree_response(client=client, topic_tree_request=topic_tree_request),
+        )
+
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"OpenAI-Init-Fehler: {str(e)}")
+        logger.error(f"Unhandled Exception occured while generating topic tree: {e}")
+        raise HTTPException(status_code=500, detail=f"Fehler bei der Generierung: {str(e)}")
+    return await topic_tree_json_response(topic_tree)
 
-    try:
-        # 2) Spezialanweisungen für Hauptthemen (z.B. Allgemeines, Methodik etc.)
-        special_instructions = []
-        if topic_tree_request.include_general_topic:
-            special_instructions.append("1) Hauptthema 'Allgemeines' an erster Stelle")
-        if topic_tree_request.include_methodology_topic:
-            special_instructions.append("2) Hauptthema 'Methodik und Didaktik' an letzter Stelle")
-        special_instructions = (
-            "\n".join(special_instructions) if special_instructions else "Keine besonderen Anweisungen."
-        )
 
-        # 2a)
-        context_info = []
-        if topic_tree_request.discipline_uri:
-            context_info.append(f"Fachbereich-URIs: {', '.join(topic_tree_request.discipline_uri)}")
-            if isinstance(topic_tree_request.discipline_uri, list):
-                _discipline_set = set()
-                for _discipline_uri in topic_tree_request.discipline_uri:  # type: str
-                    _discipline_pref_labels = get_discipline_pref_labels(_discipline_uri)
-                    if _discipline_pref_labels:
-                        _discipline_set.update(_discipline_pref_labels)
-                if _discipline_set:
-                    context_info.append(f"Fachbereich: {list(_discipline_set)}")
-        if topic_tree_request.educational_context_uri:
-            context_info.append(f"Bildungsstufe-URIs: {', '.join(topic_tree_request.educational_context_uri)}")
-            if isinstance(topic_tree_request.educational_context_uri, list):
-                _edu_context_set = set()
-                for _uri in topic_tree_request.educational_context_uri:  # type: str
-                    # example _uri value: "http://w3id.org/openeduhub/vocabs/educationalContext/sekundarstufe_1"
-                    _edu_context_pref_labels = get_educational_context_pref_labels(_uri)
-                    if _edu_context_pref_labels:
-                        _edu_context_set.update(_edu_context_pref_labels)
-                if _edu_context_set:
-                    context_info.append(f"Zielgruppe / Bildungsstufe: {list(_edu_context_set)}")
-        context_instructions = f"Kontext-Informationen:\n{'\n'.join(context_info)}" if context_info else ""
-
-        logger.info(f"Generating {topic_tree_request.num_main_topics} main topics ('Hauptthemen') ...")
-
-        # 3) Hauptthemen generieren
-        main_topics = await generate_structured_text(
-            client=client,
-            prompt=MAIN_PROMPT_TEMPLATE.format(
-                themenbaumthema=topic_tree_request.theme,
-                num_main=topic_tree_request.num_main_topics,
-                special_instructions=special_instructions,
-                context_instructions=context_instructions,
-                max_description_length=topic_tree_request.max_description_length,
-            ),
-            model=topic_tree_request.model,
-        )
-        # ToDo: extend generate_structured_text() function to include context_instructions
-
-        if not main_topics:
-            raise HTTPException(status_code=500, detail="Fehler bei der Generierung der Hauptthemen")
-
-        logger.info("Received main topics ('Hauptthemen'). Beginning generation of sub topics ('Unterthemen') next.")
-
-        # 4) Für jedes Hauptthema die Unterthemen generieren
-        # 4a) Erstelle Liste der existierenden Hauptthemen für Kontext
-        existing_main_topics_list = [f"- {topic.title}" for topic in main_topics]
-        existing_main_topics_formatted = "\n".join(existing_main_topics_list) if existing_main_topics_list else "Keine weiteren Hauptthemen vorhanden."
-        
-        sub_topic_tasks = []
-        for main_topic in main_topics:
-            logger.info(f"Creating subtopic ('Unterthemen') task for '{main_topic.title}'")
-            _subtopic_prompt = SUB_PROMPT_TEMPLATE.format(
-                themenbaumthema=topic_tree_request.theme,
-                main_theme=main_topic.title,
-                num_sub=topic_tree_request.num_subtopics,
-                context_instructions=context_instructions,
-                existing_main_topics=existing_main_topics_formatted,
-                max_description_length=topic_tree_request.max_description_length,
-            )
-            _task = generate_structured_text(
-                client=client,
-                prompt=_subtopic_prompt,
-                model=topic_tree_request.model,
-            )
-            sub_topic_tasks.append(_task)
-
-        sub_topic_results = await asyncio.gather(*sub_topic_tasks)
-
-        for i, main_topic in enumerate(main_topics):
-            sub_topics = sub_topic_results[i]
-            if sub_topics:
-                main_topic.subcollections = sub_topics
-
-        logger.info("Received subtopics ('Unterthemen'). Beginning generation of curriculum ('Lehrplan') next.")
-
-        # 5) Für jedes Unterthema die Lehrplanthemen generieren
-        lp_tasks = []
-        lp_mapping = []  # List to track which main_topic and sub_topic each task corresponds to
-
-        for main_topic in main_topics:
-            # 5a) Erstelle Liste der existierenden Unterthemen für Kontext
-            existing_subtopics_list = [f"- {subtopic.title}" for subtopic in main_topic.subcollections]
-            existing_subtopics_formatted = "\n".join(existing_subtopics_list) if existing_subtopics_list else "Keine weiteren Unterthemen vorhanden."
-            
-            for sub_topic in main_topic.subcollections:
-                logger.info(f"Generating curriculum ('Lehrplan') task for '{sub_topic.title}'")
-                _lp_prompt = LP_PROMPT_TEMPLATE.format(
-                    themenbaumthema=topic_tree_request.theme,
-                    main_theme=main_topic.title,
-                    sub_theme=sub_topic.title,
-                    num_lp=topic_tree_request.num_curriculum_topics,
-                    context_instructions=context_instructions,
-                    existing_main_topics=existing_main_topics_formatted,
-                    existing_subtopics=existing_subtopics_formatted,
-                    max_description_length=topic_tree_request.max_description_length,
-                )
-                _lp_task = generate_structured_text(
-                    client=client,
-                    prompt=_lp_prompt,
-                    model=topic_tree_request.model,
-                )
-                lp_tasks.append(_lp_task)
-                lp_mapping.append((main_topic, sub_topic))
-
-        lp_results = await asyncio.gather(*lp_tasks)
-
-        for i, (main_topic, sub_topic) in enumerate(lp_mapping):
-            lp_topics = lp_results[i]
-            if lp_topics:
-                sub_topic.subcollections = lp_topics
-
-        # 6) Properties für alle Knoten nochmal updaten mit den (ggf.) übergebenen URIs
-        for main_topic in main_topics:
-            main_topic.properties = Properties(
-                cm_title=[main_topic.title],
-                ccm_collectionshorttitle=[main_topic.shorttitle],
-                cm_description=main_topic.properties.cm_description,
-                cclom_general_keyword=main_topic.properties.cclom_general_keyword,
-                ccm_taxonid=topic_tree_request.discipline_uri or [],
-                ccm_educationalcontext=topic_tree_request.educational_context_uri or [],
-            )
+@app.post(
+    "/generate-topic-tree/stream",
+    summary="Generiere einen Themenbaum (Streaming)",
+    description="""
+    Generiert einen Themenbaum wie ``/generate-topic-tree``, liefert die Knoten aber als
+    [NDJSON](https://github.com/ndjson/ndjson-spec)-Stream (``application/x-ndjson``), sobald sie generiert wurden.
+
+    Jede Zeile ist ein eigenständiges JSON-Objekt:
+    - ``{"type": "node", ...}``: ein Haupt-, Unter- oder Lehrplanthema inkl. ``path`` (Titel der übergeordneten Knoten)
+      und ``index_path`` (Position im Themenbaum). Subcollections werden als eigene ``node``-Events gesendet.
+    - ``{"type": "complete", ...}``: letzte Zeile mit ``metadata`` und ``statistics`` der Generierung sowie
+      ``tree_id`` des gespeicherten Themenbaums (abrufbar unter ``/topic-trees/{tree_id}``)
+    - ``{"type": "error", ...}``: letzte Zeile, falls die Generierung abgebrochen werden musste
+    """,
+    responses={
+        200: {
+            "description": "NDJSON-Stream der generierten Knoten",
+            "content": {"application/x-ndjson": {}},
+        },
+        500: {
+            "description": "Interner Serverfehler",
+            "content": {"application/json": {"example": {"detail": "OpenAI API Key nicht gefunden"}}},
+        },
+    },
+    tags=["Themenbaum-Generator"],
+)
+async def generate_topic_tree_stream(
+    topic_tree_request: TopicTreeRequest, client: Annotated[AsyncOpenAI, Depends(get_openai_client)]
+) -> StreamingResponse:
+    """
+    Streamt die Knoten eines Themenbaums, sobald die jeweilige Generierungsanfrage abgeschlossen ist.
+    Die Parameter entsprechen denen von ``/generate-topic-tree``.
+    """
+    logger.info(f"Streaming request received with the following settings: {topic_tree_request}")
+    return StreamingResponse(
+        stream_topic_tree_events(client=client, topic_tree_request=topic_tree_request),
+        media_type="application/x-ndjson",
+    )
 
-            for sub_topic in main_topic.subcollections:
-                sub_topic.properties = Properties(
-                    cm_title=[sub_topic.title],
-                    ccm_collectionshorttitle=[sub_topic.shorttitle],
-                    cm_description=sub_topic.properties.cm_description,
-                    cclom_general_keyword=sub_topic.properties.cclom_general_keyword,
-                    ccm_taxonid=topic_tree_request.discipline_uri or [],
-                    ccm_educationalcontext=topic_tree_request.educational_context_uri or [],
-                )
-
-                for lp_topic in sub_topic.subcollections:
-                    lp_topic.properties = Properties(
-                        cm_title=[lp_topic.title],
-                        ccm_collectionshorttitle=[lp_topic.shorttitle],
-                        cm_description=lp_topic.properties.cm_description,
-                        cclom_general_keyword=lp_topic.properties.cclom_general_keyword,
-                        ccm_taxonid=topic_tree_request.discipline_uri or [],
-                        ccm_educationalcontext=topic_tree_request.educational_context_uri or [],
-                    )
-
-        # 7) Textstatistiken zu allen Collections hinzufügen
-        add_text_statistics_to_collections(main_topics)
-        
-        # 8) Gesamtstatistiken berechnen
-        overall_statistics = calculate_overall_statistics(main_topics)
-        
-        # 9) Metadaten für die Generierung erstellen
-        generation_metadata = GenerationMetadata(
-            theme=topic_tree_request.theme,
-            model=topic_tree_request.model,
-            num_main_topics=topic_tree_request.num_main_topics,
-            num_subtopics=topic_tree_request.num_subtopics,
-            num_curriculum_topics=topic_tree_request.num_curriculum_topics,
-            max_description_length=topic_tree_request.max_description_length,
-            include_general_topic=topic_tree_request.include_general_topic,
-            include_methodology_topic=topic_tree_request.include_methodology_topic,
-            discipline_uris=topic_tree_request.discipline_uri or [],
-            educational_context_uris=topic_tree_request.educational_context_uri or []
-        )
-        
-        # 10) Finale erweiterte Antwort strukturieren
-        enhanced_response = EnhancedTopicTreeResponse(
-            metadata=generation_metadata,
-            topic_tree=main_topics,
-            statistics=overall_statistics
-        )
-        
-        return enhanced_response
 
+@app.post(
+    "/generate-topic-trees/stream",
+    summary="Generiere mehrere Themenbäume (Streaming)",
+    description="""
+    Generiert mehrere Themenbäume gemeinsam und liefert jeden als
+    [NDJSON](https://github.com/ndjson/ndjson-spec)-Zeile (``application/x-ndjson``), sobald er fertig ist.
+    Alle LLM-Aufrufe teilen sich das Concurrency- und Rate-Limit-Budget des Servers (``LLM_MAX_CONCURRENT_CALLS``,
+    ``LLM_REQUESTS_PER_MINUTE``, ``LLM_TOKENS_PER_MINUTE``), ein langsamer Themenbaum hält die übrigen also nicht auf.
+
+    Jede Zeile ist ein eigenständiges JSON-Objekt:
+    - ``{"type": "result", ...}``: ein fertiger Themenbaum inkl. ``index`` (Position in ``requests``)
+      und ``tree_id`` des gespeicherten Themenbaums (abrufbar unter ``/topic-trees/{tree_id}``)
+    - ``{"type": "error", ...}``: ein Themenbaum, der nicht generiert werden konnte
+    - ``{"type": "complete", ...}``: letzte Zeile mit der Anzahl erfolgreicher und fehlgeschlagener Themenbäume
+
+    Für sehr große Importe, die auch Verbindungsabbrüche überstehen sollen, gibt es ``/jobs/topic-trees``.
+    """,
+    responses={
+        200: {
+            "description": "NDJSON-Stream der generierten Themenbäume",
+            "content": {"application/x-ndjson": {}},
+        },
+        500: {
+            "description": "Interner Serverfehler",
+            "content": {"application/json": {"example": {"detail": "OpenAI API Key nicht gefunden"}}},
+        },
+    },
+    tags=["Themenbaum-Generator"],
+)
+async def generate_topic_trees_stream(
+    bulk_request: TopicTreeBulkRequest, client: Annotated[AsyncOpenAI, Depends(get_openai_client)]
+) -> StreamingResponse:
+    """
+    Streamt mehrere Themenbäume, sobald der jeweilige Themenbaum fertig generiert ist.
+    Die Parameter der einzelnen Themenbäume entsprechen denen von ``/generate-topic-tree``.
+    """
+    logger.info(f"Bulk request received for {len(bulk_request.requests)} topic trees")
+    return StreamingResponse(
+        stream_topic_tree_bulk_events(client=client, topic_tree_requests=bulk_request.requests),
+        media_type="application/x-ndjson",
+    )
+
+
+@app.post(
+    "/expand-topic-tree",
+    response_model=EnhancedTopicTreeResponse,
+    summary="Generiere die Kindthemen eines Knotens neu",
+    description="""
+    (Neu-)Generiert nur die Kindthemen eines einzelnen Knotens in einem bestehenden Themenbaum
+    und liefert den ergänzten Themenbaum zurück.
+
+    - ``topic_tree``: der bestehende Themenbaum (``topic_tree`` einer Antwort von ``/generate-topic-tree``)
+    - ``path``: Index-Pfad des Knotens: ``[]`` = Hauptthemen, ``[i]`` = Unterthemen des i-ten Hauptthemas,
+      ``[i, j]`` = Lehrplanthemen des j-ten Unterthemas des i-ten Hauptthemas
+
+    Die Titel der Geschwisterthemen im bestehenden Themenbaum fließen als Kontext in den Prompt ein.
+    Bestehende Kindthemen des Knotens werden ersetzt, alle übrigen Knoten bleiben unverändert.
+    So kann ein misslungener Ast neu generiert oder ein Themenbaum Ebene für Ebene bei Bedarf aufgebaut werden
+    (z.B. mit ``num_subtopics`` bzw. ``num_curriculum_topics`` für die nächste Ebene und leeren Subcollections).
+    """,
+    responses={
+        422: {"description": "Ungültige Parameter, z.B. ein ``path``, der auf keinen Knoten verweist"},
+        500: {
+            "description": "Interner Serverfehler",
+            "content": {"application/json": {"example": {"detail": "OpenAI API Key nicht gefunden"}}},
+        },
+    },
+    tags=["Themenbaum-Generator"],
+)
+async def expand_topic_tree_endpoint(
+    expansion_request: TopicTreeExpansionRequest,
+    client: Annotated[AsyncOpenAI, Depends(get_openai_client)],
+) -> EnhancedTopicTreeResponse:
+    """
+    Generiert die Kindthemen des Knotens ``path`` im übergebenen Themenbaum (neu).
+    Die übrigen Parameter entsprechen denen von ``/generate-topic-tree``;
+    der ergänzte Themenbaum wird wie dort als neuer Eintrag gespeichert.
+    """
+    logger.info(
+        f"Expansion request received for path {expansion_request.path} in topic tree '{expansion_request.theme}'"
+    )
+    try:
+        topic_tree = await expand_topic_tree(client=client, expansion_request=expansion_request)
     except Exception as e:
-        logger.error(f"Unhandled Exception occured while generating topic tree: {e}")
+        logger.error(f"Unhandled Exception occured while expanding topic tree: {e}")
         raise HTTPException(status_code=500, detail=f"Fehler bei der Generierung: {str(e)}")
+    return await topic_tree_json_response(topic_tree)
 
 
 @app.post(
@@ -381,26 +452,19 @@ async def generate_topic_tree(topic_tree_request: TopicTreeRequest):
     - `text_context`: Text und Kontext für die Beschreibung (z.B. Thema, Zielgruppe, Inhalte)
     """,
 )
-async def generate_collection_description(description_request: DescriptionRequest) -> str:
+async def generate_collection_description(
+    description_request: DescriptionRequest, client: Annotated[AsyncOpenAI, Depends(get_openai_client)]
+) -> str:
     """
     Generiert eine ansprechende Sammlungsbeschreibung basierend auf gegebenem Text und Kontext.
 
     :param description_request: Request mit text_content, max_description_length und model parameter
+    :param client: geteilter OpenAI-Client (wird per Dependency übergeben)
     :return: Generierter Beschreibungstext als `str`
     :raises HTTPException: Falls ein Fehler bei der Generierung aufgetreten ist
     """
     logger.info(f"Generating collection description for '{description_request.text_context}' ...")
 
-    # fetch OpenAI API Key from .env file
-    openai_key = get_openai_key()
-    if not openai_key:
-        raise HTTPException(status_code=500, detail="OpenAI API Key nicht gefunden")
-    # init the OpenAI client
-    try:
-        client = AsyncOpenAI(api_key=openai_key)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"OpenAI-Init-Fehler: {str(e)}")
-
     try:
         # prepare the OpenAI prompt with the given parameters
         formatted_prompt = DESCRIPTION_PROMPT_TEMPLATE.format(
@@ -424,14 +488,17 @@ async def generate_collection_description(description_request: DescriptionReques
             role="user",
         )
         _ts_before: datetime = datetime.now()
-        response = await client.chat.completions.create(
-            model=description_request.model,
-            messages=[
-                _system_prompt,
-                _user_prompt,
-            ],
-            # temperature=0.7,
-        )
+        with llm_call_level("description"):
+            _description = await complete_chat(
+                client=client,
+                model=description_request.model,
+                messages=[
+                    _system_prompt,
+                    _user_prompt,
+                ],
+                bypass_cache=description_request.bypass_cache,
+                # temperature=0.7,
+            )
         # attention: setting the `max_token`-Parameter causes the API to return more text than requested.
         # e.g.: when setting a max_token limit of 600 while also using a max_description_length of 200,
         # it will rarely result in a response within the 200-char limit!
@@ -440,13 +507,217 @@ async def generate_collection_description(description_request: DescriptionReques
         _delta: timedelta = _ts_after - _ts_before
         logger.debug(f"OpenAI-API-Call took {_delta.total_seconds()} seconds.")
 
-        _description = response.choices[0].message.content
         return _description
     except Exception as e:
         logger.error(f"Error while generating collection description: {e}")
         raise HTTPException(status_code=500, detail=f"Fehler bei der Generierung: {str(e)}")
 
 
+@app.post(
+    "/jobs/topic-tree",
+    response_model=TopicTreeJob,
+    status_code=202,
+    summary="Themenbaum asynchron generieren",
+    description="""
+    Legt einen Job zur Generierung eines Themenbaums an und antwortet sofort mit der Job-ID.
+    Die Generierung läuft im Hintergrund (begrenzte Anzahl gleichzeitiger Jobs, siehe ``TOPIC_TREE_JOB_WORKERS``)
+    und übersteht auch abgebrochene Verbindungen und Neustarts.
+
+    Fortschritt: ``GET /jobs/topic-tree/{job_id}``, Ergebnis: ``GET /jobs/topic-tree/{job_id}/result``.
+    Das Ergebnis wird zusätzlich im Themenbaum-Speicher abgelegt (``tree_id`` im Job-Status).
+    """,
+    tags=["Themenbaum-Jobs"],
+)
+async def create_topic_tree_job(
+    topic_tree_request: TopicTreeRequest, job_queue: Annotated[TopicTreeJobQueue, Depends(get_job_queue)]
+) -> TopicTreeJob:
+    """
+    Reiht einen Themenbaum-Request als Job in die Warteschlange ein.
+
+    :raises HTTPException: 503, falls bereits zu viele Jobs auf ihre Ausführung warten
+    """
+    try:
+        return await job_queue.submit(topic_tree_request)
+    except TopicTreeJobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=f"Die Job-Warteschlange ist voll: {str(e)}")
+
+
+@app.post(
+    "/jobs/topic-trees",
+    response_model=List[TopicTreeJob],
+    status_code=202,
+    summary="Mehrere Themenbäume asynchron generieren",
+    description="""
+    Legt für jeden Request einen Job an (wie ``/jobs/topic-tree``) und antwortet sofort mit den Job-IDs
+    in der Reihenfolge der Requests. Passen nicht alle Jobs in die Warteschlange, wird keiner angelegt (HTTP 503).
+    """,
+    tags=["Themenbaum-Jobs"],
+)
+async def create_topic_tree_jobs(
+    bulk_request: TopicTreeBulkRequest, job_queue: Annotated[TopicTreeJobQueue, Depends(get_job_queue)]
+) -> List[TopicTreeJob]:
+    """
+    Reiht mehrere Themenbaum-Requests als Jobs in die Warteschlange ein.
+
+    :raises HTTPException: 503, falls nicht alle Jobs in die Warteschlange passen
+    """
+    try:
+        return await job_queue.submit_many(bulk_request.requests)
+    except TopicTreeJobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=f"Die Job-Warteschlange ist voll: {str(e)}")
+
+
+@app.get("/jobs/topic-tree/{job_id}", response_model=TopicTreeJob, tags=["Themenbaum-Jobs"])
+async def get_topic_tree_job(
+    job_id: str, job_queue: Annotated[TopicTreeJobQueue, Depends(get_job_queue)]
+) -> TopicTreeJob:
+    """Liefert Status und Fortschritt (generierte / erwartete Knoten) eines Themenbaum-Jobs."""
+    job = await job_queue.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' nicht gefunden")
+    return job
+
+
+@app.get("/jobs/topic-tree/{job_id}/result", response_model=EnhancedTopicTreeResponse, tags=["Themenbaum-Jobs"])
+async def get_topic_tree_job_result(
+    job_id: str, job_queue: Annotated[TopicTreeJobQueue, Depends(get_job_queue)]
+) -> Response:
+    """
+    Liefert den generierten Themenbaum eines abgeschlossenen Jobs. Wurde er im Themenbaum-Speicher abgelegt,
+    verweisen die Header darauf (``X-Topic-Tree-Id``, ``Location``, ``ETag``).
+
+    :raises HTTPException: 404, falls der Job unbekannt ist; 409, falls er (noch) nicht erfolgreich abgeschlossen ist
+    """
+    job = await job_queue.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' nicht gefunden")
+    if job.status == TopicTreeJobStatus.FAILED:
+        raise HTTPException(status_code=409, detail=f"Job '{job_id}' ist fehlgeschlagen: {job.error}")
+    if job.status != TopicTreeJobStatus.COMPLETED:
+        raise HTTPException(status_code=409, detail=f"Job '{job_id}' ist noch nicht abgeschlossen ({job.status.value})")
+    headers = {}
+    store = get_topic_tree_store()
+    if job.tree_id and store is not None:
+        # the stored topic tree might have been removed in the meantime (TOPIC_TREE_STORE_RETENTION_SECONDS)
+        _content_hash = await store.get_hash(job.tree_id)
+        headers = topic_tree_headers(job.tree_id, _content_hash) if _content_hash else {}
+    # the result was serialized once when the job finished: it is returned as is (without re-validation)
+    return Response(content=await job_queue.store.get_result(job_id), media_type="application/json", headers=headers)
+
+
+def get_tree_store() -> TopicTreeStore:
+    """Liefert den beim Start erstellten Themenbaum-Speicher (FastAPI-Dependency)."""
+    store = get_topic_tree_store()
+    if store is None:
+        raise HTTPException(status_code=503, detail="Der Themenbaum-Speicher ist deaktiviert")
+    return store
+
+
+@app.get(
+    "/topic-trees/{tree_id}",
+    response_model=EnhancedTopicTreeResponse,
+    responses={304: {"description": "Der Themenbaum hat sich nicht geändert (``If-None-Match``)"}},
+    tags=["Themenbaum-Speicher"],
+)
+async def get_topic_tree(
+    tree_id: str,
+    store: Annotated[TopicTreeStore, Depends(get_tree_store)],
+    if_none_match: Annotated[Optional[str], Header()] = None,
+) -> Response:
+    """
+    Liefert einen gespeicherten Themenbaum (ID aus dem Header ``X-Topic-Tree-Id`` von ``/generate-topic-tree``
+    bzw. ``tree_id`` der Streams und Jobs).
+
+    Unterstützt Conditional Requests: Enthält ``If-None-Match`` den ``ETag`` des Themenbaums, wird nur
+    HTTP 304 ohne Inhalt geliefert.
+
+    :raises HTTPException: 404, falls der Themenbaum unbekannt ist
+    """
+    _content_hash = await store.get_hash(tree_id)
+    if _content_hash is None:
+        raise HTTPException(status_code=404, detail=f"Themenbaum '{tree_id}' nicht gefunden")
+    _etag = f'"{_content_hash}"'
+    if etag_matches(if_none_match, _etag):
+        return Response(status_code=304, headers={"ETag": _etag})
+    _stored = await store.get(tree_id)
+    if _stored is None:
+        raise HTTPException(status_code=404, detail=f"Themenbaum '{tree_id}' nicht gefunden")
+    # the topic tree was serialized once when it was stored: it is returned as is (without re-validation)
+    return Response(content=_stored[0], media_type="application/json", headers={"ETag": _etag})
+
+
+@app.get(
+    "/topic-trees/{tree_id}/subtree",
+    response_model=Collection,
+    responses={304: {"description": "Der Themenbaum hat sich nicht geändert (``If-None-Match``)"}},
+    tags=["Themenbaum-Speicher"],
+)
+async def get_topic_tree_subtree(
+    tree_id: str,
+    store: Annotated[TopicTreeStore, Depends(get_tree_store)],
+    path: Annotated[
+        List[int],
+        Query(
+            min_length=1, description="Index-Pfad des Knotens, z.B. ``?path=0&path=1`` (siehe ``/expand-topic-tree``)"
+        ),
+    ],
+    if_none_match: Annotated[Optional[str], Header()] = None,
+) -> Response:
+    """
+    Liefert einen einzelnen Knoten eines gespeicherten Themenbaums inkl. seiner Subcollections.
+
+    :raises HTTPException: 404, falls der Themenbaum unbekannt ist oder ``path`` auf keinen Knoten verweist
+    """
+    _parsed = await store.get_parsed(tree_id)
+    if _parsed is None:
+        raise HTTPException(status_code=404, detail=f"Themenbaum '{tree_id}' nicht gefunden")
+    _topic_tree, _content_hash = _parsed
+    # the path is validated first: an ETag must not confirm a node that does not exist
+    _subtree = find_subtree(_topic_tree, path)
+    if _subtree is None:
+        raise HTTPException(status_code=404, detail=f"Knoten {path} in Themenbaum '{tree_id}' nicht gefunden")
+    # stored topic trees never change: the ETag of a subtree only depends on the tree and the path
+    _etag = f'"{_content_hash}-{"-".join(str(_index) for _index in path)}"'
+    if etag_matches(if_none_match, _etag):
+        return Response(status_code=304, headers={"ETag": _etag})
+    return JSONResponse(content=_subtree, headers={"ETag": _etag})
+
+
+@app.get(path="/llm-cache/statistics", response_model=CacheStatistics, tags=["LLM-Cache"])
+async def llm_cache_statistics_endpoint() -> CacheStatistics:
+    """Liefert die Hit-/Miss-Zähler und die Größe des LLM-Antwort-Caches seit dem Start des Prozesses."""
+    cache = get_llm_cache()
+    if cache is None:
+        return CacheStatistics(enabled=False)
+    return await cache.statistics()
+
+
+@app.get(path="/llm-parse/statistics", response_model=ParseStatistics, tags=["LLM-Statistiken"])
+async def llm_parse_statistics_endpoint() -> ParseStatistics:
+    """Liefert die Zähler für fehlerhafte, gerettete und nachgeforderte LLM-Antworten seit dem Start des Prozesses."""
+    return get_parse_statistics()
+
+
+@app.get(
+    path="/metrics",
+    response_class=Response,
+    tags=["LLM-Statistiken"],
+    responses={200: {"description": "Metriken im Prometheus-Textformat", "content": {"text/plain": {}}}},
+)
+async def metrics_endpoint() -> Response:
+    """
+    Liefert die Metriken des Prozesses im Prometheus-Textformat, u.a.:
+
+    - ``llm_call_duration_seconds``: Dauer der OpenAI-Aufrufe nach Modell und Ebene (main, sub, curriculum, description)
+    - ``llm_prompt_tokens_total`` / ``llm_completion_tokens_total``: Tokens laut ``resp.usage``
+    - ``llm_retries_total`` / ``llm_rate_limit_errors_total`` / ``llm_call_errors_total``: Retries und Fehler
+    - ``llm_calls_in_flight`` / ``llm_calls_waiting``: laufende bzw. auf den Scheduler wartende Aufrufe
+    - ``llm_parse_events_total`` und ``llm_cache_lookups_total``: Parse-Fehler bzw. Wirksamkeit des LLM-Caches
+    - ``http_request_duration_seconds``: Dauer der HTTP-Requests nach Route
+    """
+    return Response(content=metrics_registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
 @app.get(path="/_ping", response_model=Ping, tags=["health check"])
 async def ping_endpoint():
     """Ping function for Kubernetes health checks."""
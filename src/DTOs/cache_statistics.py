@@ -0,0 +1,16 @@
+from pydantic import BaseModel, Field
+
+
+class CacheStatistics(BaseModel):
+    """
+    Hit-/Miss-Zähler und Größe des LLM-Antwort-Caches (seit dem Start des Prozesses).
+    """
+
+    enabled: bool = Field(True, description="Ob der Cache aktiviert ist")
+    memory_hits: int = Field(0, description="Treffer im In-Memory-LRU-Cache")
+    disk_hits: int = Field(0, description="Treffer im persistenten (SQLite-)Cache")
+    misses: int = Field(0, description="Anfragen ohne Treffer")
+    bypassed: int = Field(0, description="Anfragen, die den Cache per ``bypass_cache`` umgangen haben")
+    hit_ratio: float = Field(0.0, description="Anteil der Treffer an allen Cache-Abfragen")
+    memory_entries: int = Field(0, description="Aktuelle Anzahl der Einträge im In-Memory-Cache")
+    disk_entries: int = Field(0, description="Aktuelle Anzahl der Einträge im persistenten Cache")
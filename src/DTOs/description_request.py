@@ -28,6 +28,13 @@ class DescriptionRequest(BaseModel):
         examples=["gpt-4.1-mini", "gpt-4o-mini", "gpt-4o"],
     )
 
+    bypass_cache: bool = Field(
+        False,
+        description="Wenn True, werden keine zwischengespeicherten LLM-Antworten verwendet "
+        "(neue Antworten ersetzen den Cache)",
+        examples=[False, True],
+    )
+
     class Config:
         json_schema_extra = {
             "example": {
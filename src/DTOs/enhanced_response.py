@@ -1,12 +1,63 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Optional
 from pydantic import BaseModel, Field
 from src.DTOs.collection import Collection
 
 
+class PhaseTiming(BaseModel):
+    """
+    Laufzeit einer Phase der Generierung. Die Ebenen laufen pipelined (und damit überlappend), daher wird sowohl
+    die Spanne vom ersten Start bis zum letzten Ende als auch die Summe aller Abschnitte angegeben.
+    """
+
+    count: int = Field(description="Anzahl der gemessenen Abschnitte (z.B. Generierungsanfragen einer Ebene)")
+    wall_seconds: float = Field(description="Sekunden vom Start des ersten bis zum Ende des letzten Abschnitts")
+    busy_seconds: float = Field(description="Summe der Dauer aller Abschnitte in Sekunden (überlappend)")
+
+
+class LLMCallTimings(BaseModel):
+    """
+    OpenAI-Aufrufe einer Ebene des Themenbaums: Anzahl, Latenzverteilung und Token-Verbrauch
+    """
+
+    calls: int = Field(description="An die API geschickte Aufrufe (inkl. fehlgeschlagener Versuche)")
+    errors: int = Field(description="Fehlgeschlagene Aufrufe")
+    cache_hits: int = Field(description="Antworten aus dem LLM-Cache (ohne API-Aufruf)")
+    latency_seconds: Dict[str, float] = Field(
+        default_factory=dict,
+        description="Latenz der Aufrufe ohne Wartezeit im Scheduler: min, mean, p50, p90, p95, p99, max",
+    )
+    prompt_tokens: int = Field(description="Prompt-Tokens laut resp.usage")
+    cached_prompt_tokens: int = Field(description="Davon vom Provider gecachte Prompt-Tokens")
+    completion_tokens: int = Field(description="Completion-Tokens laut resp.usage")
+
+
+class GenerationTimings(BaseModel):
+    """
+    Performance-Trace einer Generierung (nur mit ``include_timings``)
+    """
+
+    total_seconds: float = Field(description="Dauer der Generierung bis zur fertigen Antwort (ohne Serialisierung)")
+    phases: Dict[str, PhaseTiming] = Field(
+        default_factory=dict,
+        description="Laufzeit je Phase: vocab_resolution, main, sub, curriculum, finalization, serialization",
+    )
+    llm_calls: Dict[str, LLMCallTimings] = Field(
+        default_factory=dict, description="OpenAI-Aufrufe je Ebene (main, sub, curriculum)"
+    )
+    retries: int = Field(0, description="Wiederholte OpenAI-Aufrufe (Backoff)")
+    prompt_tokens: int = Field(0, description="Prompt-Tokens aller Aufrufe")
+    cached_prompt_tokens: int = Field(0, description="Davon vom Provider gecachte Prompt-Tokens")
+    completion_tokens: int = Field(0, description="Completion-Tokens aller Aufrufe")
+    estimated_cost_usd: Optional[float] = Field(
+        None, description="Geschätzte Kosten in US-Dollar (None, falls für das Modell kein Preis bekannt ist)"
+    )
+
+
 class GenerationMetadata(BaseModel):
     """
     Metadaten für die Themenbaumgenerierung
     """
+
     theme: str = Field(description="Das Hauptthema des Themenbaums")
     model: str = Field(description="Verwendetes AI-Modell")
     num_main_topics: int = Field(description="Anzahl der generierten Hauptthemen")
@@ -17,12 +68,16 @@ class GenerationMetadata(BaseModel):
     include_methodology_topic: bool = Field(description="Ob 'Methodik und Didaktik' Thema eingeschlossen wurde")
     discipline_uris: List[str] = Field(default_factory=list, description="URIs der Fachbereiche")
     educational_context_uris: List[str] = Field(default_factory=list, description="URIs der Bildungsstufen")
+    timings: Optional[GenerationTimings] = Field(
+        None, description="Performance-Trace der Generierung (nur mit ``include_timings``)"
+    )
 
 
 class TextStatistics(BaseModel):
     """
     Statistiken über die Textlängen aller generierten Beschreibungen
     """
+
     total_descriptions: int = Field(description="Gesamtanzahl der generierten Beschreibungen")
     character_count_range: Dict[str, int] = Field(description="Min/Max Zeichenanzahl")
     word_count_range: Dict[str, int] = Field(description="Min/Max Wortanzahl")
@@ -30,12 +85,23 @@ class TextStatistics(BaseModel):
     word_count_average: float = Field(description="Durchschnittliche Wortanzahl")
     character_count_with_spaces_range: Dict[str, int] = Field(description="Min/Max Zeichenanzahl mit Leerzeichen")
     character_count_with_spaces_average: float = Field(description="Durchschnittliche Zeichenanzahl mit Leerzeichen")
+    character_count_percentiles: Dict[str, int] = Field(
+        default_factory=dict, description="Perzentile (p50, p90, p95, p99) der Zeichenanzahl"
+    )
+    word_count_percentiles: Dict[str, int] = Field(
+        default_factory=dict, description="Perzentile (p50, p90, p95, p99) der Wortanzahl"
+    )
+    word_count_histogram_by_level: Dict[str, Dict[str, int]] = Field(
+        default_factory=dict,
+        description="Wortanzahl-Histogramm je Ebene (main, sub, curriculum): Wortanzahl -> Anzahl der Beschreibungen",
+    )
 
 
 class EnhancedTopicTreeResponse(BaseModel):
     """
     Erweiterte Antwort für die Themenbaumgenerierung mit Metadaten und Statistiken
     """
+
     metadata: GenerationMetadata = Field(description="Metadaten der Generierung")
     topic_tree: List[Collection] = Field(description="Der generierte Themenbaum")
     statistics: TextStatistics = Field(description="Statistiken über die generierten Texte")
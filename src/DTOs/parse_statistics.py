@@ -0,0 +1,18 @@
+from pydantic import BaseModel, Field
+
+
+class ParseStatistics(BaseModel):
+    """
+    Zähler für das Parsen der LLM-Antworten mit Themen (seit dem Start des Prozesses).
+    """
+
+    responses: int = Field(0, description="Geparste Antworten")
+    parse_failures: int = Field(0, description="Antworten, die kein gültiges JSON waren (z.B. abgeschnitten)")
+    salvaged_responses: int = Field(0, description="Fehlerhafte Antworten, aus denen Themen gerettet werden konnten")
+    salvaged_topics: int = Field(0, description="Aus fehlerhaften Antworten gerettete Themen")
+    skipped_topics: int = Field(0, description="Ungültige Themen (z.B. falsche Feldtypen), die übersprungen wurden")
+    follow_up_requests: int = Field(0, description="Nachforderungen fehlender Themen")
+    recovered_topics: int = Field(0, description="Per Nachforderung ergänzte Themen")
+    lost_requests: int = Field(
+        0, description="Anfragen, für die auch nach Rettung und Nachforderung keine Themen vorliegen"
+    )
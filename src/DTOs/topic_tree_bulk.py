@@ -0,0 +1,48 @@
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+from src.DTOs.enhanced_response import EnhancedTopicTreeResponse
+from src.DTOs.topic_tree_request import TopicTreeRequest
+
+
+class TopicTreeBulkRequest(BaseModel):
+    """Request-Modell für die gemeinsame Generierung mehrerer Themenbäume (z.B. für Importe)."""
+
+    requests: List[TopicTreeRequest] = Field(
+        ...,
+        min_length=1,
+        max_length=100,
+        description="Die Parameter der einzelnen Themenbäume (1 bis 100)",
+    )
+
+
+class TopicTreeBulkResultEvent(BaseModel):
+    """Ein fertig generierter Themenbaum (eine Zeile im NDJSON-Stream)."""
+
+    type: Literal["result"] = "result"
+    index: int = Field(description="Position des Requests in ``requests``", examples=[0])
+    theme: str = Field(description="Thema des Themenbaums", examples=["Physik"])
+    tree_id: Optional[str] = Field(
+        None,
+        description="ID des gespeicherten Themenbaums (``/topic-trees/{tree_id}``), "
+        "falls der Themenbaum-Speicher aktiviert ist",
+    )
+    result: EnhancedTopicTreeResponse = Field(description="Der generierte Themenbaum")
+
+
+class TopicTreeBulkErrorEvent(BaseModel):
+    """Wird gesendet, falls ein einzelner Themenbaum nicht generiert werden konnte."""
+
+    type: Literal["error"] = "error"
+    index: int = Field(description="Position des Requests in ``requests``", examples=[0])
+    theme: str = Field(description="Thema des Themenbaums", examples=["Physik"])
+    detail: str = Field(description="Fehlerbeschreibung", examples=["Fehler bei der Generierung der Hauptthemen"])
+
+
+class TopicTreeBulkCompleteEvent(BaseModel):
+    """Abschließendes Event des NDJSON-Streams, nachdem alle Themenbäume verarbeitet wurden."""
+
+    type: Literal["complete"] = "complete"
+    succeeded: int = Field(description="Anzahl der erfolgreich generierten Themenbäume")
+    failed: int = Field(description="Anzahl der fehlgeschlagenen Themenbäume")
@@ -0,0 +1,52 @@
+from typing import Any, List
+
+from pydantic import Field, model_validator
+
+from src.DTOs.collection import Collection
+from src.DTOs.topic_tree_request import BaseTopicTreeRequest
+
+# parameters of TopicTreeRequest that only apply to the generation of a whole topic tree
+UNSUPPORTED_PARAMETERS = ("subtopic_batch_size", "curriculum_batch_size", "stream_llm_responses")
+
+
+class TopicTreeExpansionRequest(BaseTopicTreeRequest):
+    """
+    Request-Modell für das (Neu-)Generieren der Kindthemen eines einzelnen Knotens in einem bestehenden Themenbaum.
+
+    Die übrigen Parameter entsprechen denen von ``TopicTreeRequest``: ``num_main_topics``, ``num_subtopics``
+    bzw. ``num_curriculum_topics`` bestimmen die Anzahl der generierten Kindthemen (je nach Ebene des Knotens).
+    Da nur eine einzige LLM-Anfrage gestellt wird, entfallen ``subtopic_batch_size``, ``curriculum_batch_size``
+    und ``stream_llm_responses``.
+    """
+
+    topic_tree: List[Collection] = Field(
+        default_factory=list,
+        description="Der bestehende Themenbaum (``topic_tree`` einer ``EnhancedTopicTreeResponse``)",
+    )
+    path: List[int] = Field(
+        default_factory=list,
+        max_length=2,
+        description="Index-Pfad des Knotens, dessen Kindthemen (neu) generiert werden: [] = Hauptthemen, "
+        "[0] = Unterthemen des ersten Hauptthemas, [0, 1] = Lehrplanthemen des zweiten Unterthemas "
+        "des ersten Hauptthemas",
+        examples=[[], [0], [0, 1]],
+    )
+
+    @model_validator(mode="before")
+    @classmethod
+    def _reject_generation_parameters(cls, data: Any) -> Any:
+        # the parameters of a full generation would otherwise be ignored without notice
+        if isinstance(data, dict):
+            _unsupported = [_name for _name in UNSUPPORTED_PARAMETERS if _name in data]
+            if _unsupported:
+                raise ValueError(f"{', '.join(_unsupported)} wird beim Ergänzen eines Themenbaums nicht unterstützt")
+        return data
+
+    @model_validator(mode="after")
+    def _check_path(self) -> "TopicTreeExpansionRequest":
+        _children = self.topic_tree
+        for _depth, _index in enumerate(self.path):
+            if not 0 <= _index < len(_children):
+                raise ValueError(f"path[{_depth}] = {_index} verweist auf keinen Knoten im Themenbaum")
+            _children = _children[_index].subcollections or []
+        return self
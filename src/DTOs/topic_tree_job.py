@@ -0,0 +1,43 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+from src.DTOs.topic_tree_request import TopicTreeRequest
+
+
+class TopicTreeJobStatus(str, Enum):
+    """Status eines Themenbaum-Jobs."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class TopicTreeJob(BaseModel):
+    """
+    Asynchron generierter Themenbaum (siehe ``/jobs/topic-tree``).
+    Das Ergebnis (``EnhancedTopicTreeResponse``) ist abrufbar, sobald der Status ``completed`` ist.
+    """
+
+    job_id: str = Field(description="ID des Jobs", examples=["3f0c6d0e8a7b4b5e9f1d2c3b4a5f6e7d"])
+    status: TopicTreeJobStatus = Field(description="Aktueller Status des Jobs", examples=["running"])
+    nodes_done: int = Field(0, description="Anzahl der bereits generierten Knoten")
+    nodes_planned: int = Field(
+        0,
+        description="Anzahl der insgesamt erwarteten Knoten "
+        "(wird angepasst, sobald das Modell mehr oder weniger Themen liefert als angefragt)",
+    )
+    progress: float = Field(0.0, ge=0.0, le=1.0, description="Fortschritt (``nodes_done / nodes_planned``)")
+    created_at: datetime = Field(description="Zeitpunkt, zu dem der Job angelegt wurde")
+    started_at: Optional[datetime] = Field(None, description="Zeitpunkt, zu dem die Generierung gestartet wurde")
+    finished_at: Optional[datetime] = Field(None, description="Zeitpunkt, zu dem der Job abgeschlossen wurde")
+    error: Optional[str] = Field(None, description="Fehlerbeschreibung, falls der Job fehlgeschlagen ist")
+    tree_id: Optional[str] = Field(
+        None,
+        description="ID des gespeicherten Themenbaums (``/topic-trees/{tree_id}``), sobald der Job abgeschlossen ist "
+        "(falls der Themenbaum-Speicher aktiviert ist)",
+    )
+    request: TopicTreeRequest = Field(description="Parameter des Themenbaums")
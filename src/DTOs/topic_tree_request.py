@@ -3,9 +3,9 @@ from typing import Optional, List
 from pydantic import BaseModel, Field
 
 
-class TopicTreeRequest(BaseModel):
+class BaseTopicTreeRequest(BaseModel):
     """
-    Request-Modell für die Generierung eines Themenbaums.
+    Gemeinsame Parameter für das Generieren und das Ergänzen (``TopicTreeExpansionRequest``) eines Themenbaums.
     Hierüber kommen Parameter wie Thema, Anzahl an Hauptthemen,
     Anzahl an Unterthemen und Anzahl an Lehrplanthemen.
 
@@ -58,3 +58,51 @@ class TopicTreeRequest(BaseModel):
     model: str = Field(
         "gpt-4.1-mini", description="Das zu verwendende OpenAI-Sprachmodell", examples=["gpt-4.1-mini", "gpt-4o-mini"]
     )
+
+    bypass_cache: bool = Field(
+        False,
+        description="Wenn True, werden keine zwischengespeicherten LLM-Antworten verwendet "
+        "(neue Antworten ersetzen den Cache)",
+        examples=[False, True],
+    )
+
+    include_timings: bool = Field(
+        False,
+        description="Wenn True, enthalten die Metadaten der Antwort einen Performance-Trace (``timings``): Laufzeit je "
+        "Phase, Anzahl und Latenz der LLM-Aufrufe je Ebene, Retries, Tokens und geschätzte Kosten",
+        examples=[False, True],
+    )
+
+
+class TopicTreeRequest(BaseTopicTreeRequest):
+    """
+    Request-Modell für die Generierung eines Themenbaums.
+
+    Zusätzlich zu den gemeinsamen Parametern (siehe ``BaseTopicTreeRequest``) steuern ``subtopic_batch_size``,
+    ``curriculum_batch_size`` und ``stream_llm_responses``, wie die Ebenen des Themenbaums generiert werden.
+    """
+
+    subtopic_batch_size: int = Field(
+        1,
+        ge=1,
+        le=10,
+        description="Anzahl der Hauptthemen, deren Unterthemen in einer gemeinsamen LLM-Anfrage generiert werden "
+        "(1 = eine Anfrage pro Hauptthema)",
+        examples=[1, 5],
+    )
+    curriculum_batch_size: int = Field(
+        1,
+        ge=1,
+        le=10,
+        description="Anzahl der Unterthemen (eines Hauptthemas), deren Lehrplanthemen in einer gemeinsamen "
+        "LLM-Anfrage generiert werden (1 = eine Anfrage pro Unterthema)",
+        examples=[1, 5],
+    )
+
+    stream_llm_responses: bool = Field(
+        False,
+        description="Wenn True, werden die LLM-Antworten gestreamt: Die Unter- bzw. Lehrplanthemen eines Themas werden "
+        "schon generiert, während das Modell die folgenden Geschwisterthemen noch schreibt "
+        "(deren Titel fehlen dann im Prompt-Kontext der früheren Themen)",
+        examples=[False, True],
+    )
@@ -0,0 +1,46 @@
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+from src.DTOs.collection import Collection
+from src.DTOs.enhanced_response import GenerationMetadata, TextStatistics
+
+
+class TopicTreeNodeEvent(BaseModel):
+    """
+    Ein einzelner, fertig generierter Knoten des Themenbaums (eine Zeile im NDJSON-Stream).
+    Die Subcollections werden nicht mitgeschickt - sie folgen als eigene Events.
+    """
+
+    type: Literal["node"] = "node"
+    level: Literal["main", "sub", "curriculum"] = Field(description="Ebene des Knotens im Themenbaum")
+    path: List[str] = Field(
+        default_factory=list,
+        description="Titel der übergeordneten Knoten (leer für Hauptthemen)",
+        examples=[["Mechanik", "Kinematik"]],
+    )
+    index_path: List[int] = Field(
+        description="Position des Knotens im Themenbaum (Index auf jeder Ebene)",
+        examples=[[0, 1, 0]],
+    )
+    collection: Collection = Field(description="Der generierte Knoten (ohne Subcollections)")
+
+
+class TopicTreeCompleteEvent(BaseModel):
+    """Abschließendes Event des NDJSON-Streams mit Metadaten und Gesamtstatistiken."""
+
+    type: Literal["complete"] = "complete"
+    metadata: GenerationMetadata = Field(description="Metadaten der Generierung")
+    statistics: TextStatistics = Field(description="Statistiken über die generierten Texte")
+    tree_id: Optional[str] = Field(
+        None,
+        description="ID des gespeicherten Themenbaums (``/topic-trees/{tree_id}``), "
+        "falls der Themenbaum-Speicher aktiviert ist",
+    )
+
+
+class TopicTreeErrorEvent(BaseModel):
+    """Wird als letztes Event gesendet, falls die Generierung abgebrochen werden musste."""
+
+    type: Literal["error"] = "error"
+    detail: str = Field(description="Fehlerbeschreibung", examples=["Fehler bei der Generierung der Hauptthemen"])
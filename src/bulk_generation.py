@@ -0,0 +1,312 @@
+"""
+Offline-Massengenerierung von Themenbäumen über die OpenAI Batch API.
+
+Alle Prompts einer Ebene (Haupt-, Unter- bzw. Lehrplanthemen) aller Themenbäume werden in Batch-Dateien
+(JSONL, ein Request pro Zeile) geschrieben, gemeinsam eingereicht und nach Abschluss wieder zu den Bäumen
+zusammengesetzt. Die Batch API ist deutlich günstiger und hat eigene Rate-Limits, braucht aber bis zu 24 Stunden.
+
+Verwendung (z.B. nächtlich für den gesamten Themenkatalog)::
+
+    python -m src.bulk_generation --input themes.jsonl --output-dir out/
+
+``themes.jsonl`` enthält pro Zeile einen ``TopicTreeRequest`` als JSON-Objekt.
+Für lokale Tests kann ``OPENAI_BASE_URL`` auf ``benchmarks/fake_openai_server.py`` zeigen.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from loguru import logger
+from openai import AsyncOpenAI
+from openai.types import Batch
+
+from src.DTOs.enhanced_response import EnhancedTopicTreeResponse
+from src.DTOs.topic_tree_request import TopicTreeRequest
+from src.llm_client_helper import create_openai_client, get_openai_key
+from src.prompt_helper import build_topic_messages
+from src.structured_text_helper import parse_structured_text, topics_response_format_kwargs
+from src.topic_node import TopicNode
+from src.topic_tree_helper import (
+    LEVEL_CURRICULUM,
+    LEVEL_MAIN,
+    LEVEL_SUB,
+    build_context_instructions,
+    build_curriculum_prompt,
+    build_main_prompt,
+    build_special_instructions,
+    build_sub_prompt,
+    build_topic_tree_response,
+)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+# the Batch API accepts at most 50,000 requests per input file
+MAX_REQUESTS_PER_BATCH = 50_000
+_FINAL_BATCH_STATES = {"completed", "failed", "expired", "cancelled"}
+
+
+@dataclass
+class _BulkTopicTree:
+    """Zustand eines Themenbaums während der Massengenerierung."""
+
+    request: TopicTreeRequest
+    special_instructions: str
+    context_instructions: str
+    main_topics: List[TopicNode] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+class BulkTopicTreeGenerator:
+    """
+    Generiert viele Themenbäume Ebene für Ebene über die OpenAI Batch API.
+
+    Pro Ebene werden die Prompts aller Themenbäume in Batch-Dateien unter ``work_dir`` geschrieben, eingereicht
+    und per Polling abgewartet. Anfragen, die fehlschlagen oder keine gültigen Themen liefern, werden
+    bis zu ``max_resubmissions`` Mal erneut eingereicht. Die Prompts entsprechen denen der interaktiven Generierung;
+    ``subtopic_batch_size`` und ``curriculum_batch_size`` werden ignoriert
+    (jede Anfrage ist bereits Teil eines Batches).
+    """
+
+    def __init__(
+        self,
+        client: AsyncOpenAI,
+        work_dir: Path,
+        poll_interval: float = 30.0,
+        completion_window: str = "24h",
+        max_resubmissions: int = 1,
+    ):
+        self.client = client
+        self.work_dir = work_dir
+        self.poll_interval = poll_interval
+        self.completion_window = completion_window
+        self.max_resubmissions = max_resubmissions
+
+    async def generate(self, topic_tree_requests: List[TopicTreeRequest]) -> List[Optional[EnhancedTopicTreeResponse]]:
+        """
+        Generiert die Themenbäume zu allen Requests.
+
+        :return: die Themenbäume in der Reihenfolge der Requests
+            (``None`` für Themenbäume, deren Hauptthemen nicht generiert werden konnten)
+        """
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        trees = [
+            _BulkTopicTree(
+                request=_request,
+                special_instructions=build_special_instructions(_request),
+                context_instructions=build_context_instructions(_request),
+            )
+            for _request in topic_tree_requests
+        ]
+
+        # 1) Hauptthemen aller Themenbäume
+        _results = await self._run_level(
+            LEVEL_MAIN,
+            {
+                f"{_t}": (
+                    tree.request.model,
+                    build_main_prompt(tree.request, tree.special_instructions, tree.context_instructions),
+                )
+                for _t, tree in enumerate(trees)
+            },
+        )
+        for _t, tree in enumerate(trees):
+            tree.main_topics = _results.get(f"{_t}", [])
+            if not tree.main_topics:
+                tree.error = "Fehler bei der Generierung der Hauptthemen"
+                logger.error(f"Bulk generation of topic tree '{tree.request.theme}' failed: no main topics")
+
+        # 2) Unterthemen aller Hauptthemen
+        _results = await self._run_level(
+            LEVEL_SUB,
+            {
+                f"{_t}-{_m}": (
+                    tree.request.model,
+                    build_sub_prompt(tree.request, tree.context_instructions, tree.main_topics, main_topic),
+                )
+                for _t, tree in enumerate(trees)
+                for _m, main_topic in enumerate(tree.main_topics)
+            },
+        )
+        for _t, tree in enumerate(trees):
+            for _m, main_topic in enumerate(tree.main_topics):
+                main_topic.subcollections = _results.get(f"{_t}-{_m}", [])
+
+        # 3) Lehrplanthemen aller Unterthemen
+        _results = await self._run_level(
+            LEVEL_CURRICULUM,
+            {
+                f"{_t}-{_m}-{_s}": (
+                    tree.request.model,
+                    build_curriculum_prompt(
+                        tree.request, tree.context_instructions, tree.main_topics, main_topic, sub_topic
+                    ),
+                )
+                for _t, tree in enumerate(trees)
+                for _m, main_topic in enumerate(tree.main_topics)
+                for _s, sub_topic in enumerate(main_topic.subcollections)
+            },
+        )
+        for _t, tree in enumerate(trees):
+            for _m, main_topic in enumerate(tree.main_topics):
+                for _s, sub_topic in enumerate(main_topic.subcollections):
+                    sub_topic.subcollections = _results.get(f"{_t}-{_m}-{_s}", [])
+
+        return [None if tree.error else build_topic_tree_response(tree.main_topics, tree.request) for tree in trees]
+
+    async def _run_level(self, level: str, prompts: Dict[str, Tuple[str, str]]) -> Dict[str, List[TopicNode]]:
+        """
+        Reicht die Prompts einer Ebene ein und parst die Antworten.
+
+        :param prompts: ``{custom_id: (Modell, Prompt)}``
+        :return: die generierten Themen pro ``custom_id`` (fehlgeschlagene Anfragen fehlen)
+        """
+        results: Dict[str, List[TopicNode]] = {}
+        _pending = prompts
+        for _attempt in range(self.max_resubmissions + 1):
+            if not _pending:
+                break
+            logger.info(f"Submitting {len(_pending)} {level} requests to the Batch API (attempt {_attempt + 1})")
+            _contents = await self._run_batches(f"{level}-{_attempt}", _pending)
+            for _custom_id, _content in _contents.items():
+                _topics = parse_structured_text(_content)
+                if _topics:
+                    results[_custom_id] = _topics
+            _pending = {_key: _value for _key, _value in _pending.items() if _key not in results}
+            if _pending:
+                logger.warning(f"{len(_pending)} {level} requests returned no valid topics")
+        return results
+
+    async def _run_batches(self, name: str, prompts: Dict[str, Tuple[str, str]]) -> Dict[str, str]:
+        """Reicht die Prompts als Batch-Dateien ein: eine Datei pro Modell (Vorgabe der Batch API) und Abschnitt."""
+        _lines_by_model: Dict[str, List[str]] = {}
+        for _custom_id, (_model, _prompt) in prompts.items():
+            _lines_by_model.setdefault(_model, []).append(
+                json.dumps(
+                    {
+                        "custom_id": _custom_id,
+                        "method": "POST",
+                        "url": BATCH_ENDPOINT,
+                        "body": {
+                            "model": _model,
+                            "messages": build_topic_messages(_prompt),
+                            **topics_response_format_kwargs(),
+                        },
+                    },
+                    ensure_ascii=False,
+                )
+            )
+        _chunk_results = await asyncio.gather(
+            *[
+                self._run_batch(f"{name}-{_model_index}-{_index}", _lines[_start : _start + MAX_REQUESTS_PER_BATCH])
+                for _model_index, _lines in enumerate(_lines_by_model.values())
+                for _index, _start in enumerate(range(0, len(_lines), MAX_REQUESTS_PER_BATCH))
+            ]
+        )
+        return {_key: _value for _chunk_result in _chunk_results for _key, _value in _chunk_result.items()}
+
+    async def _run_batch(self, name: str, lines: List[str]) -> Dict[str, str]:
+        """Reicht eine Batch-Datei ein, wartet auf den Abschluss und liefert die Antworten pro ``custom_id``."""
+        _input_path = self.work_dir / f"{name}.jsonl"
+        _input_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        _file = await self.client.files.create(file=(_input_path.name, _input_path.read_bytes()), purpose="batch")
+        batch = await self.client.batches.create(
+            input_file_id=_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=self.completion_window,
+            metadata={"batch_file": _input_path.name},
+        )
+        logger.info(f"Submitted batch {batch.id} ({len(lines)} requests from {_input_path.name})")
+        while batch.status not in _FINAL_BATCH_STATES:
+            await asyncio.sleep(self.poll_interval)
+            batch = await self.client.batches.retrieve(batch.id)
+        _log_batch_result(batch)
+
+        # expired or cancelled batches can still contain the requests that were completed in time
+        results: Dict[str, str] = {}
+        if batch.output_file_id:
+            _output = (await self.client.files.content(batch.output_file_id)).text
+            (self.work_dir / f"{name}.output.jsonl").write_text(_output, encoding="utf-8")
+            for _line in _output.splitlines():
+                if not _line.strip():
+                    continue
+                _result = json.loads(_line)
+                _response = _result.get("response") or {}
+                if _response.get("status_code") != 200:
+                    continue
+                results[_result["custom_id"]] = _response["body"]["choices"][0]["message"]["content"] or ""
+        return results
+
+
+def _log_batch_result(batch: Batch) -> None:
+    _counts = batch.request_counts
+    _summary = f"{_counts.completed} completed, {_counts.failed} failed" if _counts else "no request counts"
+    if batch.status == "completed":
+        logger.info(f"Batch {batch.id} completed ({_summary})")
+    else:
+        _errors = [_error.message for _error in (batch.errors.data or [])] if batch.errors else []
+        logger.error(f"Batch {batch.id} ended with status '{batch.status}' ({_summary}): {_errors}")
+
+
+def _output_filename(index: int, theme: str) -> str:
+    _slug = re.sub(r"[^\w-]+", "_", theme.strip().lower()).strip("_")[:60]
+    return f"{index:04d}_{_slug or 'themenbaum'}.json"
+
+
+async def _main(args: argparse.Namespace) -> int:
+    _requests = [
+        TopicTreeRequest.model_validate_json(_line)
+        for _line in Path(args.input).read_text(encoding="utf-8").splitlines()
+        if _line.strip()
+    ]
+    client = create_openai_client(get_openai_key())
+    try:
+        generator = BulkTopicTreeGenerator(
+            client=client,
+            work_dir=Path(args.work_dir),
+            poll_interval=args.poll_interval,
+            max_resubmissions=args.max_resubmissions,
+        )
+        responses = await generator.generate(_requests)
+    finally:
+        await client.close()
+
+    _output_dir = Path(args.output_dir)
+    _output_dir.mkdir(parents=True, exist_ok=True)
+    _failed = 0
+    for _index, (_request, _response) in enumerate(zip(_requests, responses)):
+        if _response is None:
+            _failed += 1
+            continue
+        (_output_dir / _output_filename(_index, _request.theme)).write_text(
+            _response.model_dump_json(by_alias=True, indent=2), encoding="utf-8"
+        )
+    logger.info(
+        f"Bulk generation finished: {len(_requests) - _failed} topic trees written to {_output_dir}, {_failed} failed"
+    )
+    return 1 if _failed else 0
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Generate many topic trees at once via the OpenAI Batch API")
+    parser.add_argument("--input", required=True, help="JSONL file with one TopicTreeRequest per line")
+    parser.add_argument(
+        "--output-dir", required=True, help="directory for the generated topic trees (one JSON file each)"
+    )
+    parser.add_argument("--work-dir", default=".cache/bulk", help="directory for the batch input and output files")
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=float(os.getenv("BULK_POLL_INTERVAL_SECONDS", 30)),
+        help="seconds between two status checks of a batch (default: BULK_POLL_INTERVAL_SECONDS or 30)",
+    )
+    parser.add_argument(
+        "--max-resubmissions", type=int, default=1, help="how often failed requests are submitted again (default: 1)"
+    )
+    raise SystemExit(asyncio.run(_main(parser.parse_args())))
@@ -0,0 +1,220 @@
+import json
+import math
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from loguru import logger
+from openai.types import CompletionUsage
+
+from src.DTOs.enhanced_response import GenerationTimings, LLMCallTimings, PhaseTiming
+
+# phases of a topic tree generation (the tree levels main / sub / curriculum are phases as well)
+PHASE_VOCAB_RESOLUTION = "vocab_resolution"
+PHASE_FINALIZATION = "finalization"
+PHASE_SERIALIZATION = "serialization"
+
+LATENCY_PERCENTILES = (50, 90, 95, 99)
+
+# USD per 1M tokens (prompt, cached prompt, completion) as of 2025, can be overridden via LLM_MODEL_PRICES
+DEFAULT_MODEL_PRICES: Dict[str, Dict[str, float]] = {
+    "gpt-4.1": {"prompt": 2.00, "cached_prompt": 0.50, "completion": 8.00},
+    "gpt-4.1-mini": {"prompt": 0.40, "cached_prompt": 0.10, "completion": 1.60},
+    "gpt-4.1-nano": {"prompt": 0.10, "cached_prompt": 0.025, "completion": 0.40},
+    "gpt-4o": {"prompt": 2.50, "cached_prompt": 1.25, "completion": 10.00},
+    "gpt-4o-mini": {"prompt": 0.15, "cached_prompt": 0.075, "completion": 0.60},
+}
+
+
+def get_model_prices() -> Dict[str, Dict[str, float]]:
+    """
+    Liefert die Preise (USD pro 1 Mio. Tokens) je Modell für die Kostenschätzung.
+
+    Über ``LLM_MODEL_PRICES`` (JSON) können Preise ergänzt oder überschrieben werden,
+    z.B. ``{"gpt-4o": {"prompt": 2.5, "cached_prompt": 1.25, "completion": 10}}``.
+    """
+    prices = dict(DEFAULT_MODEL_PRICES)
+    _prices_json = os.getenv("LLM_MODEL_PRICES")
+    if _prices_json:
+        try:
+            for _model, _price in json.loads(_prices_json).items():
+                prices[_model] = {
+                    "prompt": float(_price["prompt"]),
+                    "cached_prompt": float(_price.get("cached_prompt", _price["prompt"])),
+                    "completion": float(_price["completion"]),
+                }
+        except (ValueError, AttributeError, KeyError, TypeError) as e:
+            logger.warning(f"Invalid value for LLM_MODEL_PRICES: {e}. Using the default prices.")
+            return dict(DEFAULT_MODEL_PRICES)
+    return prices
+
+
+def _latency_distribution(durations: Sequence[float]) -> Dict[str, float]:
+    """Minimum, Mittelwert, Perzentile (Nearest-Rank) und Maximum der Latenzen in Sekunden."""
+    if not durations:
+        return {}
+    _sorted = sorted(durations)
+    distribution = {"min": _sorted[0], "mean": sum(_sorted) / len(_sorted)}
+    for _percentile in LATENCY_PERCENTILES:
+        distribution[f"p{_percentile}"] = _sorted[max(math.ceil(_percentile / 100 * len(_sorted)), 1) - 1]
+    distribution["max"] = _sorted[-1]
+    return {_key: round(_value, 4) for _key, _value in distribution.items()}
+
+
+@dataclass
+class _PhaseTrace:
+    count: int = 0
+    first_start: float = math.inf
+    last_end: float = 0.0
+    busy_seconds: float = 0.0
+
+    def add(self, start: float, end: float) -> None:
+        self.count += 1
+        self.first_start = min(self.first_start, start)
+        self.last_end = max(self.last_end, end)
+        self.busy_seconds += end - start
+
+
+@dataclass
+class _LLMCallTrace:
+    calls: int = 0
+    errors: int = 0
+    cache_hits: int = 0
+    durations: List[float] = field(default_factory=list)
+    prompt_tokens: int = 0
+    cached_prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+class GenerationTrace:
+    """
+    Sammelt die Laufzeiten der Phasen und die OpenAI-Aufrufe (Latenz, Fehler, Tokens) einer Generierung.
+
+    Der Trace wird per ``trace_generation()`` für einen Block aktiviert; darin gestartete Tasks erben ihn.
+    Ohne aktiven Trace sind alle ``record_*``-Funktionen wirkungslos.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.retries = 0
+        self._phases: Dict[str, _PhaseTrace] = {}
+        self._llm_calls: Dict[str, _LLMCallTrace] = {}
+
+    def add_phase(self, phase: str, start: float, end: float) -> None:
+        self._phases.setdefault(phase, _PhaseTrace()).add(start, end)
+
+    def llm_calls(self, level: str) -> _LLMCallTrace:
+        return self._llm_calls.setdefault(level, _LLMCallTrace())
+
+    def to_generation_timings(self, model: str) -> GenerationTimings:
+        """Fasst den bisherigen Trace zusammen (inkl. geschätzter Kosten für ``model``)."""
+        _prompt = sum(_calls.prompt_tokens for _calls in self._llm_calls.values())
+        _cached = sum(_calls.cached_prompt_tokens for _calls in self._llm_calls.values())
+        _completion = sum(_calls.completion_tokens for _calls in self._llm_calls.values())
+        _price = get_model_prices().get(model)
+        _cost = None
+        if _price is not None:
+            _cost = (
+                (_prompt - _cached) * _price["prompt"]
+                + _cached * _price["cached_prompt"]
+                + _completion * _price["completion"]
+            ) / 1_000_000
+        return GenerationTimings(
+            total_seconds=round(time.perf_counter() - self.started_at, 4),
+            phases={_phase: self.phase_timing(_phase) for _phase in self._phases},
+            llm_calls={
+                _level: LLMCallTimings(
+                    calls=_calls.calls,
+                    errors=_calls.errors,
+                    cache_hits=_calls.cache_hits,
+                    latency_seconds=_latency_distribution(_calls.durations),
+                    prompt_tokens=_calls.prompt_tokens,
+                    cached_prompt_tokens=_calls.cached_prompt_tokens,
+                    completion_tokens=_calls.completion_tokens,
+                )
+                for _level, _calls in self._llm_calls.items()
+            },
+            retries=self.retries,
+            prompt_tokens=_prompt,
+            cached_prompt_tokens=_cached,
+            completion_tokens=_completion,
+            estimated_cost_usd=round(_cost, 6) if _cost is not None else None,
+        )
+
+    def phase_timing(self, phase: str) -> PhaseTiming:
+        _phase = self._phases[phase]
+        return PhaseTiming(
+            count=_phase.count,
+            wall_seconds=round(_phase.last_end - _phase.first_start, 4),
+            busy_seconds=round(_phase.busy_seconds, 4),
+        )
+
+
+# trace of the current generation (see trace_generation()); tasks started within it inherit the trace
+_generation_trace: ContextVar[Optional[GenerationTrace]] = ContextVar("generation_trace", default=None)
+
+
+@contextmanager
+def trace_generation() -> Iterator[GenerationTrace]:
+    """Aktiviert einen ``GenerationTrace`` für alle Phasen und OpenAI-Aufrufe innerhalb des Blocks."""
+    _trace = GenerationTrace()
+    _token = _generation_trace.set(_trace)
+    try:
+        yield _trace
+    finally:
+        _generation_trace.reset(_token)
+
+
+def get_generation_trace() -> Optional[GenerationTrace]:
+    return _generation_trace.get()
+
+
+@contextmanager
+def trace_phase(phase: str) -> Iterator[None]:
+    """Misst die Dauer des Blocks als Abschnitt von ``phase`` (nur mit aktivem Trace)."""
+    _trace = _generation_trace.get()
+    if _trace is None:
+        yield
+        return
+    _start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _trace.add_phase(phase, _start, time.perf_counter())
+
+
+def record_llm_call(level: str, duration: float, failed: bool) -> None:
+    """Zählt einen (fehlgeschlagenen) Aufruf an die API mit seiner Latenz (ohne Wartezeit im Scheduler)."""
+    _trace = _generation_trace.get()
+    if _trace is None:
+        return
+    _calls = _trace.llm_calls(level)
+    _calls.calls += 1
+    _calls.durations.append(duration)
+    if failed:
+        _calls.errors += 1
+
+
+def record_llm_usage(level: str, usage: CompletionUsage, cached_prompt_tokens: int) -> None:
+    _trace = _generation_trace.get()
+    if _trace is None:
+        return
+    _calls = _trace.llm_calls(level)
+    _calls.prompt_tokens += usage.prompt_tokens
+    _calls.cached_prompt_tokens += cached_prompt_tokens
+    _calls.completion_tokens += usage.completion_tokens
+
+
+def record_llm_cache_hit(level: str) -> None:
+    _trace = _generation_trace.get()
+    if _trace is not None:
+        _trace.llm_calls(level).cache_hits += 1
+
+
+def record_llm_retry() -> None:
+    _trace = _generation_trace.get()
+    if _trace is not None:
+        _trace.retries += 1
@@ -0,0 +1,114 @@
+import json
+from typing import Any, List, Optional
+
+# characters that may follow the opening bracket of the JSON value (anything else is a bracket in the text before it)
+_VALUE_CONTINUATIONS = {"[": "{]", "{": '"}'}
+
+
+class JsonArrayStreamParser:
+    """
+    Inkrementeller Parser für ein JSON-Array von Objekten, das stückweise (z.B. als Token-Stream) eintrifft.
+
+    ``feed()`` liefert jedes Objekt des ersten Arrays der Antwort, sobald dessen schließende Klammer angekommen ist.
+    Das Array darf in ein Objekt eingebettet sein (z.B. ``{"topics": [...]}`` bei Structured Outputs);
+    Text vor dem JSON-Wert (z.B. Markdown-Code-Fences) und nach dem Array wird ignoriert. Eine Klammer im Text
+    davor (z.B. ``Hier [die] Liste:``) beginnt den JSON-Wert nur, wenn ein Objekt oder das Ende des Arrays folgt.
+    Bereits gelieferte Elemente werden aus dem Puffer entfernt, der Speicherbedarf hängt also nur
+    von der Größe des längsten Elements ab.
+
+    :param skip_invalid: Falls True, werden ungültige Elemente übersprungen (und in ``invalid_items`` gezählt),
+        statt einen ``json.JSONDecodeError`` zu werfen
+    """
+
+    def __init__(self, skip_invalid: bool = False):
+        self.skip_invalid = skip_invalid
+        self.invalid_items = 0
+        self.done = False
+        self._buffer = ""
+        # position in the buffer up to which the characters have been scanned
+        self._position = 0
+        self._depth = 0
+        # depth of the first array (its elements are the objects one level deeper)
+        self._array_depth: Optional[int] = None
+        self._item_start: Optional[int] = None
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> List[Any]:
+        """
+        Hängt ``chunk`` an den Puffer an und liefert alle dadurch vollständig gewordenen Elemente.
+
+        :raises json.JSONDecodeError: Falls ein vollständiges Element kein gültiges JSON ist
+            (und ``skip_invalid`` False)
+        """
+        self._buffer += chunk
+        items = []
+        _index = self._position
+        while _index < len(self._buffer) and not self.done:
+            _char = self._buffer[_index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif _char == "\\":
+                    self._escaped = True
+                elif _char == '"':
+                    self._in_string = False
+            elif _char == '"':
+                # quotes in the text before the JSON value are not part of a JSON string
+                self._in_string = self._depth > 0
+            elif _char in "[{":
+                if self._depth == 0:
+                    _next_char = self._next_significant_char(_index + 1)
+                    if _next_char is None:
+                        # the next chunk decides whether the bracket starts the JSON value
+                        break
+                    if _next_char not in _VALUE_CONTINUATIONS[_char]:
+                        _index += 1
+                        continue
+                self._depth += 1
+                if self._array_depth is None and _char == "[":
+                    self._array_depth = self._depth
+                elif self._array_depth is not None and self._depth == self._array_depth + 1 and _char == "{":
+                    self._item_start = _index
+            elif _char in "]}" and self._depth > 0:
+                if self._item_start is not None and self._depth == self._array_depth + 1:
+                    self._append_item(items, self._buffer[self._item_start : _index + 1])
+                    self._item_start = None
+                self._depth -= 1
+                if self._array_depth is not None and self._depth < self._array_depth:
+                    self.done = True
+            _index += 1
+        self._position = len(self._buffer) if self.done else _index
+        self._trim()
+        return items
+
+    def _next_significant_char(self, start: int) -> Optional[str]:
+        """Liefert das nächste Zeichen ab ``start``, das kein Leerraum ist (``None``, falls es noch fehlt)."""
+        for _index in range(start, len(self._buffer)):
+            if not self._buffer[_index].isspace():
+                return self._buffer[_index]
+        return None
+
+    def _append_item(self, items: List[Any], raw: str) -> None:
+        try:
+            items.append(json.loads(raw))
+        except json.JSONDecodeError:
+            if not self.skip_invalid:
+                raise
+            self.invalid_items += 1
+
+    def _trim(self) -> None:
+        """Entfernt die bereits verarbeiteten Zeichen, die zu keinem offenen Element mehr gehören."""
+        _keep_from = self._item_start if self._item_start is not None else self._position
+        self._buffer = self._buffer[_keep_from:]
+        self._position -= _keep_from
+        if self._item_start is not None:
+            self._item_start = 0
+
+
+def salvage_json_array(content: str) -> List[Any]:
+    """
+    Rettet die vollständigen Objekte aus einer fehlerhaften Antwort (z.B. abgeschnitten, mit Code-Fences
+    oder mit Text vor bzw. nach dem JSON). Ungültige Objekte werden übersprungen.
+    """
+    return JsonArrayStreamParser(skip_invalid=True).feed(content)
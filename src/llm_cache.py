@@ -0,0 +1,229 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional
+
+from loguru import logger
+
+from src.DTOs.cache_statistics import CacheStatistics
+from src.metrics import Counter, Gauge, metrics_registry
+
+
+class LLMResponseCache:
+    """
+    Inhaltsadressierter Cache für LLM-Antworten.
+
+    Der Schlüssel ist ein SHA-256-Hash über Modell, Nachrichten (System- und User-Prompt) und weitere Parameter.
+    Vor dem persistenten SQLite-Speicher liegt ein begrenzter In-Memory-LRU-Cache.
+    Einträge verfallen nach ``ttl_seconds``; wird ``max_disk_entries`` überschritten,
+    werden die am längsten nicht genutzten Einträge gelöscht.
+    """
+
+    # expired entries and surplus entries are removed every n-th write instead of on every single write
+    _EVICTION_INTERVAL = 100
+
+    def __init__(
+        self,
+        path: Optional[str],
+        ttl_seconds: float,
+        max_memory_entries: int,
+        max_disk_entries: int,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._bypassed = 0
+        self._writes = 0
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_responses ("
+                "key TEXT PRIMARY KEY, model TEXT NOT NULL, content TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_accessed_at ON llm_responses (accessed_at)")
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model: str, messages: list, **params) -> str:
+        """Berechnet den Cache-Schlüssel für einen LLM-Aufruf."""
+        _payload = json.dumps(
+            {"model": model, "messages": messages, "params": params}, ensure_ascii=False, sort_keys=True, default=str
+        )
+        return hashlib.sha256(_payload.encode("utf-8")).hexdigest()
+
+    def _is_expired(self, created_at: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, content: str, created_at: float) -> None:
+        self._memory[key] = (content, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _read_from_disk(self, key: str) -> Optional[tuple[str, float]]:
+        with self._db_lock:
+            _row = self._db.execute("SELECT content, created_at FROM llm_responses WHERE key = ?", (key,)).fetchone()
+            if _row is None:
+                return None
+            if self._is_expired(_row[1]):
+                self._db.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE llm_responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            return _row[0], _row[1]
+
+    def _write_to_disk(self, key: str, model: str, content: str, created_at: float, evict: bool) -> None:
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, model, content, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, model, content, created_at, created_at),
+            )
+            if evict:
+                if self.ttl_seconds > 0:
+                    self._db.execute(
+                        "DELETE FROM llm_responses WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+                    )
+                self._db.execute(
+                    "DELETE FROM llm_responses WHERE key IN ("
+                    "SELECT key FROM llm_responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,),
+                )
+            self._db.commit()
+
+    async def get(self, key: str) -> Optional[str]:
+        """Liefert die gecachte Antwort oder ``None``."""
+        _entry = self._memory.get(key)
+        if _entry is not None:
+            if not self._is_expired(_entry[1]):
+                self._memory.move_to_end(key)
+                self._memory_hits += 1
+                return _entry[0]
+            del self._memory[key]
+        if self._db is not None:
+            _entry = await asyncio.to_thread(self._read_from_disk, key)
+            if _entry is not None:
+                self._remember(key, *_entry)
+                self._disk_hits += 1
+                return _entry[0]
+        self._misses += 1
+        return None
+
+    async def set(self, key: str, model: str, content: str) -> None:
+        """Speichert eine Antwort im Memory- und (falls konfiguriert) im Disk-Cache."""
+        _created_at = time.time()
+        self._remember(key, content, _created_at)
+        if self._db is not None:
+            self._writes += 1
+            _evict = self._writes % self._EVICTION_INTERVAL == 0
+            try:
+                await asyncio.to_thread(self._write_to_disk, key, model, content, _created_at, _evict)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not persist LLM response in cache: {e}")
+
+    def record_bypass(self) -> None:
+        self._bypassed += 1
+
+    def _count_disk_entries(self) -> int:
+        with self._db_lock:
+            return self._db.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+
+    async def statistics(self) -> CacheStatistics:
+        """Liefert die Hit-/Miss-Zähler und die aktuelle Größe des Caches."""
+        _lookups = self._memory_hits + self._disk_hits + self._misses
+        return CacheStatistics(
+            memory_hits=self._memory_hits,
+            disk_hits=self._disk_hits,
+            misses=self._misses,
+            bypassed=self._bypassed,
+            hit_ratio=round((self._memory_hits + self._disk_hits) / _lookups, 4) if _lookups else 0.0,
+            memory_entries=len(self._memory),
+            disk_entries=await asyncio.to_thread(self._count_disk_entries) if self._db is not None else 0,
+        )
+
+    def close(self) -> None:
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+            self._db = None
+
+
+def create_llm_cache_from_env() -> Optional[LLMResponseCache]:
+    """
+    Erstellt den Cache anhand der Umgebungsvariablen:
+
+    - ``LLM_CACHE_ENABLED``: ``false`` deaktiviert den Cache komplett (Default: ``true``)
+    - ``LLM_CACHE_PATH``: Pfad der SQLite-Datei; leer = nur In-Memory (Default: ``.cache/llm_cache.sqlite3``)
+    - ``LLM_CACHE_TTL_SECONDS``: Lebensdauer eines Eintrags, ``0`` = unbegrenzt (Default: 604800, d.h. 7 Tage)
+    - ``LLM_CACHE_MEMORY_ENTRIES``: Größe des In-Memory-LRU-Caches (Default: 1000)
+    - ``LLM_CACHE_MAX_ENTRIES``: maximale Anzahl der Einträge auf der Festplatte (Default: 100000)
+    """
+    if os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("false", "0", "no"):
+        return None
+    try:
+        return LLMResponseCache(
+            path=os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite3"),
+            ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 60 * 60)),
+            max_memory_entries=int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", 1000)),
+            max_disk_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", 100_000)),
+        )
+    except (ValueError, sqlite3.Error, OSError) as e:
+        logger.warning(f"Could not initialize the LLM response cache: {e}. Continuing without cache.")
+        return None
+
+
+_llm_cache: Optional[LLMResponseCache] = None
+
+
+def configure_llm_cache() -> Optional[LLMResponseCache]:
+    """(Re-)Initialisiert den prozessweiten Cache (wird beim Start der App aufgerufen)."""
+    global _llm_cache
+    close_llm_cache()
+    _llm_cache = create_llm_cache_from_env()
+    return _llm_cache
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """Liefert den prozessweiten Cache (``None``, falls deaktiviert oder noch nicht konfiguriert)."""
+    return _llm_cache
+
+
+def close_llm_cache() -> None:
+    global _llm_cache
+    if _llm_cache is not None:
+        _llm_cache.close()
+    _llm_cache = None
+
+
+def _collect_cache_metrics() -> List[Counter]:
+    """Liefert die Zähler des prozessweiten Caches für ``/metrics`` (keine, falls der Cache deaktiviert ist)."""
+    if _llm_cache is None:
+        return []
+    _lookups = Counter("llm_cache_lookups_total", "Abfragen des LLM-Caches nach Ergebnis", ("result",))
+    _lookups.inc(_llm_cache._memory_hits, result="memory_hit")
+    _lookups.inc(_llm_cache._disk_hits, result="disk_hit")
+    _lookups.inc(_llm_cache._misses, result="miss")
+    _bypassed = Counter("llm_cache_bypassed_total", "Anfragen, die den LLM-Cache per bypass_cache umgangen haben")
+    _bypassed.inc(_llm_cache._bypassed)
+    _memory_entries = Gauge("llm_cache_memory_entries", "Einträge im In-Memory-LRU-Cache")
+    _memory_entries.inc(len(_llm_cache._memory))
+    return [_lookups, _bypassed, _memory_entries]
+
+
+metrics_registry.register_collector(_collect_cache_metrics)
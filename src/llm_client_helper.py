@@ -0,0 +1,359 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterator, Optional
+
+import backoff
+import httpx
+from loguru import logger
+from openai import (
+    APIConnectionError,
+    AsyncOpenAI,
+    AsyncStream,
+    DefaultAsyncHttpxClient,
+    InternalServerError,
+    RateLimitError,
+)
+from openai.types import CompletionUsage
+from openai.types.chat import ChatCompletion, ChatCompletionChunk, ChatCompletionMessageParam
+
+from src.generation_trace import record_llm_cache_hit, record_llm_call, record_llm_retry, record_llm_usage
+from src.llm_cache import LLMResponseCache, get_llm_cache
+from src.llm_scheduler import estimate_tokens, get_llm_scheduler, get_number_env
+from src.metrics import (
+    get_llm_call_level,
+    llm_cached_prompt_tokens,
+    llm_call_duration,
+    llm_call_errors,
+    llm_calls_in_flight,
+    llm_calls_waiting,
+    llm_completion_tokens,
+    llm_prompt_tokens,
+    llm_rate_limit_errors,
+    llm_retries,
+)
+from src.single_flight import SingleFlight
+
+# identical LLM calls that are in flight at the same time are sent to the API only once
+llm_call_single_flight = SingleFlight("llm-call")
+
+
+@dataclass
+class LLMUsage:
+    """Aufsummierter Token-Verbrauch der OpenAI-Aufrufe (z.B. eines Themenbaums)."""
+
+    calls: int = 0
+    prompt_tokens: int = 0
+    cached_prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    def add(self, usage: CompletionUsage) -> None:
+        self.calls += 1
+        self.prompt_tokens += usage.prompt_tokens
+        self.cached_prompt_tokens += _cached_prompt_tokens(usage)
+        self.completion_tokens += usage.completion_tokens
+
+
+# usage of the currently tracked unit of work (see track_llm_usage()); tasks started within it inherit the tracker
+_llm_usage: ContextVar[Optional[LLMUsage]] = ContextVar("llm_usage", default=None)
+
+
+@contextmanager
+def track_llm_usage() -> Iterator[LLMUsage]:
+    """
+    Summiert den Token-Verbrauch aller OpenAI-Aufrufe, die innerhalb des Blocks (inkl. darin gestarteter Tasks)
+    an die API geschickt werden. Antworten aus dem LLM-Cache verbrauchen keine Tokens und werden nicht gezählt.
+    """
+    _usage = LLMUsage()
+    _token = _llm_usage.set(_usage)
+    try:
+        yield _usage
+    finally:
+        _llm_usage.reset(_token)
+
+
+def _cached_prompt_tokens(usage: CompletionUsage) -> int:
+    _details = usage.prompt_tokens_details
+    return (_details.cached_tokens or 0) if _details else 0
+
+
+def get_openai_key() -> str:
+    """Liest den OpenAI-API-Key aus den Umgebungsvariablen."""
+    return os.getenv("OPENAI_API_KEY", "")
+
+
+def create_openai_client(api_key: str) -> AsyncOpenAI:
+    """
+    Erstellt den prozessweit geteilten OpenAI-Client mit einem konfigurierbaren Keep-Alive-Connection-Pool.
+
+    Konfiguration über Umgebungsvariablen:
+
+    - ``OPENAI_MAX_CONNECTIONS``: maximale Anzahl gleichzeitiger Verbindungen (Default: 100)
+    - ``OPENAI_MAX_KEEPALIVE_CONNECTIONS``: maximale Anzahl offen gehaltener Verbindungen (Default: 20)
+    - ``OPENAI_KEEPALIVE_EXPIRY``: Sekunden, die eine ungenutzte Verbindung offen bleibt (Default: 60)
+
+    :param api_key: OpenAI API Key
+    :return: `AsyncOpenAI`-Client, der für alle Requests wiederverwendet werden soll
+    """
+    _limits = httpx.Limits(
+        max_connections=int(get_number_env("OPENAI_MAX_CONNECTIONS", 100)),
+        max_keepalive_connections=int(get_number_env("OPENAI_MAX_KEEPALIVE_CONNECTIONS", 20)),
+        keepalive_expiry=get_number_env("OPENAI_KEEPALIVE_EXPIRY", 60.0),
+    )
+    logger.info(f"Creating shared OpenAI client with connection pool limits: {_limits}")
+    # the DefaultAsyncHttpxClient keeps the OpenAI SDK defaults (timeouts, redirects)
+    # and only overrides the pool limits.
+    # retries are disabled in the SDK: they are handled by create_chat_completion(),
+    # so that they go through the scheduler
+    return AsyncOpenAI(api_key=api_key, http_client=DefaultAsyncHttpxClient(limits=_limits), max_retries=0)
+
+
+async def warm_up_openai_client(client: AsyncOpenAI) -> None:
+    """
+    Öffnet beim Start bereits einige Verbindungen zur OpenAI-API,
+    damit die ersten Requests keinen TLS-Handshake mehr bezahlen müssen.
+
+    Die Anzahl wird über ``OPENAI_WARMUP_CONNECTIONS`` gesteuert (Default: 4, ``0`` deaktiviert das Warm-up).
+    Fehler beim Warm-up werden nur geloggt und verhindern den Start der App nicht.
+    """
+    _num_connections = int(get_number_env("OPENAI_WARMUP_CONNECTIONS", 4))
+    if _num_connections <= 0:
+        return
+    # concurrent requests force the pool to open one connection each, which are then kept alive for later reuse
+    _warmup_client = client.with_options(max_retries=0, timeout=get_number_env("OPENAI_WARMUP_TIMEOUT", 10.0))
+    _results = await asyncio.gather(
+        *[_warmup_client.models.list() for _ in range(_num_connections)],
+        return_exceptions=True,
+    )
+    _errors = [_result for _result in _results if isinstance(_result, Exception)]
+    if _errors:
+        logger.warning(f"OpenAI connection warm-up: {len(_errors)}/{_num_connections} requests failed: {_errors[0]}")
+    else:
+        logger.info(f"OpenAI connection warm-up: opened {_num_connections} connections.")
+
+
+def _retry_after_seconds(error: RateLimitError) -> Optional[float]:
+    """Liest den ``retry-after``-Header einer ``RateLimitError``-Antwort (falls vorhanden)."""
+    try:
+        return float(error.response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def _on_backoff(details: dict) -> None:
+    _error = details.get("exception")
+    _model = details["kwargs"].get("model", "")
+    if isinstance(_error, RateLimitError):
+        get_llm_scheduler().report_rate_limit(_model, _retry_after_seconds(_error))
+    llm_retries.inc(model=_model, error=type(_error).__name__)
+    record_llm_retry()
+    logger.warning(f"Retrying OpenAI call for model '{_model}' (attempt {details['tries']}) after error: {_error}")
+
+
+@backoff.on_exception(
+    backoff.expo,
+    (RateLimitError, APIConnectionError, InternalServerError),
+    max_tries=5,
+    jitter=backoff.full_jitter,
+    on_backoff=_on_backoff,
+)
+async def create_chat_completion(
+    client: AsyncOpenAI, model: str, messages: list[ChatCompletionMessageParam], **kwargs
+) -> ChatCompletion:
+    """
+    Schickt eine Chat-Completion-Anfrage über den prozessweiten ``LLMScheduler`` an die OpenAI-API.
+
+    Der Scheduler hält die konfigurierten RPM-/TPM-Budgets und die Concurrency-Obergrenze ein.
+    Bei ``RateLimitError``, Verbindungs- oder Serverfehlern wird mit exponentiellem Backoff erneut versucht;
+    ein ``RateLimitError`` pausiert dabei zusätzlich alle anderen Aufrufe für dasselbe Modell.
+
+    :param client: geteilter OpenAI-Client
+    :param model: Name des OpenAI-Modells
+    :param messages: Nachrichten der Chat-Completion
+    :param kwargs: weitere Parameter für ``client.chat.completions.create()``
+    :return: die Antwort der OpenAI-API
+    """
+    _estimated_tokens = _estimate_call_tokens(messages)
+    async with _llm_call_slot(model, _estimated_tokens):
+        response = await client.chat.completions.create(model=model, messages=messages, **kwargs)
+    if response.usage:
+        _record_usage(model, _estimated_tokens, response.usage)
+    return response
+
+
+@asynccontextmanager
+async def _llm_call_slot(model: str, estimated_tokens: int) -> AsyncIterator[None]:
+    """
+    Belegt einen Slot des ``LLMScheduler`` für einen OpenAI-Aufruf und misst dabei Wartezeit (``llm_calls_waiting``),
+    laufende Aufrufe, Dauer und Fehler des Aufrufs (siehe ``src/metrics.py`` und ``src/generation_trace.py``).
+    """
+    _level = get_llm_call_level()
+    _waiting = True
+    llm_calls_waiting.inc(model=model)
+    try:
+        async with get_llm_scheduler().slot(model, estimated_tokens):
+            llm_calls_waiting.dec(model=model)
+            _waiting = False
+            _start = time.perf_counter()
+            _failed = False
+            with llm_calls_in_flight.track_inprogress(model=model):
+                try:
+                    yield
+                except Exception as e:
+                    # every failed attempt is counted, retries additionally in llm_retries_total (see _on_backoff())
+                    _failed = True
+                    llm_call_errors.inc(model=model, level=_level, error=type(e).__name__)
+                    if isinstance(e, RateLimitError):
+                        llm_rate_limit_errors.inc(model=model)
+                    raise
+                finally:
+                    _duration = time.perf_counter() - _start
+                    llm_call_duration.observe(_duration, model=model, level=_level)
+                    record_llm_call(_level, _duration, _failed)
+    finally:
+        if _waiting:
+            llm_calls_waiting.dec(model=model)
+
+
+def _estimate_call_tokens(messages: list[ChatCompletionMessageParam]) -> int:
+    # the expected completion length is unknown upfront and is corrected after the call via reconcile_tokens()
+    _estimated_tokens = estimate_tokens(str(_message.get("content", "")) for _message in messages)
+    return _estimated_tokens + int(get_number_env("LLM_ESTIMATED_COMPLETION_TOKENS", 1000))
+
+
+def _record_usage(model: str, estimated_tokens: int, usage: CompletionUsage) -> None:
+    """Korrigiert das TPM-Budget des Schedulers und zählt die Tokens für ``track_llm_usage()`` und ``/metrics``."""
+    get_llm_scheduler().reconcile_tokens(model, estimated_tokens, usage.total_tokens)
+    _level = get_llm_call_level()
+    llm_prompt_tokens.inc(usage.prompt_tokens, model=model, level=_level)
+    llm_cached_prompt_tokens.inc(_cached_prompt_tokens(usage), model=model, level=_level)
+    llm_completion_tokens.inc(usage.completion_tokens, model=model, level=_level)
+    record_llm_usage(_level, usage, _cached_prompt_tokens(usage))
+    logger.debug(
+        f"OpenAI call for model '{model}': {usage.prompt_tokens} prompt tokens "
+        f"({_cached_prompt_tokens(usage)} cached), {usage.completion_tokens} completion tokens"
+    )
+    _usage = _llm_usage.get()
+    if _usage is not None:
+        _usage.add(usage)
+
+
+@backoff.on_exception(
+    backoff.expo,
+    (RateLimitError, APIConnectionError, InternalServerError),
+    max_tries=5,
+    jitter=backoff.full_jitter,
+    on_backoff=_on_backoff,
+)
+async def _open_chat_completion_stream(
+    client: AsyncOpenAI, model: str, messages: list[ChatCompletionMessageParam], **kwargs
+) -> AsyncStream[ChatCompletionChunk]:
+    return await client.chat.completions.create(
+        model=model, messages=messages, stream=True, stream_options={"include_usage": True}, **kwargs
+    )
+
+
+async def stream_chat_completion(
+    client: AsyncOpenAI, model: str, messages: list[ChatCompletionMessageParam], **kwargs
+) -> AsyncIterator[ChatCompletionChunk]:
+    """
+    Wie ``create_chat_completion()``, liefert die Antwort aber stückweise (``ChatCompletionChunk``),
+    sobald sie vom Modell generiert wird.
+
+    Der Scheduler-Slot bleibt belegt, bis der Stream vollständig gelesen wurde. Fehler beim Öffnen des Streams
+    werden mit Backoff wiederholt; bricht ein bereits laufender Stream ab, wird der Fehler weitergereicht
+    (der bis dahin gelieferte Text wäre sonst doppelt).
+    """
+    _estimated_tokens = _estimate_call_tokens(messages)
+    async with _llm_call_slot(model, _estimated_tokens):
+        async with await _open_chat_completion_stream(client, model=model, messages=messages, **kwargs) as stream:
+            async for chunk in stream:
+                # with include_usage, the last chunk has no choices but the token usage of the whole call
+                if chunk.usage:
+                    _record_usage(model, _estimated_tokens, chunk.usage)
+                yield chunk
+
+
+async def complete_chat(
+    client: AsyncOpenAI,
+    model: str,
+    messages: list[ChatCompletionMessageParam],
+    bypass_cache: bool = False,
+    **kwargs,
+) -> str:
+    """
+    Liefert den Antworttext einer Chat-Completion - aus dem LLM-Cache, falls dieselbe Anfrage schon beantwortet wurde.
+    Identische Anfragen, die gleichzeitig laufen, werden zusammengefasst und nur einmal an die API geschickt.
+
+    :param client: geteilter OpenAI-Client
+    :param model: Name des OpenAI-Modells
+    :param messages: Nachrichten der Chat-Completion
+    :param bypass_cache: Falls True, wird der Cache nicht gelesen; die neue Antwort ersetzt einen vorhandenen Eintrag
+    :param kwargs: weitere Parameter für ``client.chat.completions.create()``
+    :return: Antworttext des Modells (kann leer sein)
+    """
+    cache = get_llm_cache()
+    _key = LLMResponseCache.make_key(model, messages, **kwargs)
+    if cache is not None:
+        if bypass_cache:
+            cache.record_bypass()
+        else:
+            _cached_content = await cache.get(_key)
+            if _cached_content is not None:
+                logger.debug(f"LLM cache hit for model '{model}' (key: {_key[:12]}...)")
+                record_llm_cache_hit(get_llm_call_level())
+                return _cached_content
+
+    async def _complete_uncached() -> str:
+        response = await create_chat_completion(client=client, model=model, messages=messages, **kwargs)
+        content = response.choices[0].message.content or ""
+        # only complete answers are cached: truncated or empty responses should be requested again next time
+        if cache is not None and content.strip() and response.choices[0].finish_reason == "stop":
+            await cache.set(_key, model, content)
+        return content
+
+    return await llm_call_single_flight.do(_key, _complete_uncached)
+
+
+async def stream_chat(
+    client: AsyncOpenAI,
+    model: str,
+    messages: list[ChatCompletionMessageParam],
+    bypass_cache: bool = False,
+    **kwargs,
+) -> AsyncIterator[str]:
+    """
+    Wie ``complete_chat()``, liefert den Antworttext aber stückweise (siehe ``stream_chat_completion()``).
+
+    Eine Antwort aus dem LLM-Cache wird als ein einziges Stück geliefert; gestreamte Antworten werden erst
+    nach dem letzten Stück in den Cache geschrieben. Gleichzeitige identische Streams werden nicht zusammengefasst.
+    """
+    cache = get_llm_cache()
+    _key = LLMResponseCache.make_key(model, messages, **kwargs)
+    if cache is not None:
+        if bypass_cache:
+            cache.record_bypass()
+        else:
+            _cached_content = await cache.get(_key)
+            if _cached_content is not None:
+                logger.debug(f"LLM cache hit for model '{model}' (key: {_key[:12]}...)")
+                record_llm_cache_hit(get_llm_call_level())
+                yield _cached_content
+                return
+
+    _parts = []
+    _finish_reason = None
+    async for _chunk in stream_chat_completion(client=client, model=model, messages=messages, **kwargs):
+        if not _chunk.choices:
+            continue
+        _finish_reason = _chunk.choices[0].finish_reason or _finish_reason
+        if _chunk.choices[0].delta.content:
+            _parts.append(_chunk.choices[0].delta.content)
+            yield _chunk.choices[0].delta.content
+    content = "".join(_parts)
+    # only complete answers are cached: truncated or empty responses should be requested again next time
+    if cache is not None and content.strip() and _finish_reason == "stop":
+        await cache.set(_key, model, content)
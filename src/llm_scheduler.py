@@ -0,0 +1,210 @@
+import asyncio
+import json
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Iterable, Optional
+
+from loguru import logger
+
+# rough heuristic for German prompts: one token per ~3.5 characters
+# (the estimate is corrected with the real token usage after each call, see ``LLMScheduler.reconcile_tokens``)
+_CHARS_PER_TOKEN = 3.5
+
+
+def estimate_tokens(texts: Iterable[str]) -> int:
+    """Schätzt die Anzahl der Tokens der übergebenen Texte (ohne Tokenizer-Abhängigkeit)."""
+    return math.ceil(sum(len(_text) for _text in texts) / _CHARS_PER_TOKEN)
+
+
+class _RateLimiter:
+    """
+    Token-Bucket, der sich kontinuierlich wieder auffüllt (``capacity`` Einheiten pro Minute).
+    Wartende Aufrufer werden in der Reihenfolge ihres Eintreffens bedient.
+    """
+
+    def __init__(self, capacity_per_minute: float):
+        self.capacity = capacity_per_minute
+        self._level = capacity_per_minute
+        self._refill_rate = capacity_per_minute / 60.0
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def _refill(self) -> None:
+        _now = time.monotonic()
+        self._level = min(self.capacity, self._level + (_now - self._updated_at) * self._refill_rate)
+        self._updated_at = _now
+
+    async def acquire(self, amount: float) -> None:
+        if self.unlimited:
+            return
+        # a single call that is larger than the whole budget must not block forever
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                _wait = self._blocked_until - time.monotonic()
+                if _wait <= 0 and self._level >= amount:
+                    self._level -= amount
+                    return
+                _wait = max(_wait, (amount - self._level) / self._refill_rate)
+                await asyncio.sleep(_wait)
+
+    def adjust(self, amount: float) -> None:
+        """Korrigiert den Füllstand nachträglich (positive Werte verbrauchen, negative geben Budget zurück)."""
+        if self.unlimited:
+            return
+        self._refill()
+        self._level = min(self.capacity, self._level - amount)
+
+    def block(self, seconds: float) -> None:
+        """Pausiert alle weiteren Anfragen für die angegebene Zeit (z.B. nach einem ``RateLimitError``)."""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+
+@dataclass
+class ModelRateLimits:
+    requests_per_minute: float
+    tokens_per_minute: float
+
+
+class LLMScheduler:
+    """
+    Prozessweiter Scheduler, über den alle LLM-Aufrufe laufen.
+
+    Pro Modell werden Requests-per-Minute (RPM) und Tokens-per-Minute (TPM) begrenzt,
+    zusätzlich gibt es eine globale Obergrenze für gleichzeitig laufende Aufrufe.
+    Dadurch bleiben wir knapp unter den Limits des Providers, statt in ``RateLimitError``-Retry-Schleifen zu laufen.
+    """
+
+    def __init__(
+        self,
+        max_concurrent_calls: int,
+        default_limits: ModelRateLimits,
+        model_limits: Optional[Dict[str, ModelRateLimits]] = None,
+    ):
+        self.max_concurrent_calls = max_concurrent_calls
+        self._semaphore = asyncio.Semaphore(max_concurrent_calls)
+        self._default_limits = default_limits
+        self._model_limits = model_limits or {}
+        self._request_limiters: Dict[str, _RateLimiter] = {}
+        self._token_limiters: Dict[str, _RateLimiter] = {}
+
+    def _limiters(self, model: str) -> tuple[_RateLimiter, _RateLimiter]:
+        if model not in self._request_limiters:
+            _limits = self._model_limits.get(model, self._default_limits)
+            self._request_limiters[model] = _RateLimiter(_limits.requests_per_minute)
+            self._token_limiters[model] = _RateLimiter(_limits.tokens_per_minute)
+        return self._request_limiters[model], self._token_limiters[model]
+
+    @asynccontextmanager
+    async def slot(self, model: str, estimated_tokens: int) -> AsyncIterator[None]:
+        """
+        Wartet, bis ein Aufruf für das Modell innerhalb des Concurrency-, RPM- und TPM-Budgets möglich ist.
+
+        :param model: Name des OpenAI-Modells
+        :param estimated_tokens: geschätzte Tokens (Prompt + erwartete Antwort) des Aufrufs
+        """
+        _requests, _tokens = self._limiters(model)
+        async with self._semaphore:
+            await _requests.acquire(1)
+            await _tokens.acquire(estimated_tokens)
+            yield
+
+    def reconcile_tokens(self, model: str, estimated_tokens: int, actual_tokens: int) -> None:
+        """Gleicht das TPM-Budget nach einem Aufruf mit der tatsächlichen Token-Nutzung (``resp.usage``) ab."""
+        _, _tokens = self._limiters(model)
+        _tokens.adjust(actual_tokens - estimated_tokens)
+
+    def report_rate_limit(self, model: str, retry_after: Optional[float]) -> None:
+        """Pausiert alle Aufrufe des Modells, nachdem der Provider einen ``RateLimitError`` gemeldet hat."""
+        _seconds = retry_after if retry_after and retry_after > 0 else 1.0
+        logger.warning(f"Rate limit reached for model '{model}'. Pausing calls for {_seconds} seconds.")
+        _requests, _tokens = self._limiters(model)
+        _requests.block(_seconds)
+        _tokens.block(_seconds)
+
+
+def get_number_env(name: str, default: float) -> float:
+    """Liest eine Zahl aus der Umgebungsvariablen ``name``; fehlt sie oder ist sie ungültig, gilt ``default``."""
+    _value = os.getenv(name)
+    if not _value:
+        return default
+    try:
+        return float(_value)
+    except ValueError:
+        logger.warning(f"Invalid value for {name}: '{_value}'. Falling back to default value {default}.")
+        return default
+
+
+def create_llm_scheduler_from_env() -> LLMScheduler:
+    """
+    Erstellt den Scheduler anhand der Umgebungsvariablen:
+
+    - ``LLM_MAX_CONCURRENT_CALLS``: globale Obergrenze gleichzeitiger LLM-Aufrufe (Default: 50, mindestens 1)
+    - ``LLM_REQUESTS_PER_MINUTE``: RPM-Budget pro Modell (Default: 500, ``0`` = unbegrenzt)
+    - ``LLM_TOKENS_PER_MINUTE``: TPM-Budget pro Modell (Default: 200000, ``0`` = unbegrenzt)
+    - ``LLM_MODEL_RATE_LIMITS``: abweichende Budgets pro Modell als JSON,
+      z.B. ``{"gpt-4o": {"rpm": 500, "tpm": 30000}}`` (fehlende Budgets werden vom Default übernommen)
+    - ``LLM_RATE_LIMIT_HEADROOM``: Anteil der Provider-Limits, der genutzt wird (Default: 0.9)
+    """
+    _headroom = get_number_env("LLM_RATE_LIMIT_HEADROOM", 0.9)
+    default_limits = ModelRateLimits(
+        requests_per_minute=get_number_env("LLM_REQUESTS_PER_MINUTE", 500) * _headroom,
+        tokens_per_minute=get_number_env("LLM_TOKENS_PER_MINUTE", 200_000) * _headroom,
+    )
+    model_limits: Dict[str, ModelRateLimits] = {}
+    _model_limits_json = os.getenv("LLM_MODEL_RATE_LIMITS")
+    if _model_limits_json:
+        try:
+            for _model, _limits in json.loads(_model_limits_json).items():
+                # budgets that are not given for the model fall back to the default limits
+                model_limits[_model] = ModelRateLimits(
+                    requests_per_minute=(
+                        float(_limits["rpm"]) * _headroom if "rpm" in _limits else default_limits.requests_per_minute
+                    ),
+                    tokens_per_minute=(
+                        float(_limits["tpm"]) * _headroom if "tpm" in _limits else default_limits.tokens_per_minute
+                    ),
+                )
+        except (ValueError, AttributeError, TypeError) as e:
+            logger.warning(f"Invalid value for LLM_MODEL_RATE_LIMITS: {e}. Using the default limits for all models.")
+            model_limits = {}
+    _max_concurrent_calls = int(get_number_env("LLM_MAX_CONCURRENT_CALLS", 50))
+    if _max_concurrent_calls < 1:
+        # a semaphore of 0 would block every call (and a negative value raises)
+        logger.warning(f"Invalid value for LLM_MAX_CONCURRENT_CALLS: {_max_concurrent_calls}. Using 1 instead.")
+        _max_concurrent_calls = 1
+    return LLMScheduler(
+        max_concurrent_calls=_max_concurrent_calls,
+        default_limits=default_limits,
+        model_limits=model_limits,
+    )
+
+
+_llm_scheduler: Optional[LLMScheduler] = None
+
+
+def configure_llm_scheduler() -> LLMScheduler:
+    """(Re-)Initialisiert den prozessweiten Scheduler (wird beim Start der App aufgerufen)."""
+    global _llm_scheduler
+    _llm_scheduler = create_llm_scheduler_from_env()
+    logger.info(
+        f"LLM scheduler configured: max. {_llm_scheduler.max_concurrent_calls} concurrent calls, "
+        f"default limits: {_llm_scheduler._default_limits}, model limits: {_llm_scheduler._model_limits}"
+    )
+    return _llm_scheduler
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    """Liefert den prozessweiten Scheduler (und erstellt ihn bei Bedarf)."""
+    if _llm_scheduler is None:
+        return configure_llm_scheduler()
+    return _llm_scheduler
@@ -0,0 +1,313 @@
+import asyncio
+import bisect
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# content type of the Prometheus text exposition format
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Buckets (Sekunden) für LLM-Aufrufe und HTTP-Requests: von schnellen Cache-Antworten bis zu großen Themenbäumen
+LLM_CALL_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+REQUEST_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+# Buckets (Sekunden) für die Verzögerung der Event-Loop: schon wenige Millisekunden bremsen alle laufenden Requests
+EVENT_LOOP_LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# label value of LLM calls outside of a topic tree level (see llm_call_level())
+LEVEL_OTHER = "other"
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    _pairs = [f'{_name}="{_escape_label_value(_value)}"' for _name, _value in zip(names, values)]
+    return "{" + ",".join(_pairs) + "}" if _pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(_name, "")) for _name in self.label_names)
+
+    def _samples(self) -> Iterator[Tuple[str, str, float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(f"{_name}{_labels} {_format_value(_value)}" for _name, _labels, _value in self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    """Monoton steigender Zähler (z.B. Tokens, Retries) je Label-Kombination."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        _key = self._key(labels)
+        self._values[_key] = self._values.get(_key, 0) + amount
+
+    def _samples(self) -> Iterator[Tuple[str, str, float]]:
+        for _key, _value in sorted(self._values.items()):
+            yield self.name, _format_labels(self.label_names, _key), _value
+
+
+class Gauge(Counter):
+    """Wert, der steigen und fallen kann (z.B. laufende LLM-Aufrufe)."""
+
+    type_name = "gauge"
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_inprogress(self, **labels: str) -> Iterator[None]:
+        """Erhöht den Wert für die Dauer des Blocks um 1."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    """Verteilung von Messwerten (z.B. Latenzen) in kumulativen Buckets je Label-Kombination."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, label_names: Tuple[str, ...] = (), buckets: Tuple[float, ...] = ()
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # per label combination: counts per bucket (not cumulative, the last one is +Inf) and the sum of all values
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        _key = self._key(labels)
+        _counts = self._counts.get(_key)
+        if _counts is None:
+            _counts = self._counts[_key] = [0] * (len(self.buckets) + 1)
+            self._sums[_key] = 0.0
+        _counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[_key] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Misst die Dauer des Blocks (auch wenn er mit einer Exception endet)."""
+        _start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - _start, **labels)
+
+    def _samples(self) -> Iterator[Tuple[str, str, float]]:
+        for _key, _counts in sorted(self._counts.items()):
+            _cumulative = 0
+            for _bound, _count in zip((*self.buckets, float("inf")), _counts):
+                _cumulative += _count
+                _labels = _format_labels((*self.label_names, "le"), (*_key, _format_value(_bound)))
+                yield f"{self.name}_bucket", _labels, _cumulative
+            yield f"{self.name}_sum", _format_labels(self.label_names, _key), self._sums[_key]
+            yield f"{self.name}_count", _format_labels(self.label_names, _key), _cumulative
+
+
+class MetricsRegistry:
+    """
+    Sammelt die Metriken des Prozesses und gibt sie im Prometheus-Textformat aus (siehe ``GET /metrics``).
+
+    Neben den eigenen Metriken können Collector-Funktionen registriert werden, die bestehende Zähler
+    (z.B. des LLM-Caches) erst beim Abruf als Metriken liefern.
+    """
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable[_Metric]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, label_names))
+
+    def gauge(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, label_names))
+
+    def histogram(
+        self, name: str, documentation: str, label_names: Tuple[str, ...] = (), buckets: Tuple[float, ...] = ()
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, label_names, buckets))
+
+    def register_collector(self, collector: Callable[[], Iterable[_Metric]]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        _metrics = [*self._metrics, *(_metric for _collector in self._collectors for _metric in _collector())]
+        return "\n".join(_line for _metric in _metrics for _line in _metric.render()) + "\n"
+
+
+# process-wide registry, rendered by GET /metrics
+metrics_registry = MetricsRegistry()
+
+llm_call_duration = metrics_registry.histogram(
+    "llm_call_duration_seconds",
+    "Dauer der OpenAI-Aufrufe (ohne Wartezeit im Scheduler, bei Streams bis zum letzten Stück)",
+    ("model", "level"),
+    LLM_CALL_BUCKETS,
+)
+llm_calls_in_flight = metrics_registry.gauge(
+    "llm_calls_in_flight", "Laufende OpenAI-Aufrufe (Scheduler-Slot belegt)", ("model",)
+)
+llm_calls_waiting = metrics_registry.gauge(
+    "llm_calls_waiting", "OpenAI-Aufrufe, die auf einen Scheduler-Slot (Concurrency, RPM, TPM) warten", ("model",)
+)
+llm_call_errors = metrics_registry.counter(
+    "llm_call_errors_total", "Fehlgeschlagene OpenAI-Aufrufe (nach allen Retries)", ("model", "level", "error")
+)
+llm_prompt_tokens = metrics_registry.counter(
+    "llm_prompt_tokens_total", "Prompt-Tokens laut resp.usage", ("model", "level")
+)
+llm_cached_prompt_tokens = metrics_registry.counter(
+    "llm_cached_prompt_tokens_total", "Davon vom Provider gecachte Prompt-Tokens", ("model", "level")
+)
+llm_completion_tokens = metrics_registry.counter(
+    "llm_completion_tokens_total", "Completion-Tokens laut resp.usage", ("model", "level")
+)
+llm_retries = metrics_registry.counter(
+    "llm_retries_total", "Wiederholte OpenAI-Aufrufe (Backoff) nach Fehlertyp", ("model", "error")
+)
+llm_rate_limit_errors = metrics_registry.counter(
+    "llm_rate_limit_errors_total", "Vom Provider gemeldete RateLimitErrors (HTTP 429)", ("model",)
+)
+http_request_duration = metrics_registry.histogram(
+    "http_request_duration_seconds",
+    "Dauer der HTTP-Requests bis zum letzten Byte der Antwort (inkl. Streaming-Antworten)",
+    ("method", "route", "status"),
+    REQUEST_BUCKETS,
+)
+http_requests_in_progress = metrics_registry.gauge("http_requests_in_progress", "Laufende HTTP-Requests", ("method",))
+event_loop_lag = metrics_registry.histogram(
+    "event_loop_lag_seconds",
+    "Verspätung eines periodischen Timers der Event-Loop (blockierende Arbeit verzögert alle Requests)",
+    buckets=EVENT_LOOP_LAG_BUCKETS,
+)
+
+
+async def run_event_loop_lag_monitor() -> None:
+    """
+    Misst im Hintergrund, wie stark sich ein periodischer Timer verspätet (``event_loop_lag_seconds``).
+    Das Intervall wird über ``EVENT_LOOP_LAG_INTERVAL_SECONDS`` gesteuert (Default: 0.25, ``0`` deaktiviert).
+    """
+    _interval = float(os.getenv("EVENT_LOOP_LAG_INTERVAL_SECONDS", 0.25))
+    if _interval <= 0:
+        return
+    while True:
+        _start = time.perf_counter()
+        await asyncio.sleep(_interval)
+        event_loop_lag.observe(max(time.perf_counter() - _start - _interval, 0.0))
+
+
+def _collect_process_metrics() -> List[_Metric]:
+    """Offene File-Deskriptoren und Sockets des Prozesses (nur unter Linux, sonst keine)."""
+    try:
+        _fds = os.listdir("/proc/self/fd")
+    except OSError:
+        return []
+    _sockets = 0
+    for _fd in _fds:
+        try:
+            _sockets += os.readlink(f"/proc/self/fd/{_fd}").startswith("socket:")
+        except OSError:
+            # the file descriptor was closed in the meantime (e.g. the one of listdir() itself)
+            continue
+    _open_fds = Gauge("process_open_fds", "Offene File-Deskriptoren")
+    _open_fds.inc(len(_fds))
+    _open_sockets = Gauge("process_open_sockets", "Offene Sockets (Clients, OpenAI-Verbindungen, Listener)")
+    _open_sockets.inc(_sockets)
+    return [_open_fds, _open_sockets]
+
+
+metrics_registry.register_collector(_collect_process_metrics)
+
+# tree level (main / sub / curriculum) of the LLM calls made in the current context, see llm_call_level()
+_llm_call_level: ContextVar[str] = ContextVar("llm_call_level", default=LEVEL_OTHER)
+
+
+@contextmanager
+def llm_call_level(level: str) -> Iterator[None]:
+    """
+    Ordnet alle OpenAI-Aufrufe innerhalb des Blocks (inkl. darin gestarteter Tasks) einer Ebene des Themenbaums zu
+    (Label ``level`` der LLM-Metriken).
+    """
+    _token = _llm_call_level.set(level)
+    try:
+        yield
+    finally:
+        _llm_call_level.reset(_token)
+
+
+def get_llm_call_level() -> str:
+    return _llm_call_level.get()
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI-Middleware, die Dauer und Anzahl laufender HTTP-Requests misst.
+
+    Die Dauer reicht bis zum letzten Stück des Bodys, umfasst bei Streaming-Antworten (NDJSON) also die ganze
+    Generierung. Als ``route`` wird das Pfad-Template (z.B. ``/topic-trees/{tree_id}``) verwendet, damit
+    IDs keine neuen Label-Werte erzeugen.
+    """
+
+    def __init__(self, app, excluded_paths: Tuple[str, ...] = ("/metrics",)):
+        self.app = app
+        self.excluded_paths = excluded_paths
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+        _start = time.perf_counter()
+        _status: Optional[int] = None
+        _method = scope["method"]
+
+        async def _send(message) -> None:
+            nonlocal _status
+            if message["type"] == "http.response.start":
+                _status = message["status"]
+            await send(message)
+
+        http_requests_in_progress.inc(method=_method)
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            http_requests_in_progress.dec(method=_method)
+            # the router stores the matched route in the (shared) scope
+            _route = getattr(scope.get("route"), "path", "<unmatched>")
+            http_request_duration.observe(
+                time.perf_counter() - _start, method=_method, route=_route, status=str(_status or 500)
+            )
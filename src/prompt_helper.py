@@ -0,0 +1,24 @@
+from typing import List
+
+from openai.types.chat import ChatCompletionMessageParam
+
+from src.prompts import BASE_INSTRUCTIONS, OUTPUT_FORMAT_INSTRUCTIONS
+
+# Statischer System-Prompt für alle Themen-Anfragen (Haupt-, Unter- und Lehrplanthemen).
+# Er enthält keine Platzhalter und ist damit über alle Anfragen hinweg byte-identisch:
+# OpenAI cached identische Prompt-Präfixe ab 1024 Tokens automatisch (geringere Kosten und Latenz).
+TOPIC_SYSTEM_PROMPT = f"{BASE_INSTRUCTIONS}\n{OUTPUT_FORMAT_INSTRUCTIONS}"
+
+
+def build_topic_messages(user_prompt: str) -> List[ChatCompletionMessageParam]:
+    """
+    Baut die Nachrichten einer Themen-Anfrage: Der statische System-Prompt steht (genau einmal) am Anfang,
+    der anfragespezifische Teil folgt als User-Nachricht.
+
+    :param user_prompt: formatiertes Prompt-Template (z.B. ``SUB_PROMPT_TEMPLATE.format(...)``)
+    :return: Nachrichten für ``complete_chat()``
+    """
+    return [
+        {"role": "system", "content": TOPIC_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt},
+    ]
@@ -2,170 +2,208 @@
 # 4) Konsolidierte Allgemeine Formatierungsregeln (Base Instructions)
 # ------------------------------------------------------------------------------
 
-BASE_INSTRUCTIONS = (
-"Du bist ein Experte für die Erstellung ansprechender Beschreibungstexte für Bildungsressourcen."
-"Antworte immer ausschließlich mit purem JSON (ohne Code-Fences, ohne Markdown)."
-"Falls keine sinnvolle Antwort möglich ist, gib ein leeres JSON-Objekt zurück."
-
-"FORMATIERUNGSREGELN:"
-
-"1) TITEL"
-"   - Langform, Substantive, keine Artikel, Adjektive klein"
-"   - „vs.“ für Gegenüberstellungen, „und“ für enge Paare (sparsam)"
-"   - Keine Sonderzeichen (& / –), Homonyme in (…) "
-"   - Anfangsbuchstabe groß"
-"   - Kurz und präzise, keine Wortkombinationen mit zu vielen Elementen"
-"   - Darf nicht exakt dem Fachnamen entsprechen oder diesen enthalten"
-"   - Muss eindeutig sein"
-
-"2) KURZTITEL"
-"   - Max. 20 Zeichen"
-"   - Nur Buchstaben, Ziffern, Leerzeichen"
-"   - Muss eindeutig sein"
-
-"3) BESCHREIBUNG"
-"   - Ansprechend, prägnant, verständlich; kurze Erklärungen komplexer Begriffe"
-"   - Aktive Formulierungen, kein Passivstil"
-"   - Konsistente Terminologie, keine Wiederholungen"
-"   - Zielgruppenorientiert formulieren"
-"   - Relevante Schlüsselbegriffe einbinden"
-"   - Kurze Sätze (max. 20 Wörter)"
-"   - Ausführlich und detailliert schreiben, maximale Wortanzahl nutzen"
-"   - Beispiele und konkrete Anwendungsmöglichkeiten nennen"
-"   - Keine URLs, Markennamen oder Füllwörter"
-"   - Keine Phrasen wie „Diese Sammlung…“ oder „Dieses Thema…“"
-
-"4) HIERARCHIE"
-"   - Keine Synonyme oder redundanten Begriffe"
-"   - Keine doppelten Titelwerte"
-
-"5) BILDUNGSSTUFE (Standard: „Schule“)"
-"   - Elementar: alltagsnah, konkret („Seife“)"
-"   - Schule: leicht verständlich, schulnah („Kunststoffe“)"
-"   - Beruf: anwendungsorientiert, berufsbezogen („Polymerverarbeitung“)"
-"   - Hochschule: wissenschaftlich, präzise („Polymerchemie“)"
-"   - Passe Titel und Beschreibung der Stufe automatisch an"
-
-"6) ANZAHL DER KATEGORIEN"
-"   - Vorgaben sind Höchstgrenzen, nur nutzen wenn thematisch gerechtfertigt"
-"   - Bevorzuge klare, trennscharfe Kategorien"
-"   - Wenige gute Kategorien sind besser als viele schwach differenzierte"
-
-"7) WORTANZAHL FÜR BESCHREIBUNGEN"
-"   - MAXIMAL {max_description_length} Wörter"
-"   - NUTZE DIE VOLLE WORTANZAHL (ohne sie zu überschreiten): Schreibe so ausführlich wie möglich bis zur maximalen Wortanzahl"
-"   - Texte aller Sammlungen sollen annähernd gleich lang sein"
-)
+BASE_INSTRUCTIONS = """Du bist ein Experte für die Erstellung ansprechender Beschreibungstexte für Bildungsressourcen.
+Antworte immer ausschließlich mit purem JSON (ohne Code-Fences, ohne Markdown).
+Falls keine sinnvolle Antwort möglich ist, gib ein leeres JSON-Objekt zurück.
+
+FORMATIERUNGSREGELN:
+
+1) TITEL
+   - Langform, Substantive, keine Artikel, Adjektive klein
+   - „vs.“ für Gegenüberstellungen, „und“ für enge Paare (sparsam)
+   - Keine Sonderzeichen (& / –), Homonyme in (…)
+   - Anfangsbuchstabe groß
+   - Kurz und präzise, keine Wortkombinationen mit zu vielen Elementen
+   - Darf nicht exakt dem Fachnamen entsprechen oder diesen enthalten
+   - Muss eindeutig sein
+
+2) KURZTITEL
+   - Max. 20 Zeichen
+   - Nur Buchstaben, Ziffern, Leerzeichen
+   - Muss eindeutig sein
+
+3) BESCHREIBUNG
+   - Ansprechend, prägnant, verständlich; kurze Erklärungen komplexer Begriffe
+   - Aktive Formulierungen, kein Passivstil
+   - Konsistente Terminologie, keine Wiederholungen
+   - Zielgruppenorientiert formulieren
+   - Relevante Schlüsselbegriffe einbinden
+   - Kurze Sätze (max. 20 Wörter)
+   - Ausführlich und detailliert schreiben, maximale Wortanzahl nutzen
+   - Beispiele und konkrete Anwendungsmöglichkeiten nennen
+   - Keine URLs, Markennamen oder Füllwörter
+   - Keine Phrasen wie „Diese Sammlung…“ oder „Dieses Thema…“
+
+4) HIERARCHIE
+   - Keine Synonyme oder redundanten Begriffe
+   - Keine doppelten Titelwerte
+
+5) BILDUNGSSTUFE (Standard: „Schule“)
+   - Elementar: alltagsnah, konkret („Seife“)
+   - Schule: leicht verständlich, schulnah („Kunststoffe“)
+   - Beruf: anwendungsorientiert, berufsbezogen („Polymerverarbeitung“)
+   - Hochschule: wissenschaftlich, präzise („Polymerchemie“)
+   - Passe Titel und Beschreibung der Stufe automatisch an
+
+6) ANZAHL DER KATEGORIEN
+   - Vorgaben sind Höchstgrenzen, nur nutzen wenn thematisch gerechtfertigt
+   - Bevorzuge klare, trennscharfe Kategorien
+   - Wenige gute Kategorien sind besser als viele schwach differenzierte
+
+7) WORTANZAHL FÜR BESCHREIBUNGEN
+   - MAXIMAL so viele Wörter, wie in der Anfrage unter WORTANZAHL angegeben
+   - NUTZE DIE VOLLE WORTANZAHL (ohne sie zu überschreiten): Schreibe so ausführlich wie möglich bis zur maximalen Wortanzahl
+   - Texte aller Sammlungen sollen annähernd gleich lang sein
+"""
 
 # ------------------------------------------------------------------------------
-# 5) Prompt-Templates (Mehrschritt-Generierung)
-#   -> Keine Erwähnung mehr von Fach/Bildungsstufe
+# 5) Ausgabeformat der Themen (für alle Ebenen gleich)
+#   -> BASE_INSTRUCTIONS und OUTPUT_FORMAT_INSTRUCTIONS bilden zusammen den statischen System-Prompt,
+#      siehe src/prompt_helper.py
 # ------------------------------------------------------------------------------
 
-MAIN_PROMPT_TEMPLATE = (
-    BASE_INSTRUCTIONS
-    + """
-
-Erstelle eine Liste von {num_main} Hauptthemen für das Thema "{themenbaumthema}".
-
-{special_instructions}
-
-{context_instructions}
-
-Erwarte ein JSON-Array dieser Form:
+OUTPUT_FORMAT_INSTRUCTIONS = """AUSGABEFORMAT:
+Antworte mit einem JSON-Array dieser Form:
 [
-  {{
-    "title": "Name des Hauptthemas",
-    "shorttitle": "Kurzer Titel", 
+  {
+    "title": "Name des Themas",
+    "shorttitle": "Kurzer Titel",
     "description": "Ansprechende Beschreibung in zwei Absätzen gemäß den obigen Regeln",
     "keywords": ["Schlagwort1", "Schlagwort2", "Schlagwort3"]
-  }}
+  }
 ]
 
 WICHTIG:
-- Befolge alle Formatierungsregeln aus den BASE_INSTRUCTIONS
+- Befolge alle obigen Formatierungsregeln
 - Die "keywords" Liste muss mindestens 3-5 relevante Schlagworte enthalten
 - Keine leeren Felder zurückgeben
 """
-)
-SUB_PROMPT_TEMPLATE = (
-    BASE_INSTRUCTIONS
-    + """
 
-Erstelle eine Liste von {num_sub} Unterthemen für das übergeordnete Hauptthema "{main_theme}" im Kontext "{themenbaumthema}".
+# ------------------------------------------------------------------------------
+# 6) Prompt-Templates (Mehrschritt-Generierung)
+#   -> Keine Erwähnung mehr von Fach/Bildungsstufe
+#   -> Die Formatierungsregeln stehen nur im System-Prompt.
+#      Der für alle Knoten eines Themenbaums gleiche Kontext steht am Anfang, die knotenspezifische Aufgabe am Ende,
+#      damit möglichst lange Präfixe vom Prompt-Caching des Anbieters profitieren.
+# ------------------------------------------------------------------------------
+
+MAIN_PROMPT_TEMPLATE = """Themenbaumthema: "{themenbaumthema}"
 
 {context_instructions}
 
-BESTEHENDE THEMENBAUM-STRUKTUR:
-Themenbaumthema (Ebene 1): {themenbaumthema}
-Hauptthema (Ebene 2): {main_theme}
+WORTANZAHL: Jede Beschreibung hat MAXIMAL {max_description_length} Wörter.
+
+{special_instructions}
+
+Erstelle eine Liste von {num_main} Hauptthemen für das Thema "{themenbaumthema}".
+"""
+SUB_PROMPT_TEMPLATE = """Themenbaumthema: "{themenbaumthema}"
+
+{context_instructions}
+
+WORTANZAHL: Jede Beschreibung hat MAXIMAL {max_description_length} Wörter.
 
 BEREITS BESTEHENDE HAUPTTHEMEN IM THEMENBAUM:
 {existing_main_topics}
 
-WICHTIG: Die Unterthemen sollen sich klar von aktuellen Hauptthema abgrenzen und keine Überschneidungen haben.
+BESTEHENDE THEMENBAUM-STRUKTUR:
+Themenbaumthema (Ebene 1): {themenbaumthema}
+Hauptthema (Ebene 2): {main_theme}
 
-Erwarte ein JSON-Array dieser Form:
-[
-  {{
-    "title": "Name des Unterthemas",
-    "shorttitle": "Kurzer Titel",
-    "description": "Ansprechende Beschreibung in zwei Absätzen gemäß den obigen Regeln",
-    "keywords": ["Schlagwort1", "Schlagwort2"]
-  }}
-]
+Erstelle eine Liste von {num_sub} Unterthemen für das übergeordnete Hauptthema "{main_theme}" im Kontext "{themenbaumthema}".
 
-WICHTIG:
-- Befolge alle Formatierungsregeln aus den BASE_INSTRUCTIONS
-- Die "keywords" Liste muss mindestens 3-5 relevante Schlagworte enthalten
+WICHTIG: Die Unterthemen sollen sich klar von aktuellen Hauptthema abgrenzen und keine Überschneidungen haben.
 """
-)
-LP_PROMPT_TEMPLATE = (
-    BASE_INSTRUCTIONS
-    + """
-
-Erstelle eine Liste von {num_lp} Lehrplanthemen für das übergeordnete Unterthema "{sub_theme}" im Kontext "{themenbaumthema}".
+LP_PROMPT_TEMPLATE = """Themenbaumthema: "{themenbaumthema}"
 
 {context_instructions}
 
+WORTANZAHL: Jede Beschreibung hat MAXIMAL {max_description_length} Wörter.
+
+BEREITS BESTEHENDE HAUPTTHEMEN:
+{existing_main_topics}
+
 BESTEHENDE THEMENBAUM-STRUKTUR:
 Themenbaumthema (Ebene 1): {themenbaumthema}
 Hauptthema (Ebene 2): {main_theme}
+
+BEREITS BESTEHENDE UNTERTHEMEN:
+{existing_subtopics}
+
 Unterthema (Ebene 3): {sub_theme}
 
+Erstelle eine Liste von {num_lp} Lehrplanthemen für das übergeordnete Unterthema "{sub_theme}" im Kontext "{themenbaumthema}".
+
+WICHTIG: Die Lehrplanthemen sollen spezifische, lehrbare Einheiten für das aktuelle Unterthema darstellen und sich klar von anderen Unterthemen abgrenzen.
+"""
+
+# ------------------------------------------------------------------------------
+# 7) Prompt-Templates für gebündelte Anfragen (Kindthemen mehrerer übergeordneter Themen in einer Anfrage)
+#   -> gleicher Präfix wie die Einzel-Templates, die Antwort ist ein JSON-Objekt mit den Nummern der Themen als Schlüssel
+#   -> {batch_output_format} wird mit BATCH_OUTPUT_FORMAT_INSTRUCTIONS (inkl. Ebene der übergeordneten Themen) befüllt
+# ------------------------------------------------------------------------------
+
+BATCH_OUTPUT_FORMAT_INSTRUCTIONS = """ABWEICHENDES AUSGABEFORMAT FÜR DIESE ANFRAGE:
+Antworte mit einem JSON-Objekt. Die Schlüssel sind die Nummern der {parent_level} (als String),
+die Werte sind JSON-Arrays im oben beschriebenen Format:
+{{
+  "1": [{{"title": "...", "shorttitle": "...", "description": "...", "keywords": ["..."]}}],
+  "2": [...]
+}}
+Jede Nummer muss genau einmal als Schlüssel vorkommen."""
+
+SUB_BATCH_PROMPT_TEMPLATE = """Themenbaumthema: "{themenbaumthema}"
+
+{context_instructions}
+
+WORTANZAHL: Jede Beschreibung hat MAXIMAL {max_description_length} Wörter.
+
+BEREITS BESTEHENDE HAUPTTHEMEN IM THEMENBAUM:
+{existing_main_topics}
+
+Erstelle jeweils eine Liste von {num_sub} Unterthemen für jedes der folgenden Hauptthemen im Kontext "{themenbaumthema}":
+{parent_topics}
+
+WICHTIG: Die Unterthemen sollen sich klar vom jeweiligen Hauptthema abgrenzen und keine Überschneidungen haben.
+
+{batch_output_format}
+"""
+LP_BATCH_PROMPT_TEMPLATE = """Themenbaumthema: "{themenbaumthema}"
+
+{context_instructions}
+
+WORTANZAHL: Jede Beschreibung hat MAXIMAL {max_description_length} Wörter.
+
 BEREITS BESTEHENDE HAUPTTHEMEN:
 {existing_main_topics}
 
+BESTEHENDE THEMENBAUM-STRUKTUR:
+Themenbaumthema (Ebene 1): {themenbaumthema}
+Hauptthema (Ebene 2): {main_theme}
+
 BEREITS BESTEHENDE UNTERTHEMEN:
 {existing_subtopics}
 
-WICHTIG: Die Lehrplanthemen sollen spezifische, lehrbare Einheiten für das aktuelle Unterthema darstellen und sich klar von anderen Unterthemen abgrenzen.
+Erstelle jeweils eine Liste von {num_lp} Lehrplanthemen für jedes der folgenden Unterthemen (Ebene 3) im Kontext "{themenbaumthema}":
+{parent_topics}
 
-Erwarte ein JSON-Array dieser Form:
-[
-  {{
-    "title": "Name des Lehrplanthemas",
-    "shorttitle": "Kurzer Titel",
-    "description": "Ansprechende Beschreibung in zwei Absätzen gemäß den obigen Regeln",
-    "keywords": ["Schlagwort1", "Schlagwort2"]
-  }}
-]
+WICHTIG: Die Lehrplanthemen sollen spezifische, lehrbare Einheiten für das jeweilige Unterthema darstellen und sich klar von anderen Unterthemen abgrenzen.
 
-WICHTIG:
-- Befolge alle Formatierungsregeln aus den BASE_INSTRUCTIONS
-- Die "keywords" Liste muss mindestens 3-5 relevante Schlagworte enthalten
+{batch_output_format}
 """
-)
-
-DESCRIPTION_PROMPT_TEMPLATE = """
-Du bist ein Experte für die Erstellung ansprechender Beschreibungstexte für Bildungsressourcen.
 
-Erstelle eine ansprechende Sammlungsbeschreibung basierend auf dem folgenden Text und Kontext:
+# ------------------------------------------------------------------------------
+# 8) Nachforderung fehlender Themen (z.B. nach einer abgeschnittenen Antwort)
+#   -> wird als weitere User-Nachricht an die ursprüngliche Anfrage und die bereits geretteten Themen angehängt,
+#      sodass nur die fehlenden Themen neu generiert werden
+# ------------------------------------------------------------------------------
 
-"{text_context}"
+MISSING_TOPICS_PROMPT_TEMPLATE = """Deine Antwort war unvollständig: Es fehlen noch {num_missing} Themen.
+Erstelle nur die {num_missing} fehlenden Themen im selben Format, ohne die bereits gelieferten Themen zu wiederholen.
+"""
 
-WORTANZAHL: Nutze genau die erlaubte Anzahl von {max_description_length} Wörtern.
-Schreibe ausführlich und detailliert, um die maximale Wortanzahl optimal zu nutzen.
+DESCRIPTION_PROMPT_TEMPLATE = """
+Erstelle eine ansprechende Sammlungsbeschreibung basierend auf dem unten angegebenen Text und Kontext.
 
 BESCHREIBUNGSREGELN:
 - Ansprechend, prägnant, verständlich; kurze Erklärungen komplexer Begriffe
@@ -189,4 +227,10 @@ OUTPUT-FORMAT:
 
 Beispiel für korrekten Output:
 Physik für die Sekundarstufe vermittelt grundlegende Konzepte der Mechanik, Optik und Elektrizitätslehre. Schüler entdecken physikalische Phänomene durch Experimente und praktische Anwendungen...
+
+WORTANZAHL: Nutze genau die erlaubte Anzahl von {max_description_length} Wörtern.
+Schreibe ausführlich und detailliert, um die maximale Wortanzahl optimal zu nutzen.
+
+TEXT UND KONTEXT:
+"{text_context}"
 """
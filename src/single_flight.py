@@ -0,0 +1,51 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, TypeVar
+
+from loguru import logger
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Fasst identische, gleichzeitig laufende Aufrufe zusammen ("single flight").
+
+    Der erste Aufrufer eines Schlüssels (Leader) startet die eigentliche Arbeit;
+    alle weiteren Aufrufer mit demselben Schlüssel (Follower) warten auf dessen Ergebnis, statt selbst loszulaufen.
+    Sobald die Arbeit abgeschlossen ist, wird der Schlüssel wieder freigegeben.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.leaders = 0
+        self.followers = 0
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Führt ``func`` aus - oder wartet auf den bereits laufenden Aufruf mit demselben Schlüssel.
+
+        Bricht ein einzelner Aufrufer ab (z.B. weil der HTTP-Client die Verbindung schließt),
+        läuft die gemeinsame Arbeit für die übrigen Aufrufer weiter.
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(func())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _task: self._release(key, _task))
+        else:
+            self.followers += 1
+            logger.debug(f"Single flight '{self.name}': joining in-flight call for key {key[:12]}...")
+        return await asyncio.shield(task)
+
+    def _release(self, key: str, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # retrieve the exception so that asyncio does not log it as "never retrieved" when every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
@@ -0,0 +1,82 @@
+import json
+from typing import Any
+
+# compact label index: concept URI -> {language: [prefLabel, altLabel, altLabel, ...]}
+SkosLabelIndex = dict[str, dict[str, list[str]]]
+
+
+def _as_label_map(value: Any) -> dict[str, list[str]]:
+    """
+    Normalisiert einen SKOS-Label-Wert (JSON-LD Language-Map) auf ``{Sprache: [Label, ...]}``.
+
+    Unterstützt werden ``{"de": "Physik"}``, ``{"de": ["Physik", ...]}``,
+    ``{"@value": "Physik", "@language": "de"}`` und einfache Strings (Sprache ``""``).
+    """
+    if value is None:
+        return {}
+    if isinstance(value, str):
+        return {"": [value]}
+    if isinstance(value, list):
+        _result: dict[str, list[str]] = {}
+        for _item in value:
+            for _lang, _labels in _as_label_map(_item).items():
+                _result.setdefault(_lang, []).extend(_labels)
+        return _result
+    if isinstance(value, dict):
+        if "@value" in value:
+            return {value.get("@language", ""): [str(value["@value"])]}
+        return {_lang: [_labels] if isinstance(_labels, str) else list(_labels) for _lang, _labels in value.items()}
+    return {}
+
+
+class _SkosIndexBuilder:
+    """
+    ``object_hook`` für ``json.loads``: Jedes SKOS-Konzept wird direkt beim Dekodieren in den Label-Index übernommen
+    und danach verworfen. Dadurch wird weder ein RDF-Graph noch der vollständige JSON-Baum im Speicher gehalten.
+    """
+
+    def __init__(self):
+        self.index: SkosLabelIndex = {}
+
+    def __call__(self, obj: dict) -> Any:
+        _uri = obj.get("id") or obj.get("@id")
+        if not isinstance(_uri, str) or _uri.startswith("@") or ("prefLabel" not in obj and "altLabel" not in obj):
+            # language maps, the JSON-LD @context (``"id": "@id"``), the concept scheme itself, etc.
+            return obj
+        _pref_labels = _as_label_map(obj.get("prefLabel"))
+        _alt_labels = _as_label_map(obj.get("altLabel"))
+        _entry = self.index.setdefault(_uri, {})
+        for _lang, _labels in _pref_labels.items():
+            if not _labels:
+                continue
+            _existing = _entry.get(_lang)
+            if _existing is None:
+                _entry[_lang] = [_labels[0]]
+            elif _labels[0] not in _existing:
+                # the same concept might appear twice (e.g. as top concept and as narrower concept)
+                _existing.append(_labels[0])
+        for _lang, _labels in _alt_labels.items():
+            # altLabels without a prefLabel in the same language are not useful as display labels
+            _existing = _entry.get(_lang)
+            if _existing is not None:
+                _existing.extend(_label for _label in _labels if _label not in _existing)
+        if not _entry:
+            del self.index[_uri]
+        # children were already indexed when their own objects were decoded: drop the concept
+        return None
+
+
+def load_skos_labels(data: str | bytes) -> SkosLabelIndex:
+    """
+    Baut aus einem SKOS-Vokabular im JSON-LD-Format (z.B. ``index.json`` von vocabs.openeduhub.de)
+    einen kompakten Label-Index ``{Konzept-URI: {Sprache: [prefLabel, altLabel, ...]}}``.
+
+    Der erste Eintrag jeder Sprache ist immer das prefLabel, danach folgen die altLabels.
+    Sprachen, für die ein Konzept nur altLabels hat, werden nicht übernommen.
+
+    :param data: Inhalt der ``index.json``
+    :return: Label-Index aller Konzepte (inkl. aller ``narrower``-Konzepte)
+    """
+    _builder = _SkosIndexBuilder()
+    json.loads(data, object_hook=_builder)
+    return _builder.index
@@ -1,87 +1,373 @@
 import json
-from typing import Optional, List
+import os
+from typing import Any, AsyncIterator, Dict, Optional, List
 
-import backoff
 from loguru import logger
-from openai import RateLimitError, APIError, AsyncOpenAI
-from pydantic import ValidationError
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletionMessageParam
 
-from src.DTOs.collection import Collection
-from src.DTOs.properties import Properties
-from src.prompts import BASE_INSTRUCTIONS
+from src.DTOs.parse_statistics import ParseStatistics
+from src.json_stream_parser import JsonArrayStreamParser, salvage_json_array
+from src.llm_client_helper import complete_chat, stream_chat
+from src.metrics import Counter, metrics_registry
+from src.prompt_helper import build_topic_messages
+from src.prompts import MISSING_TOPICS_PROMPT_TEMPLATE
+from src.topic_node import TopicNode
 
+# JSON-Schema eines Themas (Structured Outputs): im Strict-Modus müssen alle Felder "required" sein
+TOPIC_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "shorttitle": {"type": "string"},
+        "description": {"type": "string"},
+        "keywords": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["title", "shorttitle", "description", "keywords"],
+    "additionalProperties": False,
+}
 
-@backoff.on_exception(backoff.expo, (RateLimitError, APIError), max_tries=5, jitter=backoff.full_jitter)
-async def generate_structured_text(client: AsyncOpenAI, prompt: str, model: str) -> Optional[List[Collection]]:
+# counters since the start of the process, see get_parse_statistics()
+parse_statistics = ParseStatistics()
+
+
+def get_parse_statistics() -> ParseStatistics:
+    """Liefert die Zähler für das Parsen der LLM-Antworten (Parse-Fehler, gerettete und nachgeforderte Themen)."""
+    return parse_statistics.model_copy()
+
+
+def _collect_parse_metrics() -> List[Counter]:
+    """Liefert die Zähler aus ``parse_statistics`` für ``/metrics`` (ein Label-Wert je Zähler)."""
+    _counter = Counter(
+        "llm_parse_events_total",
+        "Parsen der LLM-Antworten mit Themen: Antworten, Parse-Fehler, gerettete und nachgeforderte Themen",
+        ("event",),
+    )
+    for _event, _value in parse_statistics:
+        _counter.inc(_value, event=_event)
+    return [_counter]
+
+
+metrics_registry.register_collector(_collect_parse_metrics)
+
+
+def _structured_outputs_enabled() -> bool:
+    return os.getenv("LLM_STRUCTURED_OUTPUTS", "true").strip().lower() not in ("false", "0", "no")
+
+
+def topics_response_format_kwargs() -> Dict[str, Any]:
+    """
+    Parameter für ``complete_chat()``, die eine Liste von Themen per JSON-Schema erzwingen (Structured Outputs).
+    Das Schema verlangt ein Objekt als Wurzel, die Antwort hat deshalb die Form ``{"topics": [Thema, ...]}``.
+    Über ``LLM_STRUCTURED_OUTPUTS=false`` abschaltbar (z.B. für Modelle ohne Structured Outputs).
+    """
+    if not _structured_outputs_enabled():
+        return {}
+    _schema = {
+        "type": "object",
+        "properties": {"topics": {"type": "array", "items": TOPIC_JSON_SCHEMA}},
+        "required": ["topics"],
+        "additionalProperties": False,
+    }
+    return {
+        "response_format": {"type": "json_schema", "json_schema": {"name": "topics", "strict": True, "schema": _schema}}
+    }
+
+
+def _batch_response_format_kwargs(keys: List[str]) -> Dict[str, Any]:
+    """Wie ``topics_response_format_kwargs()``, aber für gebündelte Anfragen: ``{Schlüssel: [Thema, ...]}``."""
+    if not _structured_outputs_enabled():
+        return {}
+    _schema = {
+        "type": "object",
+        "properties": {_key: {"type": "array", "items": TOPIC_JSON_SCHEMA} for _key in keys},
+        "required": keys,
+        "additionalProperties": False,
+    }
+    return {
+        "response_format": {
+            "type": "json_schema",
+            "json_schema": {"name": "topics_by_parent", "strict": True, "schema": _schema},
+        }
+    }
+
+
+def _parse_json_content(content: str) -> Any:
+    """Parst die (reine) JSON-Antwort des Modells."""
+    if not content.strip():
+        raise Exception("The AI model returned an empty response.")
+
+    raw = content.strip()
+    # Entfernt einen Markdown-Code-Fence um das JSON (```json ... ``` bzw. ``` ... ```);
+    # Text vor bzw. nach dem JSON führt zu einem JSONDecodeError und wird beim Retten ignoriert
+    if raw.startswith("```"):
+        raw = raw.removeprefix("```json").removeprefix("```").removesuffix("```").strip()
+    return json.loads(raw)
+
+
+def _build_topic(item: Any) -> TopicNode:
     """
-    Schickt die Prompt-Anfrage an das angegebene OpenAI-Modell
-    und parst das zurückgegebene reine JSON-Array in eine Liste von Collection-Objekten.
+    Baut aus einem (geparsten) Thema der Modell-Antwort ein ``TopicNode``-Objekt.
+
+    :raises ValueError: Falls das Thema kein Objekt ist oder Felder mit ungültigen Typen enthält
+    """
+    if not isinstance(item, dict):
+        raise ValueError(f"topic has to be an object, not {type(item).__name__}")
+    title = item.get("title", "")
+    shorttitle = item.get("shorttitle", "")
+    desc = item.get("description", "")
+    keywords = item.get("keywords", [])
+
+    # the nodes are only converted to Collection / Properties when the response is built (see finalize_topic_tree())
+    if not all(isinstance(_value, str) for _value in (title, shorttitle, desc)):
+        raise ValueError(f"title, shorttitle and description of topic {title!r} have to be strings")
+    if not isinstance(keywords, list) or not all(isinstance(_keyword, str) for _keyword in keywords):
+        raise ValueError(f"keywords of topic {title!r} have to be a list of strings")
+
+    if desc:
+        # check the length of the description w.r.t. the word-limit (which is defined in prompts.py)
+        logger.opt(lazy=True).debug(
+            'Description length for "{}": {} words ({} chars)',
+            lambda: title,
+            lambda: len(desc.split()),
+            lambda: len(desc),
+        )
+    # Falls das Modell aus irgendeinem Grund leere Werte geliefert hat
+    if not desc:
+        desc = f"Beschreibung für {title}"
+    if not keywords:
+        keywords = [title.lower()]
+    return TopicNode(title=title, shorttitle=shorttitle, description=desc, keywords=keywords)
+
+
+def _build_topics(data: Any) -> List[TopicNode]:
     """
+    Baut aus den (geparsten) Themen der Modell-Antwort eine Liste von ``TopicNode``-Objekten.
+
+    Ungültige Themen werden übersprungen (und in ``parse_statistics.skipped_topics`` gezählt),
+    die gültigen Themen der Antwort bleiben erhalten.
+    """
+    # Structured Outputs liefern die Themen in einem Objekt {"topics": [...]}
+    if isinstance(data, dict) and isinstance(data.get("topics"), list):
+        data = data["topics"]
+    # Falls nur ein Dict zurückkam, in eine Liste packen
+    if not isinstance(data, list):
+        data = [data]
+
+    results = []
+    for item in data:
+        try:
+            results.append(_build_topic(item))
+        except ValueError as e:
+            parse_statistics.skipped_topics += 1
+            logger.error(f"Skipping invalid topic: {e}")
+    return results
+
+
+def _topic_as_dict(topic: TopicNode) -> Dict[str, Any]:
+    """Gegenstück zu ``_build_topics()``: das Thema im Antwortformat des Modells."""
+    return {
+        "title": topic.title,
+        "shorttitle": topic.shorttitle,
+        "description": topic.description,
+        "keywords": topic.keywords,
+    }
+
+
+def parse_structured_text(content: str) -> List[TopicNode]:
+    """
+    Parst die Antwort des Modells (JSON-Array bzw. ``{"topics": [...]}``) in eine Liste von ``TopicNode``-Objekten.
+
+    Ist die Antwort kein gültiges JSON (z.B. abgeschnitten oder mit Text um das JSON herum),
+    werden die vollständigen Themen daraus gerettet (siehe ``salvage_json_array()``).
+    Ungültige Themen werden einzeln übersprungen, sodass die übrigen Themen der Antwort erhalten bleiben.
+    Lässt sich nichts retten, wird eine leere Liste zurückgegeben.
+    """
+    parse_statistics.responses += 1
+    if not content.strip():
+        logger.error("The AI model returned an empty response.")
+        return []
     try:
-        resp = await client.chat.completions.create(
+        data = _parse_json_content(content)
+    except json.JSONDecodeError as jde:
+        parse_statistics.parse_failures += 1
+        logger.warning(f"JSON Decode Error: {jde}. Salvaging the complete topics from the response.")
+        return _salvage_topics(content)
+    return _build_topics(data)
+
+
+def _salvage_topics(content: str) -> List[TopicNode]:
+    topics = _build_topics(salvage_json_array(content))
+    if topics:
+        parse_statistics.salvaged_responses += 1
+        parse_statistics.salvaged_topics += len(topics)
+        logger.info(f"Salvaged {len(topics)} complete topics from the malformed response")
+    return topics
+
+
+async def _complete_missing_topics(
+    client: AsyncOpenAI,
+    prompt: str,
+    model: str,
+    topics: List[TopicNode],
+    expected_count: Optional[int],
+    bypass_cache: bool,
+) -> List[TopicNode]:
+    """
+    Fordert die Themen nach, die in der Antwort fehlen (``expected_count`` minus gelieferte Themen).
+
+    Die Nachforderung setzt die ursprüngliche Anfrage als Dialog fort (die gelieferten Themen als Antwort des Modells),
+    sodass nur die fehlenden Themen neu generiert werden. Es wird höchstens einmal nachgefordert.
+
+    :return: nur die neu generierten Themen
+    """
+    if not expected_count or len(topics) >= expected_count:
+        return []
+    _num_missing = expected_count - len(topics)
+    parse_statistics.follow_up_requests += 1
+    logger.warning(
+        f"Response contains {len(topics)} of {expected_count} topics: requesting the {_num_missing} missing ones"
+    )
+    messages: List[ChatCompletionMessageParam] = [
+        *build_topic_messages(prompt),
+        {
+            "role": "assistant",
+            "content": json.dumps({"topics": [_topic_as_dict(_topic) for _topic in topics]}, ensure_ascii=False),
+        },
+        {"role": "user", "content": MISSING_TOPICS_PROMPT_TEMPLATE.format(num_missing=_num_missing)},
+    ]
+    try:
+        content = await complete_chat(
+            client=client, model=model, messages=messages, bypass_cache=bypass_cache, **topics_response_format_kwargs()
+        )
+    except Exception as e:
+        logger.error(f"General Error while requesting the missing topics: {e}")
+        return []
+    _existing_titles = {_topic.title for _topic in topics}
+    missing_topics = [_topic for _topic in parse_structured_text(content) if _topic.title not in _existing_titles]
+    missing_topics = missing_topics[:_num_missing]
+    parse_statistics.recovered_topics += len(missing_topics)
+    return missing_topics
+
+
+async def generate_structured_text(
+    client: AsyncOpenAI, prompt: str, model: str, bypass_cache: bool = False, expected_count: Optional[int] = None
+) -> Optional[List[TopicNode]]:
+    """
+    Schickt die Prompt-Anfrage (mit dem statischen System-Prompt, siehe ``build_topic_messages()``)
+    an das angegebene OpenAI-Modell
+    und parst das zurückgegebene JSON (per Structured Outputs erzwungen) in eine Liste von ``TopicNode``-Objekten.
+    Die Anfrage läuft (inkl. Retries) über den prozessweiten LLM-Scheduler, siehe ``create_chat_completion()``,
+    und wird aus dem LLM-Cache beantwortet, sofern ``bypass_cache`` nicht gesetzt ist.
+
+    :param expected_count: angefragte Anzahl an Themen; fehlen Themen (z.B. in einer abgeschnittenen Antwort),
+        werden nur die fehlenden nachgefordert
+    """
+    try:
+        content = await complete_chat(
+            client=client,
             model=model,
-            messages=[{"role": "system", "content": BASE_INSTRUCTIONS}, {"role": "user", "content": prompt}],
+            messages=build_topic_messages(prompt),
+            bypass_cache=bypass_cache,
+            **topics_response_format_kwargs(),
             # max_tokens=2000,
             # temperature=0.7,
         )
-        content = resp.choices[0].message.content
-        if not content.strip():
-            raise Exception("The AI model returned an empty response.")
-
-        # Entfernt mögliche Triple-Backticks oder JSON-Syntax, die stören könnten
-        raw = content.strip().strip("```").strip("```json").strip()
-        # Debug-Ausgabe
-        # print(f"Raw response: {raw}")
-        data = json.loads(raw)
-
-        # Falls nur ein Dict zurückkam, in eine Liste packen
-        if not isinstance(data, list):
-            data = [data]
-
-        results = []
-        for item in data:
-            title = item.get("title", "")
-            shorttitle = item.get("shorttitle", "")
-            desc = item.get("description", "")
-            keywords = item.get("keywords", [])
-
-            if desc:
-                # check the length of the description w.r.t. the word-limit (which is defined in prompts.py)
-                logger.debug(f"Description length for \"{title}\": {len(desc.split())} words ({len(desc)} chars)")
-                pass
-            # Falls das Modell aus irgendeinem Grund leere Werte geliefert hat
-            if not desc:
-                desc = f"Beschreibung für {title}"
-            if not keywords:
-                keywords = [title.lower()]
-            # Baue ein Properties-Objekt mit noch leeren URIs
-            prop = Properties(
-                cclom_general_keyword=keywords,
-                ccm_collectionshorttitle=[shorttitle],
-                ccm_educationalcontext=[],
-                ccm_educationalintendedenduserrole=["http://w3id.org/openeduhub/vocabs/intendedEndUserRole/teacher"],
-                ccm_taxonid=[],
-                cm_description=[desc],
-                cm_title=[title],
-            )
-
-            # Erstelle das Collection-Objekt
-            c = Collection(title=title, shorttitle=shorttitle, properties=prop, subcollections=[])
-            results.append(c)
-
-        return results
-    except json.JSONDecodeError as jde:
-        logger.error(f"JSON Decode Error: {jde}")
-        return []  # ToDo: replace this dirty workaround with proper exception handling
-        # raise Exception(f"JSON Decode Error: {jde}")
-        # ToDo: there was not enough time for proper exception handling:
-        #  raising Exceptions here causes Internal Server Errors
-        #  when trying to collect the awaited task results with asyncio.gather() in main.py
-    except ValidationError as ve:
-        logger.error(f"Validation Error: {ve}")
-        return []  # ToDo: replace this dirty workaround with proper exception handling
-        # raise Exception(f"Validation Error: {ve}")
+        topics = parse_structured_text(content)
     except Exception as e:
         logger.error(f"General Error: {e}")
-        return []  # ToDo: replace this dirty workaround with proper exception handling
-        # raise Exception(f"Fehler bei der Anfrage: {e}")
+        topics = []
+    topics += await _complete_missing_topics(client, prompt, model, topics, expected_count, bypass_cache)
+    if not topics:
+        parse_statistics.lost_requests += 1
+    return topics
+
+
+async def stream_structured_text(
+    client: AsyncOpenAI, prompt: str, model: str, bypass_cache: bool = False, expected_count: Optional[int] = None
+) -> AsyncIterator[TopicNode]:
+    """
+    Wie ``generate_structured_text()``, aber mit gestreamter Antwort: Jedes Thema wird geliefert,
+    sobald sein JSON-Objekt vollständig angekommen ist - noch während das Modell die folgenden Themen schreibt.
+
+    Kann die Antwort nicht inkrementell geparst werden, wird sie nach dem Ende des Streams vollständig geparst
+    und es werden die noch nicht gelieferten Themen nachgereicht. Fehlende Themen werden wie bei
+    ``generate_structured_text()`` nachgefordert.
+    """
+    parser: Optional[JsonArrayStreamParser] = JsonArrayStreamParser()
+    _parts = []
+    topics: List[TopicNode] = []
+    try:
+        async for _chunk in stream_chat(
+            client=client,
+            model=model,
+            messages=build_topic_messages(prompt),
+            bypass_cache=bypass_cache,
+            **topics_response_format_kwargs(),
+        ):
+            _parts.append(_chunk)
+            if parser is None:
+                continue
+            try:
+                _items = parser.feed(_chunk)
+            except json.JSONDecodeError as jde:
+                logger.warning(f"Streamed response could not be parsed incrementally, parsing it at the end: {jde}")
+                parser = None
+                continue
+            for topic in _build_topics(_items):
+                topics.append(topic)
+                yield topic
+    except Exception as e:
+        logger.error(f"General Error: {e}")
+    if parser is None or not topics:
+        for topic in parse_structured_text("".join(_parts))[len(topics) :]:
+            topics.append(topic)
+            yield topic
+    for topic in await _complete_missing_topics(client, prompt, model, topics, expected_count, bypass_cache):
+        topics.append(topic)
+        yield topic
+    if not topics:
+        parse_statistics.lost_requests += 1
+
+
+async def generate_structured_text_batch(
+    client: AsyncOpenAI, prompt: str, model: str, keys: List[str], bypass_cache: bool = False
+) -> Dict[str, List[TopicNode]]:
+    """
+    Wie ``generate_structured_text()``, aber für die Kindthemen mehrerer übergeordneter Themen in einer Anfrage:
+    Das Modell antwortet mit einem JSON-Objekt ``{Schlüssel: [Thema, ...]}`` (per Structured Outputs erzwungen).
+
+    :param keys: Schlüssel der übergeordneten Themen, die im Prompt verwendet werden
+    :return: die Kindthemen pro Schlüssel. Schlüssel, für die keine (gültigen) Themen geliefert wurden, fehlen.
+    """
+    try:
+        content = await complete_chat(
+            client=client,
+            model=model,
+            messages=build_topic_messages(prompt),
+            bypass_cache=bypass_cache,
+            **_batch_response_format_kwargs(keys),
+        )
+        parse_statistics.responses += 1
+        data = _parse_json_content(content)
+    except json.JSONDecodeError as jde:
+        # the missing keys are requested one by one by the caller (see generate_child_topics())
+        parse_statistics.parse_failures += 1
+        logger.error(f"JSON Decode Error in batched response: {jde}")
+        return {}
+    except Exception as e:
+        logger.error(f"General Error in batched request: {e}")
+        return {}
+    if not isinstance(data, dict):
+        logger.error(f"Batched response is not a JSON object but {type(data).__name__}")
+        return {}
+
+    results = {}
+    for key in keys:
+        items = data.get(key)
+        if not items:
+            continue
+        _topics = _build_topics(items)
+        if _topics:
+            results[key] = _topics
+    return results
@@ -1,4 +1,6 @@
-from typing import List, Dict, Any
+import math
+from collections import Counter
+from typing import List, Dict, Optional, Sequence
 from src.DTOs.collection import Collection
 from src.DTOs.enhanced_response import TextStatistics
 
@@ -6,129 +8,169 @@ from src.DTOs.enhanced_response import TextStatistics
 def calculate_text_statistics_for_description(description: str) -> Dict[str, int]:
     """
     Berechnet Textstatistiken für eine einzelne Beschreibung
-    
+
     Args:
         description: Der Beschreibungstext
-        
+
     Returns:
         Dictionary mit Zeichenanzahl, Wortanzahl und Zeichenanzahl mit Leerzeichen
     """
     if not description:
-        return {
-            "character_count": 0,
-            "word_count": 0,
-            "character_count_with_spaces": 0
-        }
-    
-    # Zeichenanzahl ohne Leerzeichen
-    character_count = len(description.replace(" ", "").replace("\n", "").replace("\t", ""))
-    
+        return {"character_count": 0, "word_count": 0, "character_count_with_spaces": 0}
+
+    # Zeichenanzahl ohne Leerzeichen (count() statt replace(): keine Zwischen-Strings)
+    character_count = len(description) - description.count(" ") - description.count("\n") - description.count("\t")
+
     # Wortanzahl
     word_count = len(description.split())
-    
+
     # Zeichenanzahl mit Leerzeichen
     character_count_with_spaces = len(description)
-    
+
     return {
         "character_count": character_count,
         "word_count": word_count,
-        "character_count_with_spaces": character_count_with_spaces
+        "character_count_with_spaces": character_count_with_spaces,
     }
 
 
-def collect_all_descriptions_from_tree(collections: List[Collection]) -> List[str]:
+# Perzentile, die in den Gesamtstatistiken ausgewiesen werden
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentiles_from_histogram(histogram: Dict[int, int], percentiles: Sequence[int] = PERCENTILES) -> Dict[str, int]:
     """
-    Sammelt alle Beschreibungen aus dem gesamten Themenbaum (rekursiv)
-    
+    Berechnet Perzentile (Nearest-Rank-Methode, also exakte Werte) aus einem Histogramm
+
     Args:
-        collections: Liste der Collection-Objekte
-        
+        histogram: Wert -> Häufigkeit
+        percentiles: die zu berechnenden Perzentile (0-100)
+
     Returns:
-        Liste aller Beschreibungstexte im Baum
+        Dictionary mit z.B. {"p50": ..., "p90": ...}; alle Werte 0, falls das Histogramm leer ist
     """
-    descriptions = []
-    
-    for collection in collections:
-        # Beschreibung der aktuellen Collection hinzufügen
-        if collection.properties.cm_description:
-            descriptions.extend(collection.properties.cm_description)
-        
-        # Rekursiv durch Subcollections gehen
-        if collection.subcollections:
-            descriptions.extend(collect_all_descriptions_from_tree(collection.subcollections))
-    
-    return descriptions
+    total = sum(histogram.values())
+    result = dict.fromkeys((f"p{percentile}" for percentile in percentiles), 0)
+    if not total:
+        return result
+    values = sorted(histogram.items())
+    for percentile in percentiles:
+        rank = max(math.ceil(percentile / 100 * total), 1)
+        cumulative = 0
+        for value, count in values:
+            cumulative += count
+            if cumulative >= rank:
+                result[f"p{percentile}"] = value
+                break
+    return result
 
 
-def calculate_overall_statistics(collections: List[Collection]) -> TextStatistics:
+class TextStatisticsAggregator:
     """
-    Berechnet Gesamtstatistiken für alle Beschreibungen im Themenbaum
-    
-    Args:
-        collections: Liste der Collection-Objekte (Hauptthemen)
-        
-    Returns:
-        TextStatistics-Objekt mit allen berechneten Statistiken
+    Fasst die Textstatistiken einzelner Beschreibungen laufend zu Gesamtstatistiken zusammen, ohne die
+    Beschreibungen oder Einzelwerte zu speichern: Anzahl, Minimum, Maximum und Summe je Kennzahl sowie
+    Histogramme (Wert -> Häufigkeit) für die Perzentile und die Wortanzahl je Ebene.
+
+    Der Speicherbedarf hängt nur von der Anzahl verschiedener Werte ab (begrenzt durch die Länge der
+    Beschreibungen), nicht von der Anzahl der Knoten. Die Statistiken können jederzeit abgefragt werden,
+    z.B. von einem Streaming-Endpunkt, während der Themenbaum noch generiert wird.
     """
-    # Alle Beschreibungen sammeln
-    all_descriptions = collect_all_descriptions_from_tree(collections)
-    
-    if not all_descriptions:
+
+    _KEYS = ("character_count", "word_count", "character_count_with_spaces")
+
+    def __init__(self):
+        self.count = 0
+        self._min = dict.fromkeys(self._KEYS, 0)
+        self._max = dict.fromkeys(self._KEYS, 0)
+        self._sum = dict.fromkeys(self._KEYS, 0)
+        self._character_counts: Counter = Counter()
+        self._word_counts: Counter = Counter()
+        self._word_counts_by_level: Dict[str, Counter] = {}
+
+    def add(self, stats: Dict[str, int], level: Optional[str] = None) -> None:
+        """
+        Nimmt die Statistiken einer Beschreibung auf
+
+        Args:
+            stats: Ergebnis von calculate_text_statistics_for_description()
+            level: Ebene des Knotens im Themenbaum (für das Wortanzahl-Histogramm je Ebene)
+        """
+        self.count += 1
+        for key in self._KEYS:
+            value = stats[key]
+            if self.count == 1 or value < self._min[key]:
+                self._min[key] = value
+            if self.count == 1 or value > self._max[key]:
+                self._max[key] = value
+            self._sum[key] += value
+        self._character_counts[stats["character_count"]] += 1
+        self._word_counts[stats["word_count"]] += 1
+        if level is not None:
+            self._word_counts_by_level.setdefault(level, Counter())[stats["word_count"]] += 1
+
+    def add_description(self, description: str, level: Optional[str] = None) -> Dict[str, int]:
+        """
+        Berechnet die Statistiken einer Beschreibung, nimmt sie auf und gibt sie zurück
+
+        Args:
+            description: Der Beschreibungstext
+            level: Ebene des Knotens im Themenbaum
+
+        Returns:
+            Dictionary mit Zeichenanzahl, Wortanzahl und Zeichenanzahl mit Leerzeichen
+        """
+        stats = calculate_text_statistics_for_description(description)
+        self.add(stats, level)
+        return stats
+
+    def _average(self, key: str) -> float:
+        return round(self._sum[key] / self.count, 2) if self.count else 0.0
+
+    def to_text_statistics(self) -> TextStatistics:
+        """
+        Returns:
+            TextStatistics-Objekt mit den Gesamtstatistiken aller bisher aufgenommenen Beschreibungen
+        """
         return TextStatistics(
-            total_descriptions=0,
-            character_count_range={"min": 0, "max": 0},
-            word_count_range={"min": 0, "max": 0},
-            character_count_average=0.0,
-            word_count_average=0.0,
-            character_count_with_spaces_range={"min": 0, "max": 0},
-            character_count_with_spaces_average=0.0
+            total_descriptions=self.count,
+            character_count_range={"min": self._min["character_count"], "max": self._max["character_count"]},
+            word_count_range={"min": self._min["word_count"], "max": self._max["word_count"]},
+            character_count_average=self._average("character_count"),
+            word_count_average=self._average("word_count"),
+            character_count_with_spaces_range={
+                "min": self._min["character_count_with_spaces"],
+                "max": self._max["character_count_with_spaces"],
+            },
+            character_count_with_spaces_average=self._average("character_count_with_spaces"),
+            character_count_percentiles=percentiles_from_histogram(self._character_counts),
+            word_count_percentiles=percentiles_from_histogram(self._word_counts),
+            word_count_histogram_by_level={
+                level: {str(word_count): count for word_count, count in sorted(histogram.items())}
+                for level, histogram in self._word_counts_by_level.items()
+            },
         )
-    
-    # Statistiken für jede Beschreibung berechnen
-    stats_list = [calculate_text_statistics_for_description(desc) for desc in all_descriptions]
-    
-    # Werte extrahieren
-    character_counts = [stats["character_count"] for stats in stats_list]
-    word_counts = [stats["word_count"] for stats in stats_list]
-    character_counts_with_spaces = [stats["character_count_with_spaces"] for stats in stats_list]
-    
-    # Gesamtstatistiken berechnen
-    return TextStatistics(
-        total_descriptions=len(all_descriptions),
-        character_count_range={
-            "min": min(character_counts),
-            "max": max(character_counts)
-        },
-        word_count_range={
-            "min": min(word_counts),
-            "max": max(word_counts)
-        },
-        character_count_average=round(sum(character_counts) / len(character_counts), 2),
-        word_count_average=round(sum(word_counts) / len(word_counts), 2),
-        character_count_with_spaces_range={
-            "min": min(character_counts_with_spaces),
-            "max": max(character_counts_with_spaces)
-        },
-        character_count_with_spaces_average=round(sum(character_counts_with_spaces) / len(character_counts_with_spaces), 2)
-    )
-
-
-def add_text_statistics_to_collections(collections: List[Collection]) -> None:
+
+
+def calculate_overall_statistics(collections: List[Collection], levels: Sequence[str] = ()) -> TextStatistics:
     """
-    Fügt Textstatistiken zu allen Collections im Baum hinzu (rekursiv, in-place)
-    
+    Berechnet Gesamtstatistiken für alle Beschreibungen im Themenbaum
+
+    Der Themenbaum wird iterativ (ohne Rekursion und ohne Zwischenlisten) durchlaufen.
+
     Args:
-        collections: Liste der Collection-Objekte
+        collections: Liste der Collection-Objekte (Hauptthemen)
+        levels: Namen der Ebenen nach Tiefe (z.B. TREE_LEVELS) für das Wortanzahl-Histogramm je Ebene
+
+    Returns:
+        TextStatistics-Objekt mit allen berechneten Statistiken
     """
-    for collection in collections:
-        # Statistiken für die aktuelle Collection berechnen
-        if collection.properties.cm_description:
-            # Nehme die erste (und normalerweise einzige) Beschreibung
-            description = collection.properties.cm_description[0] if collection.properties.cm_description else ""
-            collection.properties.text_statistics = calculate_text_statistics_for_description(description)
-        else:
-            collection.properties.text_statistics = calculate_text_statistics_for_description("")
-        
-        # Rekursiv durch Subcollections gehen
+    aggregator = TextStatisticsAggregator()
+    stack = [(collection, 0) for collection in collections]
+    while stack:
+        collection, depth = stack.pop()
+        level = levels[depth] if depth < len(levels) else None
+        for description in collection.properties.cm_description or []:
+            aggregator.add_description(description, level)
         if collection.subcollections:
-            add_text_statistics_to_collections(collection.subcollections)
+            stack.extend((subcollection, depth + 1) for subcollection in collection.subcollections)
+    return aggregator.to_text_statistics()
@@ -0,0 +1,109 @@
+from typing import Dict, List, Optional, Tuple
+
+from src.DTOs.collection import Collection
+from src.DTOs.enhanced_response import TextStatistics
+from src.DTOs.properties import Properties
+from src.text_statistics_helper import TextStatisticsAggregator, calculate_text_statistics_for_description
+
+# Ebenen des Themenbaums
+LEVEL_MAIN = "main"
+LEVEL_SUB = "sub"
+LEVEL_CURRICULUM = "curriculum"
+# Ebenen nach Tiefe im Themenbaum
+TREE_LEVELS = (LEVEL_MAIN, LEVEL_SUB, LEVEL_CURRICULUM)
+
+# default target group of all generated collections (shared by all nodes, see TopicNode.to_collection())
+TEACHER_END_USER_ROLES = ["http://w3id.org/openeduhub/vocabs/intendedEndUserRole/teacher"]
+
+
+class TopicNode:
+    """
+    Schlanke interne Darstellung eines Knotens während der Generierung.
+
+    Enthält nur die Felder, die das Modell liefert, und die Kindknoten. Erst beim Erstellen der Antwort wird der
+    Themenbaum einmal in ``Collection``- und ``Properties``-Objekte umgewandelt (siehe ``finalize_topic_tree()``).
+    """
+
+    __slots__ = ("title", "shorttitle", "description", "keywords", "subcollections")
+
+    def __init__(
+        self,
+        title: str,
+        shorttitle: str,
+        description: str,
+        keywords: List[str],
+        subcollections: Optional[List["TopicNode"]] = None,
+    ):
+        self.title = title
+        self.shorttitle = shorttitle
+        self.description = description
+        self.keywords = keywords
+        self.subcollections: List[TopicNode] = subcollections if subcollections is not None else []
+
+    def __repr__(self) -> str:
+        return f"TopicNode(title={self.title!r}, subcollections={len(self.subcollections)})"
+
+    @classmethod
+    def from_collection(cls, collection: Collection) -> "TopicNode":
+        """Wandelt eine (z.B. per Request übergebene) ``Collection`` inkl. Subcollections in einen ``TopicNode`` um."""
+        _properties = collection.properties
+        return cls(
+            title=collection.title,
+            shorttitle=collection.shorttitle,
+            description=_properties.cm_description[0] if _properties.cm_description else "",
+            keywords=_properties.cclom_general_keyword,
+            subcollections=[cls.from_collection(_sub) for _sub in collection.subcollections or []],
+        )
+
+    def to_collection(
+        self,
+        discipline_uris: List[str],
+        educational_context_uris: List[str],
+        text_statistics: Optional[Dict[str, int]] = None,
+    ) -> Collection:
+        """
+        Wandelt nur diesen Knoten (ohne Kindknoten) in eine ``Collection`` mit vollständigen ``Properties``
+        (URIs des Requests und Textstatistiken der Beschreibung) um. Ganze Themenbäume wandelt
+        ``finalize_topic_tree()`` um.
+        """
+        # the regular constructors are used on purpose: pydantic-core validates in Rust, which is faster than the
+        # pure-Python model_construct() for these models
+        _properties = Properties(
+            cclom_general_keyword=self.keywords,
+            ccm_collectionshorttitle=[self.shorttitle],
+            ccm_educationalcontext=educational_context_uris,
+            ccm_educationalintendedenduserrole=TEACHER_END_USER_ROLES,
+            ccm_taxonid=discipline_uris,
+            cm_description=[self.description],
+            cm_title=[self.title],
+            text_statistics=text_statistics or calculate_text_statistics_for_description(self.description),
+        )
+        return Collection(title=self.title, shorttitle=self.shorttitle, properties=_properties, subcollections=[])
+
+
+def finalize_topic_tree(
+    main_topics: List[TopicNode], discipline_uris: List[str], educational_context_uris: List[str]
+) -> Tuple[List[Collection], TextStatistics]:
+    """
+    Wandelt die generierten Knoten in einem einzigen Durchlauf in ``Collection``-Objekte um.
+
+    Jeder Knoten wird genau einmal besucht: Properties mit den URIs des Requests, Textstatistiken der Beschreibung
+    und deren Beitrag zu den Gesamtstatistiken (inkl. Wortanzahl-Histogramm je Ebene) entstehen im selben Schritt.
+    Der Themenbaum wird iterativ durchlaufen, tiefe oder breite Themenbäume vergrößern also nicht den Call-Stack.
+
+    :return: die Hauptthemen als ``Collection``-Objekte (inkl. Subcollections) und die Gesamtstatistiken
+    """
+    _aggregator = TextStatisticsAggregator()
+    _collections: List[Collection] = []
+    # each entry is a node, its depth and the list its collection is appended to (the subcollections of its parent)
+    _stack = [(_topic, 0, _collections) for _topic in reversed(main_topics)]
+    while _stack:
+        _node, _depth, _siblings = _stack.pop()
+        _text_statistics = _aggregator.add_description(
+            _node.description, TREE_LEVELS[_depth] if _depth < len(TREE_LEVELS) else None
+        )
+        _collection = _node.to_collection(discipline_uris, educational_context_uris, _text_statistics)
+        _siblings.append(_collection)
+        # reversed, so that the children are appended in their original order
+        _stack.extend((_sub, _depth + 1, _collection.subcollections) for _sub in reversed(_node.subcollections))
+    return _collections, _aggregator.to_text_statistics()
@@ -0,0 +1,764 @@
+import asyncio
+import hashlib
+import time
+from contextlib import nullcontext
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from loguru import logger
+from openai import AsyncOpenAI
+
+from src.DTOs.collection import Collection
+from src.DTOs.enhanced_response import EnhancedTopicTreeResponse, GenerationMetadata, PhaseTiming
+from src.DTOs.topic_tree_bulk import TopicTreeBulkCompleteEvent, TopicTreeBulkErrorEvent, TopicTreeBulkResultEvent
+from src.DTOs.topic_tree_expansion import TopicTreeExpansionRequest
+from src.DTOs.topic_tree_request import BaseTopicTreeRequest, TopicTreeRequest
+from src.DTOs.topic_tree_stream import TopicTreeCompleteEvent, TopicTreeErrorEvent, TopicTreeNodeEvent
+from src.generation_trace import (
+    PHASE_FINALIZATION,
+    PHASE_SERIALIZATION,
+    PHASE_VOCAB_RESOLUTION,
+    trace_generation,
+    trace_phase,
+)
+from src.llm_client_helper import track_llm_usage
+from src.metrics import llm_call_level
+from src.prompts import (
+    BATCH_OUTPUT_FORMAT_INSTRUCTIONS,
+    LP_BATCH_PROMPT_TEMPLATE,
+    LP_PROMPT_TEMPLATE,
+    MAIN_PROMPT_TEMPLATE,
+    SUB_BATCH_PROMPT_TEMPLATE,
+    SUB_PROMPT_TEMPLATE,
+)
+from src.single_flight import SingleFlight
+from src.structured_text_helper import (
+    generate_structured_text,
+    generate_structured_text_batch,
+    stream_structured_text,
+)
+from src.text_statistics_helper import TextStatisticsAggregator, calculate_overall_statistics
+from src.topic_node import LEVEL_CURRICULUM, LEVEL_MAIN, LEVEL_SUB, TREE_LEVELS, TopicNode, finalize_topic_tree
+from src.topic_tree_store import get_topic_tree_store, store_topic_tree
+from src.vocab_helper import get_educational_context_pref_labels, get_discipline_pref_labels
+
+T = TypeVar("T")
+
+# Platzhalter im Prompt-Kontext, falls (noch) keine Haupt- bzw. Unterthemen existieren
+NO_MAIN_TOPICS_FALLBACK = "Keine weiteren Hauptthemen vorhanden."
+NO_SUBTOPICS_FALLBACK = "Keine weiteren Unterthemen vorhanden."
+
+# Callback, der nach jeder aufgelösten Generierungsanfrage aufgerufen wird:
+# (Ebene, übergeordnete Knoten, Index-Pfad des übergeordneten Knotens, neu generierte Knoten)
+OnCollectionsCallback = Callable[[str, List[TopicNode], List[int], List[TopicNode]], Awaitable[None]]
+
+# identical topic tree requests that are in flight at the same time are generated only once
+topic_tree_single_flight = SingleFlight("topic-tree")
+
+
+class TopicTreeGenerationError(Exception):
+    """Wird geworfen, wenn ein Themenbaum nicht (sinnvoll) generiert werden konnte."""
+
+
+def build_special_instructions(topic_tree_request: BaseTopicTreeRequest) -> str:
+    """Spezialanweisungen für Hauptthemen (z.B. Allgemeines, Methodik etc.)"""
+    special_instructions = []
+    if topic_tree_request.include_general_topic:
+        special_instructions.append("1) Hauptthema 'Allgemeines' an erster Stelle")
+    if topic_tree_request.include_methodology_topic:
+        special_instructions.append("2) Hauptthema 'Methodik und Didaktik' an letzter Stelle")
+    return "\n".join(special_instructions) if special_instructions else "Keine besonderen Anweisungen."
+
+
+def build_context_instructions(topic_tree_request: BaseTopicTreeRequest) -> str:
+    """
+    Baut die Kontext-Informationen (Fachbereich und Bildungsstufe) für die AI-Prompts.
+    Die URIs werden dafür (sofern möglich) in lesbare prefLabels aus den SKOS-Vokabularen übersetzt.
+    """
+    context_info = []
+    if topic_tree_request.discipline_uri:
+        context_info.append(f"Fachbereich-URIs: {', '.join(topic_tree_request.discipline_uri)}")
+        if isinstance(topic_tree_request.discipline_uri, list):
+            _discipline_set = set()
+            for _discipline_uri in topic_tree_request.discipline_uri:  # type: str
+                _discipline_pref_labels = get_discipline_pref_labels(_discipline_uri)
+                if _discipline_pref_labels:
+                    _discipline_set.update(_discipline_pref_labels)
+            if _discipline_set:
+                context_info.append(f"Fachbereich: {list(_discipline_set)}")
+    if topic_tree_request.educational_context_uri:
+        context_info.append(f"Bildungsstufe-URIs: {', '.join(topic_tree_request.educational_context_uri)}")
+        if isinstance(topic_tree_request.educational_context_uri, list):
+            _edu_context_set = set()
+            for _uri in topic_tree_request.educational_context_uri:  # type: str
+                # example _uri value: "http://w3id.org/openeduhub/vocabs/educationalContext/sekundarstufe_1"
+                _edu_context_pref_labels = get_educational_context_pref_labels(_uri)
+                if _edu_context_pref_labels:
+                    _edu_context_set.update(_edu_context_pref_labels)
+            if _edu_context_set:
+                context_info.append(f"Zielgruppe / Bildungsstufe: {list(_edu_context_set)}")
+    return f"Kontext-Informationen:\n{'\n'.join(context_info)}" if context_info else ""
+
+
+def format_existing_topics(topics: List[TopicNode], fallback: str) -> str:
+    """Formatiert die Titel bereits bestehender Themen als Liste mit Bindestrich-Präfix (für den Prompt-Kontext)."""
+    existing_topics_list = [f"- {topic.title}" for topic in topics]
+    return "\n".join(existing_topics_list) if existing_topics_list else fallback
+
+
+def request_uris(topic_tree_request: BaseTopicTreeRequest) -> Tuple[List[str], List[str]]:
+    """
+    Liefert die (ggf.) übergebenen Fach- und Bildungsstufen-URIs des Requests für ``finalize_topic_tree()``.
+    Dieselben Listen werden von allen Knoten eines Themenbaums referenziert.
+    """
+    return topic_tree_request.discipline_uri or [], topic_tree_request.educational_context_uri or []
+
+
+def build_generation_metadata(topic_tree_request: BaseTopicTreeRequest) -> GenerationMetadata:
+    """Erstellt die Metadaten der Generierung aus den Request-Parametern."""
+    return GenerationMetadata(
+        theme=topic_tree_request.theme,
+        model=topic_tree_request.model,
+        num_main_topics=topic_tree_request.num_main_topics,
+        num_subtopics=topic_tree_request.num_subtopics,
+        num_curriculum_topics=topic_tree_request.num_curriculum_topics,
+        max_description_length=topic_tree_request.max_description_length,
+        include_general_topic=topic_tree_request.include_general_topic,
+        include_methodology_topic=topic_tree_request.include_methodology_topic,
+        discipline_uris=topic_tree_request.discipline_uri or [],
+        educational_context_uris=topic_tree_request.educational_context_uri or [],
+    )
+
+
+def build_main_prompt(
+    topic_tree_request: BaseTopicTreeRequest, special_instructions: str, context_instructions: str
+) -> str:
+    """Baut den Prompt für die Hauptthemen."""
+    return MAIN_PROMPT_TEMPLATE.format(
+        themenbaumthema=topic_tree_request.theme,
+        num_main=topic_tree_request.num_main_topics,
+        special_instructions=special_instructions,
+        context_instructions=context_instructions,
+        max_description_length=topic_tree_request.max_description_length,
+    )
+
+
+def build_sub_prompt(
+    topic_tree_request: BaseTopicTreeRequest,
+    context_instructions: str,
+    main_topics: List[TopicNode],
+    main_topic: TopicNode,
+) -> str:
+    """Baut den Prompt für die Unterthemen eines Hauptthemas."""
+    return SUB_PROMPT_TEMPLATE.format(
+        themenbaumthema=topic_tree_request.theme,
+        main_theme=main_topic.title,
+        num_sub=topic_tree_request.num_subtopics,
+        context_instructions=context_instructions,
+        existing_main_topics=format_existing_topics(main_topics, NO_MAIN_TOPICS_FALLBACK),
+        max_description_length=topic_tree_request.max_description_length,
+    )
+
+
+def build_curriculum_prompt(
+    topic_tree_request: BaseTopicTreeRequest,
+    context_instructions: str,
+    main_topics: List[TopicNode],
+    main_topic: TopicNode,
+    sub_topic: TopicNode,
+) -> str:
+    """Baut den Prompt für die Lehrplanthemen eines Unterthemas."""
+    return LP_PROMPT_TEMPLATE.format(
+        themenbaumthema=topic_tree_request.theme,
+        main_theme=main_topic.title,
+        sub_theme=sub_topic.title,
+        num_lp=topic_tree_request.num_curriculum_topics,
+        context_instructions=context_instructions,
+        existing_main_topics=format_existing_topics(main_topics, NO_MAIN_TOPICS_FALLBACK),
+        existing_subtopics=format_existing_topics(main_topic.subcollections, NO_SUBTOPICS_FALLBACK),
+        max_description_length=topic_tree_request.max_description_length,
+    )
+
+
+def format_parent_topics(topics: List[TopicNode]) -> str:
+    """Nummeriert die übergeordneten Themen einer gebündelten Anfrage (die Nummern sind die Antwort-Schlüssel)."""
+    return "\n".join(f'{_number}: "{topic.title}"' for _number, topic in enumerate(topics, start=1))
+
+
+def _batched(items: List[T], size: int) -> List[List[T]]:
+    return [items[_start : _start + size] for _start in range(0, len(items), size)]
+
+
+async def generate_child_topics(
+    client: AsyncOpenAI,
+    topic_tree_request: TopicTreeRequest,
+    parents: List[TopicNode],
+    build_prompt: Callable[[TopicNode], str],
+    build_batch_prompt: Callable[[List[TopicNode]], str],
+    expected_count: int,
+) -> List[Optional[List[TopicNode]]]:
+    """
+    Generiert die Kindthemen mehrerer übergeordneter Themen.
+
+    Bei mehr als einem übergeordneten Thema werden alle Kindthemen in einer gemeinsamen Anfrage generiert
+    (JSON-Objekt mit den Nummern der übergeordneten Themen als Schlüssel).
+    Fehlen in der Antwort Themen für einzelne übergeordnete Themen, werden diese einzeln nachgeneriert.
+
+    :param parents: übergeordnete Themen
+    :param build_prompt: baut den Prompt für ein einzelnes übergeordnetes Thema
+    :param build_batch_prompt: baut den Prompt für alle übergeordneten Themen
+    :param expected_count: angefragte Anzahl an Kindthemen pro übergeordnetem Thema
+    :return: die Kindthemen in der Reihenfolge der übergeordneten Themen
+    """
+
+    async def _generate_single(parent: TopicNode) -> Optional[List[TopicNode]]:
+        return await generate_structured_text(
+            client=client,
+            prompt=build_prompt(parent),
+            model=topic_tree_request.model,
+            bypass_cache=topic_tree_request.bypass_cache,
+            expected_count=expected_count,
+        )
+
+    if len(parents) == 1:
+        return [await _generate_single(parents[0])]
+
+    _keys = [str(_number) for _number in range(1, len(parents) + 1)]
+    _batch_results = await generate_structured_text_batch(
+        client=client,
+        prompt=build_batch_prompt(parents),
+        model=topic_tree_request.model,
+        keys=_keys,
+        bypass_cache=topic_tree_request.bypass_cache,
+    )
+    results = [_batch_results.get(_key) for _key in _keys]
+    _missing = [_index for _index, _result in enumerate(results) if not _result]
+    if _missing:
+        logger.warning(
+            f"Batched request returned no topics for {len(_missing)} of {len(parents)} parent topics: "
+            f"falling back to single requests."
+        )
+        _fallback_results = await asyncio.gather(*[_generate_single(parents[_index]) for _index in _missing])
+        for _index, _result in zip(_missing, _fallback_results):
+            results[_index] = _result
+    return results
+
+
+async def generate_topic_tree_collections(
+    client: AsyncOpenAI,
+    topic_tree_request: TopicTreeRequest,
+    on_collections: Optional[OnCollectionsCallback] = None,
+) -> List[TopicNode]:
+    """
+    Generiert die Collections eines Themenbaums (Haupt-, Unter- und Lehrplanthemen).
+
+    Die Generierung läuft pro Hauptthema als Pipeline: Sobald die Unterthemen eines Hauptthemas vorliegen,
+    starten dessen Lehrplan-Anfragen - unabhängig davon, ob die Unterthemen der anderen Hauptthemen
+    noch generiert werden. Die Laufzeit richtet sich damit nach der langsamsten Kette
+    (Hauptthema -> Unterthema -> Lehrplanthema) statt nach der Summe der langsamsten Anfragen pro Ebene.
+    Mit ``subtopic_batch_size`` bzw. ``curriculum_batch_size`` > 1 werden die Kindthemen mehrerer Haupt- bzw.
+    Unterthemen in einer gemeinsamen Anfrage generiert (siehe ``generate_child_topics()``).
+
+    :param client: geteilter OpenAI-Client
+    :param topic_tree_request: Parameter des Themenbaums
+    :param on_collections: optionaler Callback, der aufgerufen wird, sobald die Knoten einer Anfrage vorliegen
+        (noch bevor deren Subcollections generiert werden)
+    :return: Liste der Hauptthemen (inkl. Subcollections)
+    :raises TopicTreeGenerationError: Falls keine Hauptthemen generiert werden konnten
+    """
+    with track_llm_usage() as usage:
+        main_topics = await _generate_topic_tree_collections(client, topic_tree_request, on_collections)
+    logger.info(
+        f"Topic tree '{topic_tree_request.theme}' used {usage.prompt_tokens} prompt tokens "
+        f"({usage.cached_prompt_tokens} cached) and {usage.completion_tokens} completion tokens "
+        f"in {usage.calls} OpenAI calls"
+    )
+    return main_topics
+
+
+async def _generate_topic_tree_collections(
+    client: AsyncOpenAI,
+    topic_tree_request: TopicTreeRequest,
+    on_collections: Optional[OnCollectionsCallback],
+) -> List[TopicNode]:
+    special_instructions = build_special_instructions(topic_tree_request)
+    with trace_phase(PHASE_VOCAB_RESOLUTION):
+        context_instructions = build_context_instructions(topic_tree_request)
+    main_topics: List[TopicNode] = []
+    # with streamed LLM responses, the children of a topic can arrive before all of its siblings (and before the
+    # topic has been passed to on_collections): the callbacks of a level wait until their parent level was reported
+    main_topics_reported = asyncio.Event()
+
+    def _build_sub_prompt(main_topic: TopicNode) -> str:
+        return build_sub_prompt(topic_tree_request, context_instructions, main_topics, main_topic)
+
+    def _build_sub_batch_prompt(batch_main_topics: List[TopicNode]) -> str:
+        return SUB_BATCH_PROMPT_TEMPLATE.format(
+            themenbaumthema=topic_tree_request.theme,
+            parent_topics=format_parent_topics(batch_main_topics),
+            num_sub=topic_tree_request.num_subtopics,
+            context_instructions=context_instructions,
+            existing_main_topics=format_existing_topics(main_topics, NO_MAIN_TOPICS_FALLBACK),
+            max_description_length=topic_tree_request.max_description_length,
+            batch_output_format=BATCH_OUTPUT_FORMAT_INSTRUCTIONS.format(parent_level="Hauptthemen"),
+        )
+
+    def _build_lp_batch_prompt(main_topic: TopicNode, batch_sub_topics: List[TopicNode]) -> str:
+        return LP_BATCH_PROMPT_TEMPLATE.format(
+            themenbaumthema=topic_tree_request.theme,
+            main_theme=main_topic.title,
+            parent_topics=format_parent_topics(batch_sub_topics),
+            num_lp=topic_tree_request.num_curriculum_topics,
+            context_instructions=context_instructions,
+            existing_main_topics=format_existing_topics(main_topics, NO_MAIN_TOPICS_FALLBACK),
+            existing_subtopics=format_existing_topics(main_topic.subcollections, NO_SUBTOPICS_FALLBACK),
+            max_description_length=topic_tree_request.max_description_length,
+            batch_output_format=BATCH_OUTPUT_FORMAT_INSTRUCTIONS.format(parent_level="Unterthemen"),
+        )
+
+    async def _generate_branches(main_batch: List[Tuple[int, TopicNode]]) -> None:
+        if topic_tree_request.stream_llm_responses and len(main_batch) == 1:
+            await _stream_branch(*main_batch[0])
+            return
+        # 3) Unterthemen für diese Hauptthemen generieren (bei subtopic_batch_size > 1 in einer gemeinsamen Anfrage)
+        logger.info(f"Creating subtopic ('Unterthemen') task for {', '.join(repr(_t.title) for _, _t in main_batch)}")
+        with llm_call_level(LEVEL_SUB), trace_phase(LEVEL_SUB):
+            sub_topics_per_main = await generate_child_topics(
+                client=client,
+                topic_tree_request=topic_tree_request,
+                parents=[main_topic for _, main_topic in main_batch],
+                build_prompt=_build_sub_prompt,
+                build_batch_prompt=_build_sub_batch_prompt,
+                expected_count=topic_tree_request.num_subtopics,
+            )
+        await asyncio.gather(
+            *[
+                _finish_branch(main_index, main_topic, sub_topics)
+                for (main_index, main_topic), sub_topics in zip(main_batch, sub_topics_per_main)
+            ]
+        )
+
+    async def _finish_branch(main_index: int, main_topic: TopicNode, sub_topics: Optional[List[TopicNode]]) -> None:
+        if sub_topics:
+            main_topic.subcollections = sub_topics
+            await main_topics_reported.wait()
+            if on_collections:
+                await on_collections(LEVEL_SUB, [main_topic], [main_index], sub_topics)
+        _sub_topics_reported = asyncio.Event()
+        _sub_topics_reported.set()
+
+        # 4) direkt im Anschluss die Lehrplanthemen für die Unterthemen dieses Hauptthemas generieren
+        await asyncio.gather(
+            *[
+                _generate_curricula(main_index, main_topic, sub_batch, _sub_topics_reported)
+                for sub_batch in _batched(
+                    list(enumerate(main_topic.subcollections)), topic_tree_request.curriculum_batch_size
+                )
+            ]
+        )
+        logger.info(f"Finished branch for main topic ('Hauptthema') '{main_topic.title}'")
+
+    async def _stream_branch(main_index: int, main_topic: TopicNode) -> None:
+        # 3) + 4) die Lehrplanthemen eines Unterthemas starten, sobald das Unterthema im Stream angekommen ist
+        logger.info(f"Streaming subtopics ('Unterthemen') for '{main_topic.title}'")
+        _sub_topics_reported = asyncio.Event()
+        with llm_call_level(LEVEL_SUB):
+            async with asyncio.TaskGroup() as task_group:
+                _sub_batch: List[Tuple[int, TopicNode]] = []
+                with trace_phase(LEVEL_SUB):
+                    async for sub_topic in stream_structured_text(
+                        client=client,
+                        prompt=_build_sub_prompt(main_topic),
+                        model=topic_tree_request.model,
+                        bypass_cache=topic_tree_request.bypass_cache,
+                        expected_count=topic_tree_request.num_subtopics,
+                    ):
+                        main_topic.subcollections.append(sub_topic)
+                        _sub_batch.append((len(main_topic.subcollections) - 1, sub_topic))
+                        if len(_sub_batch) == topic_tree_request.curriculum_batch_size:
+                            task_group.create_task(
+                                _generate_curricula(main_index, main_topic, _sub_batch, _sub_topics_reported)
+                            )
+                            _sub_batch = []
+                if _sub_batch:
+                    task_group.create_task(
+                        _generate_curricula(main_index, main_topic, _sub_batch, _sub_topics_reported)
+                    )
+                await main_topics_reported.wait()
+                if main_topic.subcollections and on_collections:
+                    await on_collections(LEVEL_SUB, [main_topic], [main_index], main_topic.subcollections)
+                _sub_topics_reported.set()
+        logger.info(f"Finished branch for main topic ('Hauptthema') '{main_topic.title}'")
+
+    async def _generate_curricula(
+        main_index: int,
+        main_topic: TopicNode,
+        sub_batch: List[Tuple[int, TopicNode]],
+        sub_topics_reported: asyncio.Event,
+    ) -> None:
+        logger.info(f"Generating curriculum ('Lehrplan') task for {', '.join(repr(_t.title) for _, _t in sub_batch)}")
+        with llm_call_level(LEVEL_CURRICULUM), trace_phase(LEVEL_CURRICULUM):
+            lp_topics_per_sub = await generate_child_topics(
+                client=client,
+                topic_tree_request=topic_tree_request,
+                parents=[sub_topic for _, sub_topic in sub_batch],
+                build_prompt=lambda sub_topic: build_curriculum_prompt(
+                    topic_tree_request, context_instructions, main_topics, main_topic, sub_topic
+                ),
+                build_batch_prompt=lambda batch_sub_topics: _build_lp_batch_prompt(main_topic, batch_sub_topics),
+                expected_count=topic_tree_request.num_curriculum_topics,
+            )
+        await sub_topics_reported.wait()
+        for (sub_index, sub_topic), lp_topics in zip(sub_batch, lp_topics_per_sub):
+            if lp_topics:
+                sub_topic.subcollections = lp_topics
+                if on_collections:
+                    await on_collections(LEVEL_CURRICULUM, [main_topic, sub_topic], [main_index, sub_index], lp_topics)
+
+    logger.info(f"Generating {topic_tree_request.num_main_topics} main topics ('Hauptthemen') ...")
+    _main_prompt = build_main_prompt(topic_tree_request, special_instructions, context_instructions)
+    # ToDo: extend generate_structured_text() function to include context_instructions
+
+    if topic_tree_request.stream_llm_responses:
+        # 1) + 2) Hauptthemen streamen und die Unterthemen jedes Hauptthemas (bzw. jeder Gruppe von
+        # subtopic_batch_size Hauptthemen) generieren, sobald es im Stream angekommen ist
+        with llm_call_level(LEVEL_MAIN):
+            async with asyncio.TaskGroup() as task_group:
+                _main_batch: List[Tuple[int, TopicNode]] = []
+                with trace_phase(LEVEL_MAIN):
+                    async for main_topic in stream_structured_text(
+                        client=client,
+                        prompt=_main_prompt,
+                        model=topic_tree_request.model,
+                        bypass_cache=topic_tree_request.bypass_cache,
+                        expected_count=topic_tree_request.num_main_topics,
+                    ):
+                        main_topics.append(main_topic)
+                        _main_batch.append((len(main_topics) - 1, main_topic))
+                        if len(_main_batch) == topic_tree_request.subtopic_batch_size:
+                            task_group.create_task(_generate_branches(_main_batch))
+                            _main_batch = []
+                if _main_batch:
+                    task_group.create_task(_generate_branches(_main_batch))
+                if main_topics and on_collections:
+                    await on_collections(LEVEL_MAIN, [], [], main_topics)
+                main_topics_reported.set()
+        if not main_topics:
+            raise TopicTreeGenerationError("Fehler bei der Generierung der Hauptthemen")
+        return main_topics
+
+    # 1) Hauptthemen generieren
+    with llm_call_level(LEVEL_MAIN), trace_phase(LEVEL_MAIN):
+        main_topics = await generate_structured_text(
+            client=client,
+            prompt=_main_prompt,
+            model=topic_tree_request.model,
+            bypass_cache=topic_tree_request.bypass_cache,
+            expected_count=topic_tree_request.num_main_topics,
+        )
+
+    if not main_topics:
+        raise TopicTreeGenerationError("Fehler bei der Generierung der Hauptthemen")
+    if on_collections:
+        await on_collections(LEVEL_MAIN, [], [], main_topics)
+    main_topics_reported.set()
+
+    logger.info("Received main topics ('Hauptthemen'). Beginning generation of sub topics ('Unterthemen') next.")
+
+    # 2) Unterthemen und Lehrplanthemen pro Hauptthema (bzw. pro Gruppe von subtopic_batch_size Hauptthemen)
+    await asyncio.gather(
+        *[
+            _generate_branches(main_batch)
+            for main_batch in _batched(list(enumerate(main_topics)), topic_tree_request.subtopic_batch_size)
+        ]
+    )
+
+    return main_topics
+
+
+def build_topic_tree_request_key(topic_tree_request: TopicTreeRequest) -> str:
+    """
+    Berechnet einen Schlüssel für den normalisierten Request:
+    Leerzeichen im Thema werden vereinheitlicht, URI-Listen sortiert und von Duplikaten befreit.
+    """
+    _normalized = topic_tree_request.model_copy(
+        update={
+            "theme": " ".join(topic_tree_request.theme.split()),
+            "discipline_uri": sorted(set(topic_tree_request.discipline_uri or [])),
+            "educational_context_uri": sorted(set(topic_tree_request.educational_context_uri or [])),
+        }
+    )
+    return hashlib.sha256(_normalized.model_dump_json().encode("utf-8")).hexdigest()
+
+
+async def generate_topic_tree_response(
+    client: AsyncOpenAI,
+    topic_tree_request: TopicTreeRequest,
+    on_collections: Optional[OnCollectionsCallback] = None,
+) -> EnhancedTopicTreeResponse:
+    """
+    Generiert einen vollständigen Themenbaum inkl. Properties, Metadaten und Gesamtstatistiken.
+
+    :param client: geteilter OpenAI-Client
+    :param topic_tree_request: Parameter des Themenbaums
+    :param on_collections: optionaler Callback, z.B. für Fortschrittsanzeigen
+        (siehe ``generate_topic_tree_collections()``)
+    :return: die erweiterte Antwort mit Themenbaum, Metadaten und Statistiken
+        (mit ``include_timings`` inkl. Performance-Trace in ``metadata.timings``)
+    :raises TopicTreeGenerationError: Falls keine Hauptthemen generiert werden konnten
+    """
+    with trace_generation() if topic_tree_request.include_timings else nullcontext() as trace:
+        # 1) Haupt-, Unter- und Lehrplanthemen generieren (pipelined pro Hauptthema)
+        main_topics = await generate_topic_tree_collections(
+            client=client, topic_tree_request=topic_tree_request, on_collections=on_collections
+        )
+
+        response = build_topic_tree_response(main_topics, topic_tree_request)
+    if trace is not None:
+        response.metadata.timings = trace.to_generation_timings(topic_tree_request.model)
+    return response
+
+
+def build_topic_tree_response(
+    main_topics: List[TopicNode], topic_tree_request: TopicTreeRequest
+) -> EnhancedTopicTreeResponse:
+    """Wandelt die generierten Knoten in Collections um und ergänzt Properties, Metadaten und Gesamtstatistiken."""
+    # 2) Knoten in einem Durchlauf in Collections umwandeln: Properties mit den (ggf.) übergebenen URIs,
+    #    Textstatistiken und Gesamtstatistiken
+    _discipline_uris, _educational_context_uris = request_uris(topic_tree_request)
+    with trace_phase(PHASE_FINALIZATION):
+        collections, statistics = finalize_topic_tree(main_topics, _discipline_uris, _educational_context_uris)
+
+    # 3) Finale erweiterte Antwort inkl. Metadaten und Gesamtstatistiken strukturieren
+    return EnhancedTopicTreeResponse(
+        metadata=build_generation_metadata(topic_tree_request),
+        topic_tree=collections,
+        statistics=statistics,
+    )
+
+
+def serialize_topic_tree_response(topic_tree: EnhancedTopicTreeResponse) -> str:
+    """
+    Serialisiert einen Themenbaum nach JSON. Enthalten die Metadaten einen Performance-Trace (``include_timings``),
+    wird die Dauer der Serialisierung darin ergänzt: Nur die (kleinen) Metadaten werden danach erneut serialisiert.
+    """
+    timings = topic_tree.metadata.timings
+    if timings is None:
+        return topic_tree.model_dump_json(by_alias=True)
+    _start = time.perf_counter()
+    _body = topic_tree.model_dump_json(by_alias=True, exclude={"metadata"})
+    _duration = round(time.perf_counter() - _start, 4)
+    timings.phases[PHASE_SERIALIZATION] = PhaseTiming(count=1, wall_seconds=_duration, busy_seconds=_duration)
+    # _body is '{"topic_tree":...,"statistics":...}': the metadata is put in front again (same order as the model)
+    return f'{{"metadata":{topic_tree.metadata.model_dump_json(by_alias=True)},{_body[1:]}'
+
+
+async def expand_topic_tree(
+    client: AsyncOpenAI, expansion_request: TopicTreeExpansionRequest
+) -> EnhancedTopicTreeResponse:
+    """
+    (Neu-)Generiert nur die Kindthemen des Knotens ``expansion_request.path`` in einem bestehenden Themenbaum,
+    z.B. um einen misslungenen Ast zu ersetzen oder einen Themenbaum Ebene für Ebene bei Bedarf aufzubauen.
+
+    Die Titel der Geschwisterthemen im bestehenden Themenbaum fließen als Kontext in den Prompt ein.
+    Bestehende Kindthemen (inkl. ihrer Subcollections) werden ersetzt; dafür wird der LLM-Cache umgangen,
+    da sonst dieselbe Antwort erneut geliefert würde. Alle übrigen Knoten bleiben unverändert.
+
+    :return: der ergänzte Themenbaum inkl. Metadaten und neu berechneter Gesamtstatistiken
+    :raises TopicTreeGenerationError: Falls keine Kindthemen generiert werden konnten
+    """
+    with trace_generation() if expansion_request.include_timings else nullcontext() as trace:
+        response = await _expand_topic_tree(client, expansion_request)
+    if trace is not None:
+        response.metadata.timings = trace.to_generation_timings(expansion_request.model)
+    return response
+
+
+async def _expand_topic_tree(
+    client: AsyncOpenAI, expansion_request: TopicTreeExpansionRequest
+) -> EnhancedTopicTreeResponse:
+    main_topics = expansion_request.topic_tree
+    # the prompts only need the titles of the existing nodes
+    _context_topics = [TopicNode.from_collection(_main_topic) for _main_topic in main_topics]
+    with trace_phase(PHASE_VOCAB_RESOLUTION):
+        context_instructions = build_context_instructions(expansion_request)
+    path = expansion_request.path
+    if not path:
+        _level, _parent, _expected_count = LEVEL_MAIN, None, expansion_request.num_main_topics
+        _prompt = build_main_prompt(
+            expansion_request, build_special_instructions(expansion_request), context_instructions
+        )
+    elif len(path) == 1:
+        _level, _parent, _expected_count = LEVEL_SUB, main_topics[path[0]], expansion_request.num_subtopics
+        _prompt = build_sub_prompt(expansion_request, context_instructions, _context_topics, _context_topics[path[0]])
+    else:
+        _level, _parent = LEVEL_CURRICULUM, main_topics[path[0]].subcollections[path[1]]
+        _expected_count = expansion_request.num_curriculum_topics
+        _context_main_topic = _context_topics[path[0]]
+        _prompt = build_curriculum_prompt(
+            expansion_request,
+            context_instructions,
+            _context_topics,
+            _context_main_topic,
+            _context_main_topic.subcollections[path[1]],
+        )
+    _existing_children = main_topics if _parent is None else _parent.subcollections
+
+    logger.info(f"Generating the {_level} topics of path {path} in topic tree '{expansion_request.theme}'")
+    with track_llm_usage() as usage, llm_call_level(_level), trace_phase(_level):
+        children = await generate_structured_text(
+            client=client,
+            prompt=_prompt,
+            model=expansion_request.model,
+            bypass_cache=expansion_request.bypass_cache or bool(_existing_children),
+            expected_count=_expected_count,
+        )
+    logger.info(
+        f"Expanding topic tree '{expansion_request.theme}' used {usage.prompt_tokens} prompt tokens "
+        f"and {usage.completion_tokens} completion tokens in {usage.calls} OpenAI calls"
+    )
+    if not children:
+        raise TopicTreeGenerationError(f"Fehler bei der Generierung der Kindthemen von Pfad {path}")
+
+    _discipline_uris, _educational_context_uris = request_uris(expansion_request)
+    with trace_phase(PHASE_FINALIZATION):
+        _children, _ = finalize_topic_tree(children, _discipline_uris, _educational_context_uris)
+        if _parent is None:
+            main_topics = _children
+        else:
+            _parent.subcollections = _children
+        statistics = calculate_overall_statistics(main_topics, TREE_LEVELS)
+    return EnhancedTopicTreeResponse(
+        metadata=build_generation_metadata(expansion_request),
+        topic_tree=main_topics,
+        statistics=statistics,
+    )
+
+
+async def stream_topic_tree_events(client: AsyncOpenAI, topic_tree_request: TopicTreeRequest) -> AsyncIterator[str]:
+    """
+    Generiert einen Themenbaum und liefert jeden Knoten als NDJSON-Zeile, sobald seine Generierungsanfrage vorliegt.
+
+    Die letzte Zeile ist entweder ein ``complete``-Event (Metadaten, Gesamtstatistiken und ID des gespeicherten
+    Themenbaums) oder ein ``error``-Event, falls die Generierung abgebrochen werden musste.
+    """
+    queue: asyncio.Queue[Optional[str]] = asyncio.Queue()
+    _discipline_uris, _educational_context_uris = request_uris(topic_tree_request)
+    # every node is reported exactly once, so the overall statistics are updated as the nodes arrive
+    _statistics = TextStatisticsAggregator()
+    # the sent collections are linked to the complete topic tree, which is stored at the end
+    topic_tree: List[Collection] = []
+    _collections: Dict[int, Collection] = {}
+
+    async def _on_collections(
+        level: str, ancestors: List[TopicNode], index_path: List[int], collections: List[TopicNode]
+    ) -> None:
+        _path = [ancestor.title for ancestor in ancestors]
+        for _index, _topic in enumerate(collections):
+            # the nodes are final once they arrive, so they can be sent right away
+            _collection = _topic.to_collection(
+                _discipline_uris, _educational_context_uris, _statistics.add_description(_topic.description, level)
+            )
+            # parents are always reported before their children
+            (_collections[id(ancestors[-1])].subcollections if ancestors else topic_tree).append(_collection)
+            _collections[id(_topic)] = _collection
+            _event = TopicTreeNodeEvent(
+                level=level, path=_path, index_path=[*index_path, _index], collection=_collection
+            )
+            # serialize immediately: the subcollections of this node are attached later and are sent as own events
+            with trace_phase(PHASE_SERIALIZATION):
+                _line = _event.model_dump_json(by_alias=True, exclude={"collection": {"subcollections"}})
+            queue.put_nowait(_line + "\n")
+
+    async def _produce() -> None:
+        try:
+            with trace_generation() if topic_tree_request.include_timings else nullcontext() as trace:
+                await generate_topic_tree_collections(
+                    client=client, topic_tree_request=topic_tree_request, on_collections=_on_collections
+                )
+            _metadata = build_generation_metadata(topic_tree_request)
+            if trace is not None:
+                _metadata.timings = trace.to_generation_timings(topic_tree_request.model)
+            _complete = TopicTreeCompleteEvent(metadata=_metadata, statistics=_statistics.to_text_statistics())
+            if get_topic_tree_store() is not None:
+                _response = EnhancedTopicTreeResponse(
+                    metadata=_metadata, topic_tree=topic_tree, statistics=_complete.statistics
+                )
+                _stored = await store_topic_tree(topic_tree_request.theme, serialize_topic_tree_response(_response))
+                _complete.tree_id = _stored[0] if _stored else None
+            queue.put_nowait(_complete.model_dump_json() + "\n")
+        except Exception as e:
+            logger.error(f"Unhandled Exception occured while streaming topic tree: {e}")
+            queue.put_nowait(
+                TopicTreeErrorEvent(detail=f"Fehler bei der Generierung: {str(e)}").model_dump_json() + "\n"
+            )
+        finally:
+            queue.put_nowait(None)
+
+    producer = asyncio.create_task(_produce())
+    try:
+        while (line := await queue.get()) is not None:
+            yield line
+    finally:
+        # the client might have disconnected: pending LLM calls are no longer needed
+        producer.cancel()
+
+
+async def stream_topic_tree_bulk_events(
+    client: AsyncOpenAI, topic_tree_requests: List[TopicTreeRequest]
+) -> AsyncIterator[str]:
+    """
+    Generiert mehrere Themenbäume gleichzeitig und liefert jeden als NDJSON-Zeile, sobald er fertig ist
+    (in der Reihenfolge der Fertigstellung, nicht der Requests).
+
+    Alle LLM-Aufrufe der Themenbäume laufen über den gemeinsamen LLM-Scheduler (Concurrency- und Rate-Limit-Budget),
+    sodass ein langsamer Themenbaum die übrigen nicht aufhält. Identische Requests werden nur einmal generiert.
+    Die letzte Zeile ist ein ``complete``-Event mit der Anzahl erfolgreicher und fehlgeschlagener Themenbäume.
+    """
+    # identical requests (normalized, see build_topic_tree_request_key()) share one generation
+    _indexes_per_key: Dict[str, List[int]] = {}
+    for _index, _request in enumerate(topic_tree_requests):
+        _indexes_per_key.setdefault(build_topic_tree_request_key(_request), []).append(_index)
+
+    async def _generate(indexes: List[int]) -> Tuple[bool, List[str]]:
+        _request = topic_tree_requests[indexes[0]]
+        try:
+            response = await generate_topic_tree_response(client=client, topic_tree_request=_request)
+        except Exception as e:
+            logger.error(f"Unhandled Exception occured while generating topic tree '{_request.theme}': {e}")
+            return False, [
+                TopicTreeBulkErrorEvent(
+                    index=_index, theme=_request.theme, detail=f"Fehler bei der Generierung: {str(e)}"
+                ).model_dump_json()
+                + "\n"
+                for _index in indexes
+            ]
+        _content = serialize_topic_tree_response(response)
+        _stored = await store_topic_tree(_request.theme, _content)
+        _lines = []
+        for _index in indexes:
+            _event = TopicTreeBulkResultEvent.model_construct(
+                index=_index, theme=_request.theme, tree_id=_stored[0] if _stored else None
+            )
+            # the topic tree is serialized only once (for the store and all lines): it is put behind the other fields
+            _head = _event.model_dump_json(exclude={"result"})
+            _lines.append(f'{_head[:-1]},"result":{_content}}}\n')
+        return True, _lines
+
+    tasks = [asyncio.create_task(_generate(_indexes)) for _indexes in _indexes_per_key.values()]
+    logger.info(f"Generating {len(topic_tree_requests)} topic trees ({len(tasks)} distinct requests) in bulk")
+    _failed = 0
+    try:
+        for _next in asyncio.as_completed(tasks):
+            _succeeded, _lines = await _next
+            if not _succeeded:
+                _failed += len(_lines)
+            for line in _lines:
+                yield line
+        yield (
+            TopicTreeBulkCompleteEvent(succeeded=len(topic_tree_requests) - _failed, failed=_failed).model_dump_json()
+            + "\n"
+        )
+    finally:
+        # the client might have disconnected: the remaining topic trees are no longer needed
+        for _task in tasks:
+            _task.cancel()
@@ -0,0 +1,348 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from loguru import logger
+from openai import AsyncOpenAI
+
+from src.DTOs.topic_tree_job import TopicTreeJob, TopicTreeJobStatus
+from src.DTOs.topic_tree_request import TopicTreeRequest
+from src.llm_scheduler import get_number_env
+from src.topic_node import TopicNode
+from src.topic_tree_helper import (
+    LEVEL_CURRICULUM,
+    LEVEL_MAIN,
+    LEVEL_SUB,
+    generate_topic_tree_response,
+    serialize_topic_tree_response,
+)
+from src.topic_tree_store import store_topic_tree
+
+
+class TopicTreeJobQueueFullError(Exception):
+    """Wird geworfen, wenn bereits die maximale Anzahl an Jobs auf ihre Ausführung wartet."""
+
+
+def _to_datetime(timestamp: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc) if timestamp is not None else None
+
+
+class TopicTreeJobStore:
+    """
+    Persistenter Speicher (SQLite) für Themenbaum-Jobs inkl. Request, Status und Ergebnis.
+
+    Der Fortschritt laufender Jobs wird nur im Speicher gehalten (er ändert sich mit jedem generierten Knoten)
+    und erst beim Abschluss des Jobs persistiert. Abgeschlossene Jobs werden nach ``retention_seconds`` gelöscht.
+    """
+
+    def __init__(self, path: Optional[str], retention_seconds: float):
+        self.retention_seconds = retention_seconds
+        self._progress: Dict[str, tuple[int, int]] = {}
+        self._db_lock = threading.Lock()
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS topic_tree_jobs ("
+            "job_id TEXT PRIMARY KEY, status TEXT NOT NULL, request TEXT NOT NULL, result TEXT, error TEXT, "
+            "nodes_done INTEGER NOT NULL DEFAULT 0, nodes_planned INTEGER NOT NULL DEFAULT 0, "
+            "created_at REAL NOT NULL, started_at REAL, finished_at REAL, tree_id TEXT)"
+        )
+        # job stores of earlier versions have no tree_id column yet
+        if "tree_id" not in {_row[1] for _row in self._db.execute("PRAGMA table_info(topic_tree_jobs)")}:
+            self._db.execute("ALTER TABLE topic_tree_jobs ADD COLUMN tree_id TEXT")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_topic_tree_jobs_status ON topic_tree_jobs (status)")
+        self._db.commit()
+
+    def _execute(self, sql: str, parameters: tuple = ()) -> None:
+        with self._db_lock:
+            self._db.execute(sql, parameters)
+            self._db.commit()
+
+    def _fetchone(self, sql: str, parameters: tuple = ()) -> Optional[tuple]:
+        with self._db_lock:
+            return self._db.execute(sql, parameters).fetchone()
+
+    def _fetchall(self, sql: str, parameters: tuple = ()) -> List[tuple]:
+        with self._db_lock:
+            return self._db.execute(sql, parameters).fetchall()
+
+    async def create(self, request: TopicTreeRequest) -> TopicTreeJob:
+        """Legt einen neuen Job mit Status ``queued`` an."""
+        _job_id = uuid.uuid4().hex
+        _created_at = time.time()
+        if self.retention_seconds > 0:
+            await asyncio.to_thread(
+                self._execute,
+                "DELETE FROM topic_tree_jobs WHERE finished_at < ?",
+                (_created_at - self.retention_seconds,),
+            )
+        await asyncio.to_thread(
+            self._execute,
+            "INSERT INTO topic_tree_jobs (job_id, status, request, created_at) VALUES (?, ?, ?, ?)",
+            (_job_id, TopicTreeJobStatus.QUEUED.value, request.model_dump_json(), _created_at),
+        )
+        return TopicTreeJob(
+            job_id=_job_id, status=TopicTreeJobStatus.QUEUED, created_at=_to_datetime(_created_at), request=request
+        )
+
+    async def get(self, job_id: str) -> Optional[TopicTreeJob]:
+        """Liefert den aktuellen Stand eines Jobs (ohne Ergebnis) oder ``None``, falls der Job unbekannt ist."""
+        _row = await asyncio.to_thread(
+            self._fetchone,
+            "SELECT status, request, error, nodes_done, nodes_planned, created_at, started_at, finished_at, tree_id "
+            "FROM topic_tree_jobs WHERE job_id = ?",
+            (job_id,),
+        )
+        if _row is None:
+            return None
+        _status, _request, _error, _nodes_done, _nodes_planned, _created_at, _started_at, _finished_at, _tree_id = _row
+        _nodes_done, _nodes_planned = self._progress.get(job_id, (_nodes_done, _nodes_planned))
+        return TopicTreeJob(
+            job_id=job_id,
+            status=TopicTreeJobStatus(_status),
+            nodes_done=_nodes_done,
+            nodes_planned=_nodes_planned,
+            progress=round(min(_nodes_done / _nodes_planned, 1.0), 4) if _nodes_planned else 0.0,
+            created_at=_to_datetime(_created_at),
+            started_at=_to_datetime(_started_at),
+            finished_at=_to_datetime(_finished_at),
+            error=_error,
+            tree_id=_tree_id,
+            request=TopicTreeRequest.model_validate_json(_request),
+        )
+
+    async def get_result(self, job_id: str) -> Optional[str]:
+        """Liefert das Ergebnis eines abgeschlossenen Jobs als JSON (``EnhancedTopicTreeResponse``)."""
+        _row = await asyncio.to_thread(self._fetchone, "SELECT result FROM topic_tree_jobs WHERE job_id = ?", (job_id,))
+        return _row[0] if _row else None
+
+    async def list_unfinished(self) -> List[str]:
+        """Liefert die IDs aller Jobs, die (z.B. wegen eines Neustarts) nicht abgeschlossen wurden."""
+        _rows = await asyncio.to_thread(
+            self._fetchall,
+            "SELECT job_id FROM topic_tree_jobs WHERE status IN (?, ?) ORDER BY created_at",
+            (TopicTreeJobStatus.QUEUED.value, TopicTreeJobStatus.RUNNING.value),
+        )
+        return [_row[0] for _row in _rows]
+
+    async def mark_running(self, job_id: str, nodes_planned: int) -> None:
+        self._progress[job_id] = (0, nodes_planned)
+        await asyncio.to_thread(
+            self._execute,
+            "UPDATE topic_tree_jobs SET status = ?, started_at = ?, nodes_done = 0, nodes_planned = ? WHERE job_id = ?",
+            (TopicTreeJobStatus.RUNNING.value, time.time(), nodes_planned, job_id),
+        )
+
+    def update_progress(self, job_id: str, nodes_done: int, nodes_planned: int) -> None:
+        self._progress[job_id] = (nodes_done, nodes_planned)
+
+    async def complete(self, job_id: str, result: str, nodes_done: int, tree_id: Optional[str] = None) -> None:
+        """
+        Speichert das Ergebnis (JSON) und setzt den Status auf ``completed``.
+
+        :param tree_id: ID des Ergebnisses im Themenbaum-Speicher (falls es dort gespeichert wurde)
+        """
+        await asyncio.to_thread(
+            self._execute,
+            "UPDATE topic_tree_jobs SET status = ?, result = ?, nodes_done = ?, nodes_planned = ?, finished_at = ?, "
+            "tree_id = ? WHERE job_id = ?",
+            (TopicTreeJobStatus.COMPLETED.value, result, nodes_done, nodes_done, time.time(), tree_id, job_id),
+        )
+        self._progress.pop(job_id, None)
+
+    async def fail(self, job_id: str, error: str) -> None:
+        _nodes_done, _nodes_planned = self._progress.pop(job_id, (0, 0))
+        await asyncio.to_thread(
+            self._execute,
+            "UPDATE topic_tree_jobs SET status = ?, error = ?, nodes_done = ?, nodes_planned = ?, finished_at = ? "
+            "WHERE job_id = ?",
+            (TopicTreeJobStatus.FAILED.value, error, _nodes_done, _nodes_planned, time.time(), job_id),
+        )
+
+    def close(self) -> None:
+        with self._db_lock:
+            self._db.close()
+
+
+class _TopicTreeJobProgress:
+    """
+    Zählt die generierten Knoten eines Jobs.
+    Liefert das Modell mehr oder weniger Themen als angefragt, wird die Anzahl der erwarteten Knoten angepasst.
+    """
+
+    def __init__(self, request: TopicTreeRequest):
+        _curriculum_subtree = 1
+        _sub_subtree = 1 + request.num_curriculum_topics * _curriculum_subtree
+        _main_subtree = 1 + request.num_subtopics * _sub_subtree
+        # level -> (requested number of topics per request, number of nodes per topic incl. its subtree)
+        self._expected = {
+            LEVEL_MAIN: (request.num_main_topics, _main_subtree),
+            LEVEL_SUB: (request.num_subtopics, _sub_subtree),
+            LEVEL_CURRICULUM: (request.num_curriculum_topics, _curriculum_subtree),
+        }
+        self.nodes_done = 0
+        self.nodes_planned = request.num_main_topics * _main_subtree
+
+    def add(self, level: str, collections: List[TopicNode]) -> None:
+        _requested, _subtree_size = self._expected[level]
+        self.nodes_done += len(collections)
+        self.nodes_planned += (len(collections) - _requested) * _subtree_size
+
+
+class TopicTreeJobQueue:
+    """
+    Führt Themenbaum-Jobs mit einer begrenzten Anzahl von Workern im Hintergrund aus.
+
+    Jobs, die beim Herunterfahren noch nicht abgeschlossen waren, werden beim nächsten Start erneut ausgeführt.
+    """
+
+    def __init__(self, store: TopicTreeJobStore, client: AsyncOpenAI, workers: int, max_queued: int):
+        self.store = store
+        self.client = client
+        self.workers = workers
+        self.max_queued = max_queued
+        self._queue: asyncio.Queue[str] = asyncio.Queue()
+        self._worker_tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        _unfinished = await self.store.list_unfinished()
+        for _job_id in _unfinished:
+            self._queue.put_nowait(_job_id)
+        if _unfinished:
+            logger.info(f"Resuming {len(_unfinished)} unfinished topic tree job(s)")
+        self._worker_tasks = [asyncio.create_task(self._work(_number)) for _number in range(self.workers)]
+
+    async def stop(self) -> None:
+        for _task in self._worker_tasks:
+            _task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    async def submit(self, request: TopicTreeRequest) -> TopicTreeJob:
+        """
+        Legt einen Job an und reiht ihn in die Warteschlange ein.
+
+        :raises TopicTreeJobQueueFullError: Falls bereits ``max_queued`` Jobs warten
+        """
+        if self._queue.qsize() >= self.max_queued:
+            raise TopicTreeJobQueueFullError(f"{self._queue.qsize()} Jobs warten bereits auf ihre Ausführung")
+        job = await self.store.create(request)
+        self._queue.put_nowait(job.job_id)
+        logger.info(f"Queued topic tree job {job.job_id} for '{request.theme}'")
+        return job
+
+    async def submit_many(self, requests: List[TopicTreeRequest]) -> List[TopicTreeJob]:
+        """
+        Legt für jeden Request einen Job an - entweder für alle oder (bei voller Warteschlange) für keinen.
+
+        :raises TopicTreeJobQueueFullError: Falls nicht alle Jobs in die Warteschlange passen
+        """
+        if self._queue.qsize() + len(requests) > self.max_queued:
+            raise TopicTreeJobQueueFullError(
+                f"{self._queue.qsize()} Jobs warten bereits auf ihre Ausführung, {len(requests)} weitere passen nicht"
+            )
+        jobs = [await self.store.create(_request) for _request in requests]
+        for job in jobs:
+            self._queue.put_nowait(job.job_id)
+        logger.info(f"Queued {len(jobs)} topic tree jobs")
+        return jobs
+
+    async def _work(self, number: int) -> None:
+        while True:
+            _job_id = await self._queue.get()
+            try:
+                await self._run(_job_id)
+            except Exception as e:
+                # the job store itself failed: the worker has to keep running for the other jobs
+                logger.error(f"Worker {number} could not run topic tree job {_job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        job = await self.store.get(job_id)
+        if job is None:
+            return
+        progress = _TopicTreeJobProgress(job.request)
+        await self.store.mark_running(job_id, progress.nodes_planned)
+
+        async def _on_collections(
+            level: str, ancestors: List[TopicNode], index_path: List[int], collections: List[TopicNode]
+        ) -> None:
+            progress.add(level, collections)
+            self.store.update_progress(job_id, progress.nodes_done, progress.nodes_planned)
+
+        logger.info(f"Starting topic tree job {job_id} ({progress.nodes_planned} nodes planned)")
+        try:
+            response = await generate_topic_tree_response(
+                client=self.client, topic_tree_request=job.request, on_collections=_on_collections
+            )
+        except asyncio.CancelledError:
+            # shutdown: the job stays "running" in the store and is resumed on the next start
+            raise
+        except Exception as e:
+            logger.error(f"Topic tree job {job_id} failed: {e}")
+            await self.store.fail(job_id, f"Fehler bei der Generierung: {str(e)}")
+            return
+        _content = serialize_topic_tree_response(response)
+        _stored = await store_topic_tree(job.request.theme, _content)
+        await self.store.complete(job_id, _content, progress.nodes_done, _stored[0] if _stored else None)
+        logger.info(f"Finished topic tree job {job_id} ({progress.nodes_done} nodes)")
+
+
+def create_topic_tree_job_queue_from_env(client: AsyncOpenAI) -> TopicTreeJobQueue:
+    """
+    Erstellt die Job-Warteschlange anhand der Umgebungsvariablen:
+
+    - ``TOPIC_TREE_JOB_STORE_PATH``: Pfad der SQLite-Datei; leer = nur In-Memory
+      (Default: ``.cache/topic_tree_jobs.sqlite3``)
+    - ``TOPIC_TREE_JOB_WORKERS``: Anzahl der gleichzeitig generierten Themenbäume (Default: 4)
+    - ``TOPIC_TREE_JOB_MAX_QUEUED``: maximale Anzahl wartender Jobs (Default: 100)
+    - ``TOPIC_TREE_JOB_RETENTION_SECONDS``: Aufbewahrungsdauer abgeschlossener Jobs, ``0`` = unbegrenzt
+      (Default: 604800)
+    """
+    _path = os.getenv("TOPIC_TREE_JOB_STORE_PATH", ".cache/topic_tree_jobs.sqlite3")
+    _retention_seconds = get_number_env("TOPIC_TREE_JOB_RETENTION_SECONDS", 7 * 24 * 60 * 60)
+    try:
+        store = TopicTreeJobStore(path=_path, retention_seconds=_retention_seconds)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(f"Could not open the topic tree job store '{_path}': {e}. Keeping the jobs in memory only.")
+        store = TopicTreeJobStore(path=None, retention_seconds=_retention_seconds)
+    return TopicTreeJobQueue(
+        store=store,
+        client=client,
+        workers=max(1, int(get_number_env("TOPIC_TREE_JOB_WORKERS", 4))),
+        max_queued=int(get_number_env("TOPIC_TREE_JOB_MAX_QUEUED", 100)),
+    )
+
+
+_topic_tree_job_queue: Optional[TopicTreeJobQueue] = None
+
+
+async def start_topic_tree_job_queue(client: AsyncOpenAI) -> TopicTreeJobQueue:
+    """Erstellt und startet die prozessweite Job-Warteschlange (wird beim Start der App aufgerufen)."""
+    global _topic_tree_job_queue
+    await stop_topic_tree_job_queue()
+    _topic_tree_job_queue = create_topic_tree_job_queue_from_env(client)
+    await _topic_tree_job_queue.start()
+    return _topic_tree_job_queue
+
+
+def get_topic_tree_job_queue() -> Optional[TopicTreeJobQueue]:
+    """Liefert die prozessweite Job-Warteschlange (``None``, falls sie nicht gestartet wurde)."""
+    return _topic_tree_job_queue
+
+
+async def stop_topic_tree_job_queue() -> None:
+    global _topic_tree_job_queue
+    if _topic_tree_job_queue is not None:
+        await _topic_tree_job_queue.stop()
+        _topic_tree_job_queue.store.close()
+    _topic_tree_job_queue = None
@@ -0,0 +1,193 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+from loguru import logger
+
+
+class TopicTreeStore:
+    """
+    Persistenter Speicher (SQLite) für generierte Themenbäume.
+
+    Jeder Themenbaum wird einmal als JSON (``EnhancedTopicTreeResponse``, serialisiert mit Aliasen) gespeichert
+    und erhält eine ID sowie einen Hash über den Inhalt (SHA-256), der z.B. als ETag dient.
+    Gespeicherte Themenbäume ändern sich nicht mehr; ein ergänzter Themenbaum wird als neuer Eintrag gespeichert.
+    Identische Inhalte werden nur einmal gespeichert (dieselbe ID).
+
+    Für Abfragen einzelner Knoten werden die zuletzt benötigten Themenbäume geparst im Speicher gehalten
+    (LRU, ``max_parsed_trees`` Einträge), damit nicht jede Abfrage den ganzen Themenbaum erneut parst.
+    """
+
+    def __init__(self, path: Optional[str], retention_seconds: float, max_parsed_trees: int = 16):
+        self.retention_seconds = retention_seconds
+        self.max_parsed_trees = max_parsed_trees
+        # parsed topic trees by content hash: stored contents never change, so entries never become stale
+        self._parsed: OrderedDict[str, List[Any]] = OrderedDict()
+        self._db_lock = threading.Lock()
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS topic_trees ("
+            "tree_id TEXT PRIMARY KEY, content_hash TEXT NOT NULL UNIQUE, theme TEXT NOT NULL, "
+            "content TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_topic_trees_created_at ON topic_trees (created_at)")
+        self._db.commit()
+
+    def _save(self, theme: str, content: str, content_hash: str) -> str:
+        _created_at = time.time()
+        with self._db_lock:
+            if self.retention_seconds > 0:
+                self._db.execute(
+                    "DELETE FROM topic_trees WHERE created_at < ?", (_created_at - self.retention_seconds,)
+                )
+            self._db.execute(
+                "INSERT OR IGNORE INTO topic_trees (tree_id, content_hash, theme, content, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (uuid.uuid4().hex, content_hash, theme, content, _created_at),
+            )
+            self._db.commit()
+            # identical content that was saved before keeps its ID
+            return self._db.execute(
+                "SELECT tree_id FROM topic_trees WHERE content_hash = ?", (content_hash,)
+            ).fetchone()[0]
+
+    def _fetchone(self, sql: str, parameters: tuple = ()) -> Optional[tuple]:
+        with self._db_lock:
+            return self._db.execute(sql, parameters).fetchone()
+
+    async def save(self, theme: str, content: str) -> Tuple[str, str]:
+        """
+        Speichert einen Themenbaum.
+
+        :param theme: Thema des Themenbaums
+        :param content: der Themenbaum als JSON (``EnhancedTopicTreeResponse``, serialisiert mit Aliasen)
+        :return: ID und Inhalts-Hash des gespeicherten Themenbaums
+        """
+        _content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        _tree_id = await asyncio.to_thread(self._save, theme, content, _content_hash)
+        return _tree_id, _content_hash
+
+    async def get_hash(self, tree_id: str) -> Optional[str]:
+        """Liefert nur den Inhalts-Hash eines Themenbaums (z.B. für Conditional Requests) oder ``None``."""
+        _row = await asyncio.to_thread(
+            self._fetchone, "SELECT content_hash FROM topic_trees WHERE tree_id = ?", (tree_id,)
+        )
+        return _row[0] if _row else None
+
+    async def get(self, tree_id: str) -> Optional[Tuple[str, str]]:
+        """Liefert den gespeicherten Themenbaum als JSON und seinen Inhalts-Hash (``None``, falls er unbekannt ist)."""
+        return await asyncio.to_thread(
+            self._fetchone, "SELECT content, content_hash FROM topic_trees WHERE tree_id = ?", (tree_id,)
+        )
+
+    async def get_parsed(self, tree_id: str) -> Optional[Tuple[List[Any], str]]:
+        """
+        Liefert die Knoten (``topic_tree``) eines gespeicherten Themenbaums als geparstes JSON und seinen
+        Inhalts-Hash (``None``, falls er unbekannt ist). Das Ergebnis darf nicht verändert werden.
+        """
+        _content_hash = await self.get_hash(tree_id)
+        if _content_hash is None:
+            return None
+        _topic_tree = self._parsed.get(_content_hash)
+        if _topic_tree is None:
+            _stored = await self.get(tree_id)
+            if _stored is None:
+                return None
+            _topic_tree = (await asyncio.to_thread(json.loads, _stored[0]))["topic_tree"]
+            self._parsed[_content_hash] = _topic_tree
+            if len(self._parsed) > self.max_parsed_trees:
+                self._parsed.popitem(last=False)
+        self._parsed.move_to_end(_content_hash)
+        return _topic_tree, _content_hash
+
+    def close(self) -> None:
+        with self._db_lock:
+            self._db.close()
+
+
+def find_subtree(topic_tree: List[Any], path: List[int]) -> Optional[Any]:
+    """
+    Liefert den Knoten ``path`` (Index-Pfad, siehe ``/expand-topic-tree``) aus den geparsten Knoten eines
+    gespeicherten Themenbaums (siehe ``TopicTreeStore.get_parsed``) inkl. seiner Subcollections oder ``None``,
+    falls der Pfad auf keinen Knoten verweist.
+    """
+    _node = None
+    _children = topic_tree
+    for _index in path:
+        if not 0 <= _index < len(_children):
+            return None
+        _node = _children[_index]
+        _children = _node.get("subcollections") or []
+    return _node
+
+
+def create_topic_tree_store_from_env() -> Optional[TopicTreeStore]:
+    """
+    Erstellt den Themenbaum-Speicher anhand der Umgebungsvariablen:
+
+    - ``TOPIC_TREE_STORE_ENABLED``: ``false`` deaktiviert das Speichern der Themenbäume (Default: ``true``)
+    - ``TOPIC_TREE_STORE_PATH``: Pfad der SQLite-Datei; leer = nur In-Memory (Default: ``.cache/topic_trees.sqlite3``)
+    - ``TOPIC_TREE_STORE_RETENTION_SECONDS``: Aufbewahrungsdauer eines Themenbaums, ``0`` = unbegrenzt (Default: 0)
+    """
+    if os.getenv("TOPIC_TREE_STORE_ENABLED", "true").lower() in ("false", "0", "no"):
+        return None
+    try:
+        return TopicTreeStore(
+            path=os.getenv("TOPIC_TREE_STORE_PATH", ".cache/topic_trees.sqlite3"),
+            retention_seconds=float(os.getenv("TOPIC_TREE_STORE_RETENTION_SECONDS", 0)),
+        )
+    except (ValueError, sqlite3.Error, OSError) as e:
+        logger.warning(f"Could not initialize the topic tree store: {e}. Continuing without storing topic trees.")
+        return None
+
+
+_topic_tree_store: Optional[TopicTreeStore] = None
+
+
+def configure_topic_tree_store() -> Optional[TopicTreeStore]:
+    """(Re-)Initialisiert den prozessweiten Themenbaum-Speicher (wird beim Start der App aufgerufen)."""
+    global _topic_tree_store
+    close_topic_tree_store()
+    _topic_tree_store = create_topic_tree_store_from_env()
+    return _topic_tree_store
+
+
+def get_topic_tree_store() -> Optional[TopicTreeStore]:
+    """Liefert den prozessweiten Themenbaum-Speicher (``None``, falls deaktiviert oder noch nicht konfiguriert)."""
+    return _topic_tree_store
+
+
+async def store_topic_tree(theme: str, content: str) -> Optional[Tuple[str, str]]:
+    """
+    Speichert einen (serialisierten) Themenbaum im prozessweiten Themenbaum-Speicher.
+
+    :return: ID und Inhalts-Hash des gespeicherten Themenbaums
+        oder ``None``, falls der Speicher deaktiviert ist oder das Speichern fehlgeschlagen ist
+    """
+    store = get_topic_tree_store()
+    if store is None:
+        return None
+    try:
+        return await store.save(theme, content)
+    except Exception as e:
+        # the topic tree has been generated anyway: the client still gets it, only without an ID
+        logger.error(f"Could not store topic tree '{theme}': {e}")
+        return None
+
+
+def close_topic_tree_store() -> None:
+    global _topic_tree_store
+    if _topic_tree_store is not None:
+        _topic_tree_store.close()
+    _topic_tree_store = None
@@ -1,85 +1,200 @@
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+import httpx
 from loguru import logger
-from rdflib import Graph, SKOS
+
+from src.skos_loader import SkosLabelIndex, load_skos_labels
+
+# snapshots that are shipped with the application (see: ``python -m src.vocab_helper --write-snapshots src/vocabs``)
+BUNDLED_SNAPSHOT_DIR = Path(__file__).parent / "vocabs"
+# snapshots with a different format (e.g. the plain prefLabel lists of older versions) are ignored
+SNAPSHOT_FORMAT = 2
+# the OpenAI prompts only use German terms
+DEFAULT_LABEL_LANGUAGE = "de"
 
 
-def _fetch_vocab(url: str) -> Graph:
+class VocabCache:
     """
-    Parse a SKOS vocab from a given URL.
+    Label-Cache für ein SKOS-Vokabular (``{Konzept-URI: {Sprache: [prefLabel, altLabel, ...]}}``).
 
-    :param url: URL of the vocab.
-        e.g.: https://vocabs.openeduhub.de/w3id.org/openeduhub/vocabs/educationalContext/index.json
-    :return: `rdflib.Graph` object.
+    Beim Start wird ein lokaler Snapshot geladen (zuerst der zuletzt heruntergeladene aus ``snapshot_dir``,
+    sonst der mitgelieferte aus ``src/vocabs/``) - ohne Netzwerkzugriff.
+    ``refresh()`` lädt das Vokabular per Conditional Request (ETag / Last-Modified) im Hintergrund neu
+    und tauscht die Labels atomar aus.
     """
-    g = Graph()
-    logger.debug(f"Fetching vocab from {url}")
-    g.parse(url)
-    return g
 
+    def __init__(self, name: str, url: str, snapshot_dir: Path):
+        self.name = name
+        self.url = url
+        self.snapshot_path = snapshot_dir / f"{name}.json"
+        self.labels: SkosLabelIndex = {}
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.fetched_at: Optional[float] = None
 
-def _build_pref_label_dict_from_vocab_graph(graph: Graph) -> dict:
-    """
-    Helper function to build a dictionary of prefLabel strings for a given SKOS vocab.
-    """
-    _result: dict[str, list[str]] = {}
-    # the final dictionary will have the vocab's "id" as its key
-    # and a list of prefLabel strings as its value.
-    for subject in graph.subjects(predicate=SKOS.prefLabel, object=None):
-        # iterating through the subjects in this way will ONLY return the German (lang="de") values.
-        # this is okay for our use case, since the OpenAI prompt only uses German terms anyway.
-        _value = graph.value(subject=subject, predicate=SKOS.prefLabel)
-        # typecasting the Literal object to a string is necessary (since we don't want
-        _value_str: str = str(_value)  # example: "Elementarbereich"
-        # _value_incl_lang = _value.n3()  # example: ""Elementarbereich"@de"
-        _subject_str: str = str(subject)
-        if _subject_str in _result:
-            _previous = set(_result.get(_subject_str))
-            _previous.add(_value_str)
-            _previous_list = list(_previous)
-            _result.update(
-                {
-                    _subject_str: _previous_list,
-                }
-            )
-            pass
-        else:
-            _result.update(
+    def load_snapshot(self) -> bool:
+        """Lädt den neuesten verfügbaren Snapshot. Gibt ``False`` zurück, falls kein Snapshot vorhanden ist."""
+        for _path in (self.snapshot_path, BUNDLED_SNAPSHOT_DIR / self.snapshot_path.name):
+            try:
+                _snapshot = json.loads(_path.read_text(encoding="utf-8"))
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not read vocab snapshot '{_path}': {e}")
+                continue
+            if _snapshot.get("format") != SNAPSHOT_FORMAT:
+                logger.info(f"Ignoring vocab snapshot '{_path}' with outdated format.")
+                continue
+            self.labels = _snapshot["labels"]
+            self.etag = _snapshot.get("etag")
+            self.last_modified = _snapshot.get("last_modified")
+            self.fetched_at = _snapshot.get("fetched_at")
+            logger.debug(f"Loaded vocab snapshot '{_path}' ({len(self.labels)} entries)")
+            return True
+        return False
+
+    def write_snapshot(self, path: Optional[Path] = None) -> None:
+        """Schreibt den aktuellen Stand als Snapshot (atomar per Umbenennen einer temporären Datei)."""
+        _path = path or self.snapshot_path
+        _path.parent.mkdir(parents=True, exist_ok=True)
+        _tmp_path = _path.with_suffix(".tmp")
+        _tmp_path.write_text(
+            json.dumps(
                 {
-                    _subject_str: [_value_str],
-                }
-            )
-        pass
-    return _result
+                    "format": SNAPSHOT_FORMAT,
+                    "url": self.url,
+                    "etag": self.etag,
+                    "last_modified": self.last_modified,
+                    "fetched_at": self.fetched_at,
+                    "labels": self.labels,
+                },
+                ensure_ascii=False,
+            ),
+            encoding="utf-8",
+        )
+        os.replace(_tmp_path, _path)
+
+    async def refresh(self, http_client: httpx.AsyncClient) -> bool:
+        """
+        Lädt das Vokabular neu, falls es sich seit dem letzten Abruf geändert hat.
+
+        :return: True, falls neue Labels übernommen wurden
+        """
+        _headers = {}
+        # conditional requests only make sense if we actually have labels to keep
+        if self.labels:
+            if self.etag:
+                _headers["If-None-Match"] = self.etag
+            if self.last_modified:
+                _headers["If-Modified-Since"] = self.last_modified
+        logger.debug(f"Fetching vocab from {self.url}")
+        response = await http_client.get(self.url, headers=_headers)
+        if response.status_code == 304:
+            logger.debug(f"Vocab '{self.name}' is unchanged.")
+            return False
+        response.raise_for_status()
+        # parsing is CPU-bound and must not block the event loop
+        _labels = await asyncio.to_thread(load_skos_labels, response.content)
+        if not _labels:
+            logger.warning(f"Vocab '{self.name}' did not contain any prefLabels. Keeping the previous labels.")
+            return False
+        # rebinding the attribute is atomic: concurrent lookups see either the old or the new labels
+        self.labels = _labels
+        self.etag = response.headers.get("ETag")
+        self.last_modified = response.headers.get("Last-Modified")
+        self.fetched_at = time.time()
+        logger.info(f"Refreshed vocab '{self.name}' ({len(self.labels)} entries)")
+        try:
+            await asyncio.to_thread(self.write_snapshot)
+        except OSError as e:
+            logger.warning(f"Could not write vocab snapshot '{self.snapshot_path}': {e}")
+        return True
 
 
-def build_vocab_cache(vocab_url: str) -> dict:
-    vocab_graph = _fetch_vocab(vocab_url)
-    vocab_dict = _build_pref_label_dict_from_vocab_graph(vocab_graph)
-    return vocab_dict
+_SNAPSHOT_DIR = Path(os.getenv("VOCAB_SNAPSHOT_DIR", ".cache/vocabs"))
+_VOCAB_BASE_URL = os.getenv("VOCAB_BASE_URL", "https://vocabs.openeduhub.de/w3id.org/openeduhub/vocabs").rstrip("/")
 
+EDU_CONTEXT_CACHE = VocabCache("educationalContext", f"{_VOCAB_BASE_URL}/educationalContext/index.json", _SNAPSHOT_DIR)
+DISCIPLINE_CACHE = VocabCache("discipline", f"{_VOCAB_BASE_URL}/discipline/index.json", _SNAPSHOT_DIR)
+VOCAB_CACHES = [EDU_CONTEXT_CACHE, DISCIPLINE_CACHE]
 
-EDU_CONTEXT_CACHE = build_vocab_cache(
-    "https://vocabs.openeduhub.de/w3id.org/openeduhub/vocabs/educationalContext/index.json"
-)
-DISCIPLINE_CACHE = build_vocab_cache("https://vocabs.openeduhub.de/w3id.org/openeduhub/vocabs/discipline/index.json")
+for _vocab_cache in VOCAB_CACHES:
+    if not _vocab_cache.load_snapshot():
+        logger.warning(
+            f"No snapshot for vocab '{_vocab_cache.name}' found. Labels are available after the first refresh."
+        )
 
 
-def get_educational_context_pref_labels(educational_context_id_uri: str) -> list[str] | None:
-    if educational_context_id_uri in EDU_CONTEXT_CACHE:
-        _pref_labels: list[str] = EDU_CONTEXT_CACHE.get(educational_context_id_uri)
-        return _pref_labels
-    else:
-        return None
+async def refresh_vocab_caches() -> None:
+    """Aktualisiert alle Vokabulare; Fehler werden geloggt und führen nicht zum Abbruch."""
+    async with httpx.AsyncClient(timeout=30.0, follow_redirects=True) as http_client:
+        _results = await asyncio.gather(
+            *[_vocab_cache.refresh(http_client) for _vocab_cache in VOCAB_CACHES], return_exceptions=True
+        )
+    for _vocab_cache, _result in zip(VOCAB_CACHES, _results):
+        if isinstance(_result, Exception):
+            logger.warning(f"Could not refresh vocab '{_vocab_cache.name}': {_result!r}")
 
 
-def get_discipline_pref_labels(discipline_id_uri: str) -> list[str] | None:
-    if discipline_id_uri in DISCIPLINE_CACHE:
-        _pref_labels: list[str] = DISCIPLINE_CACHE.get(discipline_id_uri)
-        return _pref_labels
-    else:
-        return None
+async def run_vocab_refresh_loop() -> None:
+    """
+    Aktualisiert die Vokabulare im Hintergrund (direkt beim Start und danach periodisch).
+    Das Intervall wird über ``VOCAB_REFRESH_INTERVAL_SECONDS`` gesteuert (Default: 86400, ``0`` deaktiviert).
+    Solange ein Vokabular noch keine Labels hat, wird nach ``VOCAB_RETRY_INTERVAL_SECONDS`` (Default: 300)
+    erneut versucht.
+    Ist die Aktualisierung deaktiviert, wird nur einmalig geladen, falls für ein Vokabular kein Snapshot vorhanden war.
+    """
+    _interval = float(os.getenv("VOCAB_REFRESH_INTERVAL_SECONDS", 24 * 60 * 60))
+    _retry_interval = float(os.getenv("VOCAB_RETRY_INTERVAL_SECONDS", 5 * 60))
+    if _interval <= 0:
+        # without a snapshot the labels would stay empty for the whole runtime
+        if any(not _vocab_cache.labels for _vocab_cache in VOCAB_CACHES):
+            await refresh_vocab_caches()
+        return
+    while True:
+        await refresh_vocab_caches()
+        _missing = any(not _vocab_cache.labels for _vocab_cache in VOCAB_CACHES)
+        await asyncio.sleep(_retry_interval if _missing else _interval)
+
+
+def _get_pref_labels(vocab_cache: VocabCache, uri: str, lang: str) -> list[str] | None:
+    _labels = vocab_cache.labels.get(uri, {}).get(lang)
+    # the first label of each language is the prefLabel, the remaining ones are altLabels
+    return _labels[:1] if _labels else None
+
+
+def get_educational_context_pref_labels(
+    educational_context_id_uri: str, lang: str = DEFAULT_LABEL_LANGUAGE
+) -> list[str] | None:
+    return _get_pref_labels(EDU_CONTEXT_CACHE, educational_context_id_uri, lang)
+
+
+def get_discipline_pref_labels(discipline_id_uri: str, lang: str = DEFAULT_LABEL_LANGUAGE) -> list[str] | None:
+    return _get_pref_labels(DISCIPLINE_CACHE, discipline_id_uri, lang)
 
 
 if __name__ == "__main__":
-    logger.info(f"EDU_CONTEXT_CACHE length: {len(EDU_CONTEXT_CACHE)}")
-    logger.info(f"DISCIPLINE_CACHE length: {len(DISCIPLINE_CACHE)}")
-    pass
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fetch the SKOS vocabs and write prefLabel snapshots.")
+    parser.add_argument(
+        "--write-snapshots",
+        metavar="DIR",
+        type=Path,
+        default=None,
+        help="directory to write the snapshots to (e.g. 'src/vocabs' for the bundled snapshots)",
+    )
+    args = parser.parse_args()
+    # always fetch the full vocab when creating snapshots (no conditional request)
+    for _vocab_cache in VOCAB_CACHES:
+        _vocab_cache.labels = {}
+    asyncio.run(refresh_vocab_caches())
+    for _vocab_cache in VOCAB_CACHES:
+        logger.info(f"{_vocab_cache.name} cache length: {len(_vocab_cache.labels)}")
+        if args.write_snapshots and _vocab_cache.labels:
+            _vocab_cache.write_snapshot(args.write_snapshots / _vocab_cache.snapshot_path.name)
@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+from src.json_stream_parser import JsonArrayStreamParser, salvage_json_array
+
+TOPICS = [{"title": "Mechanik", "keywords": ["Kraft"]}, {"title": "Optik [Licht]", "keywords": []}]
+
+
+def feed_in_chunks(content: str, chunk_size: int, skip_invalid: bool = False) -> list:
+    parser = JsonArrayStreamParser(skip_invalid=skip_invalid)
+    items = []
+    for _start in range(0, len(content), chunk_size):
+        items += parser.feed(content[_start : _start + chunk_size])
+    return items
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 1000])
+@pytest.mark.parametrize(
+    "content",
+    [
+        json.dumps(TOPICS),
+        json.dumps({"topics": TOPICS}),
+        f"```json\n{json.dumps(TOPICS)}\n```",
+        f"Hier ist die Liste:\n{json.dumps({'topics': TOPICS})}\nViel Erfolg!",
+        f"Hier [die] Liste:\n{json.dumps(TOPICS)}",
+        f"Die Themen {{siehe unten}}: {json.dumps(TOPICS)}",
+    ],
+)
+def test_feed_yields_all_items(content, chunk_size):
+    assert feed_in_chunks(content, chunk_size) == TOPICS
+
+
+def test_feed_yields_items_as_soon_as_they_are_complete():
+    parser = JsonArrayStreamParser()
+    content = json.dumps(TOPICS)
+    _end_of_first = content.index("}") + 1
+    assert parser.feed(content[:_end_of_first]) == TOPICS[:1]
+    assert parser.feed(content[_end_of_first:]) == TOPICS[1:]
+    assert parser.done
+
+
+def test_feed_keeps_only_the_open_item_in_the_buffer():
+    parser = JsonArrayStreamParser()
+    parser.feed(json.dumps(TOPICS)[:-10])
+    assert len(parser._buffer) < len(json.dumps(TOPICS[1]))
+
+
+def test_feed_waits_for_the_character_after_a_leading_bracket():
+    parser = JsonArrayStreamParser()
+    assert parser.feed("Hier [") == []
+    assert parser.feed("die] Liste: [") == []
+    assert parser.feed('{"title": "Mechanik"}]') == [{"title": "Mechanik"}]
+
+
+def test_feed_ignores_everything_after_the_array():
+    assert salvage_json_array(f'{json.dumps(TOPICS)} und [{{"title": "Extra"}}]') == TOPICS
+
+
+def test_truncated_response_yields_the_complete_items():
+    content = json.dumps({"topics": TOPICS})
+    assert salvage_json_array(content[: content.index("Optik") + 3]) == TOPICS[:1]
+
+
+def test_invalid_item_raises_without_skip_invalid():
+    with pytest.raises(json.JSONDecodeError):
+        JsonArrayStreamParser().feed('[{"title": "Mechanik",}]')
+
+
+def test_invalid_items_are_skipped_and_counted():
+    parser = JsonArrayStreamParser(skip_invalid=True)
+    items = parser.feed('[{"title": "Mechanik",}, {"title": "Optik"}, {"title": Akustik}]')
+    assert items == [{"title": "Optik"}]
+    assert parser.invalid_items == 2
@@ -0,0 +1,104 @@
+import asyncio
+import json
+
+import pytest
+
+from src import structured_text_helper
+from src.structured_text_helper import _complete_missing_topics, parse_structured_text
+from src.topic_node import TopicNode
+
+
+def topic(title: str) -> dict:
+    return {"title": title, "shorttitle": title[:5], "description": f"Über {title}", "keywords": [title.lower()]}
+
+
+TOPICS = [topic("Mechanik"), topic("Optik"), topic("Akustik")]
+TITLES = [_topic["title"] for _topic in TOPICS]
+
+
+def titles(topics: list[TopicNode]) -> list[str]:
+    return [_topic.title for _topic in topics]
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        json.dumps(TOPICS),
+        json.dumps({"topics": TOPICS}),
+        f"```json\n{json.dumps({'topics': TOPICS})}\n```",
+        f"Hier ist die Liste:\n```json\n{json.dumps(TOPICS)}\n```",
+        f"Hier [die] Liste:\n{json.dumps({'topics': TOPICS})}",
+    ],
+)
+def test_parse_structured_text(content):
+    assert titles(parse_structured_text(content)) == TITLES
+
+
+def test_parse_structured_text_keeps_the_complete_topics_of_a_truncated_response():
+    content = json.dumps({"topics": TOPICS})
+    assert titles(parse_structured_text(content[: content.index("Akustik")])) == TITLES[:2]
+
+
+def test_parse_structured_text_skips_invalid_topics():
+    _skipped_topics = structured_text_helper.parse_statistics.skipped_topics
+    content = json.dumps({"topics": [TOPICS[0], "Optik", {"title": "Akustik", "keywords": "Schall"}, TOPICS[1]]})
+    assert titles(parse_structured_text(content)) == TITLES[:2]
+    assert structured_text_helper.parse_statistics.skipped_topics == _skipped_topics + 2
+
+
+def test_parse_structured_text_fills_empty_fields():
+    (_topic,) = parse_structured_text(json.dumps([{"title": "Mechanik"}]))
+    assert _topic.description == "Beschreibung für Mechanik"
+    assert _topic.keywords == ["mechanik"]
+
+
+@pytest.mark.parametrize("content", ["", "  ", "Keine Themen gefunden."])
+def test_parse_structured_text_without_topics(content):
+    assert parse_structured_text(content) == []
+
+
+def complete_missing_topics(monkeypatch, answer: str | Exception, topics: list[TopicNode], expected_count: int):
+    requests = []
+
+    async def complete_chat(**kwargs):
+        requests.append(kwargs)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    monkeypatch.setattr(structured_text_helper, "complete_chat", complete_chat)
+    missing_topics = asyncio.run(
+        _complete_missing_topics(None, "Themen zu Physik", "gpt-4o-mini", topics, expected_count, False)
+    )
+    return missing_topics, requests
+
+
+def test_complete_missing_topics_requests_only_the_missing_ones(monkeypatch):
+    topics = parse_structured_text(json.dumps(TOPICS[:1]))
+    missing_topics, requests = complete_missing_topics(monkeypatch, json.dumps({"topics": TOPICS[1:]}), topics, 3)
+    assert titles(missing_topics) == TITLES[1:]
+    (_request,) = requests
+    # the delivered topics are passed as the answer of the model, followed by the follow-up request
+    assert json.loads(_request["messages"][-2]["content"])["topics"] == TOPICS[:1]
+    assert "2" in _request["messages"][-1]["content"]
+
+
+def test_complete_missing_topics_drops_duplicates_and_surplus_topics(monkeypatch):
+    topics = parse_structured_text(json.dumps(TOPICS[:1]))
+    _answer = json.dumps([TOPICS[0], TOPICS[1], topic("Wärmelehre"), TOPICS[2]])
+    missing_topics, _ = complete_missing_topics(monkeypatch, _answer, topics, 3)
+    assert titles(missing_topics) == ["Optik", "Wärmelehre"]
+
+
+def test_complete_missing_topics_without_missing_topics(monkeypatch):
+    topics = parse_structured_text(json.dumps(TOPICS))
+    missing_topics, requests = complete_missing_topics(monkeypatch, "[]", topics, 3)
+    assert missing_topics == []
+    assert requests == []
+
+
+def test_complete_missing_topics_ignores_errors(monkeypatch):
+    topics = parse_structured_text(json.dumps(TOPICS[:1]))
+    missing_topics, requests = complete_missing_topics(monkeypatch, RuntimeError("timeout"), topics, 3)
+    assert missing_topics == []
+    assert len(requests) == 1